@@ -1,8 +1,70 @@
 # Write all the epub meta in a new line delimited json file
-for afile in ~/*.epub; do python -m shobdokutir.ebook.parser --get_epub_meta $afile >> ~/epub_meta.json; done
+python -m shobdokutir.ebook.parser --get_epub_meta ~/*.epub > ~/epub_meta.json
 
 # Write all the epub contents in a new line delimited json file
-for afile in ~/*.epub; do python -m shobdokutir.ebook.parser --get_epub_text $afile >> ~/epub_contents.json; done
+python -m shobdokutir.ebook.parser --get_epub_text ~/*.epub > ~/epub_contents.json
+
+# Write the contents of a large epub library in gzip compressed shards of 100000 records each
+python -m shobdokutir.ebook.parser --get_epub_text "$HOME/epub/**/*.epub" --output ~/epub_contents --shard_size 100000 --gzip
 
 # Rename files to their md5 hash
-python -m shobdokutir.encoding.utils --rename_md5 ~/epub/
\ No newline at end of file
+python -m shobdokutir.encoding.utils --rename_md5 ~/epub/
+
+# Convert a (possibly very large) Bijoy encoded text file to Unicode
+python -m shobdokutir.encoding.utils --bijoy2unicode resources/sample_docs/bijoy_sample.txt > ~/unicode_output.txt
+
+# Convert all the Bijoy text files of a directory to Unicode in parallel, in a mirrored directory tree
+python -m shobdokutir.encoding.utils --convert ~/bijoy_docs --output_dir ~/unicode_docs
+
+# Benchmark the throughput of the encoding converters and fail on a regression against a stored result
+python -m shobdokutir.encoding.benchmark --output ~/benchmark.json
+python -m shobdokutir.encoding.benchmark --baseline ~/benchmark.json > /dev/null
+
+# Incrementally rename files to their blake2b hash, hardlinking them when possible
+python -m shobdokutir.encoding.utils --rename_md5 ~/epub/ --hash_algorithm blake2b --manifest ~/epub_manifest.ndjson --placement auto
+
+# Extract the epub contents with the faster lxml engine and compare the speed of the engines
+python -m shobdokutir.ebook.parser --get_epub_text ~/*.epub --engine lxml > ~/epub_contents.json
+python -m shobdokutir.ebook.benchmark --epubs ~/*.epub
+
+# Re-extract an epub library nightly, parsing only the new books and chapters
+python -m shobdokutir.ebook.parser --get_epub_text ~/*.epub --cache ~/epub_cache.sqlite --cache_size 10240 > ~/epub_contents.json
+
+# Extract the text of the first 100 pages of a large pdf on all cores, one json record per page
+python -m shobdokutir.ebook.parser --get_pdf_text ~/gazette.pdf --pages 0-99 > ~/gazette.json
+
+# Extract the raw text of a pdf for indexing, skipping the layout analysis, and compare the speed of the pdf modes
+python -m shobdokutir.ebook.parser --get_pdf_text ~/gazette.pdf --pdf_mode text > ~/gazette.json
+python -m shobdokutir.ebook.benchmark --pdf ~/sample.pdf --pages 100
+
+# Extract the text of a pdf, converting the text set in bijoy fonts to unicode
+python -m shobdokutir.ebook.parser --get_pdf_text ~/book.pdf --convert_bijoy --bijoy_fonts "*MJ" Boishakhi
+
+# Convert the Bijoy text of the Word and LibreOffice documents of a folder to Unicode, keeping the formatting
+python -m shobdokutir.encoding.office ~/documents ~/documents_unicode --unicode_font NikoshBAN --workers 4
+
+# Index the extracted epub text and search it
+python -m shobdokutir.ebook.parser --get_epub_text ~/epubs --output ~/epub_text --gzip
+python -m shobdokutir.search.index --index ~/epub_index --add ~/epub_text-*.ndjson.gz
+python -m shobdokutir.search.index --index ~/epub_index --query "বাংলায় গান" --limit 10
+
+# Word, n-gram and grapheme counts of the extracted text, with bounded memory
+python -m shobdokutir.corpus.stats ~/epub_text-*.ndjson.gz --max_n 3 --capacity 1000000 --sketch_width 4194304 --save ~/epub_stats.npz --top 50
+
+# Near duplicate chapters and books (MinHash + LSH), incremental over a persistent signature database
+python -m shobdokutir.corpus.dedup --db ~/dedup.sqlite --add ~/epub_text.ndjson.gz
+python -m shobdokutir.corpus.dedup --db ~/dedup.sqlite --clusters book
+
+# Render text in-process with Pillow: throughput, and parity with the browser backend on conjunct heavy samples
+python -m shobdokutir.optical.generators --benchmark 1000 --fonts NikoshBAN Kalpurush
+python -m shobdokutir.optical.generators --parity --fonts NikoshBAN Kalpurush
+
+# Render many texts per page in the browser (one page load and screenshot per batch)
+python -m shobdokutir.optical.generators --backend browser --benchmark 1000 --batch_size 100
+
+# Generate a synthetic ocr dataset in tar shards (resumes after the complete shards)
+python -m shobdokutir.optical.dataset ~/epub_text.ndjson.gz --output ~/ocr_shards --variants 2 --workers 8
+
+# List the bengali fonts (cached catalog with glyph coverage), or the fonts that can render a text
+python -m shobdokutir.optical.fonts
+python -m shobdokutir.optical.fonts --text "রাষ্ট্রের জ্ঞান"
\ No newline at end of file
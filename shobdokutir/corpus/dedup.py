@@ -0,0 +1,331 @@
+import argparse
+import hashlib
+import itertools
+import json
+import sqlite3
+import sys
+import time
+from multiprocessing import Pool
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+from shobdokutir.encoding.tokenizer import words
+from shobdokutir.search.index import read_ndjson
+
+# Odd multiplier of the polynomial hash of the shingles
+_shingle_multiplier = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _word_hash(word: str) -> int:
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def shingles(text: str, shingle_size: int = 5) -> np.ndarray:
+    """
+    Hashes of the overlapping word shingles of the normalized text (see encoding.tokenizer), so that the
+    differences of spelling, spacing and punctuation between two copies of a text do not matter
+    :return: A uint64 array of the distinct shingle hashes
+    """
+    text_words = words(text)
+    word_hashes = {a_word: _word_hash(a_word) for a_word in set(text_words)}
+    hashes = np.array([word_hashes[a_word] for a_word in text_words], dtype=np.uint64)
+    # a text shorter than a shingle is a single shingle
+    shingle_size = max(1, min(shingle_size, len(hashes)))
+    shingle_hashes = np.zeros(len(hashes) - shingle_size + 1, dtype=np.uint64)
+    for j in range(shingle_size):
+        shingle_hashes = shingle_hashes * _shingle_multiplier + hashes[j:len(hashes) - shingle_size + 1 + j]
+    return np.unique(shingle_hashes)
+
+
+class MinHasher:
+    """
+    MinHash signatures with num_perm multiply-shift hash functions. The fraction of equal values of two
+    signatures estimates the Jaccard similarity of the two sets of shingles.
+    """
+
+    def __init__(self, num_perm: int = 128, seed: int = 1) -> None:
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(0, 1 << 62, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.randint(0, 1 << 62, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_hashes: np.ndarray, block_size: int = 4096) -> np.ndarray:
+        """
+        :return: A uint32 array of num_perm values, all 0xFFFFFFFF for an empty set
+        """
+        signature = np.full(len(self.a), 0xFFFFFFFF, dtype=np.uint32)
+        for start in range(0, len(shingle_hashes), block_size):
+            block = shingle_hashes[start:start + block_size].reshape(-1, 1)
+            values = ((self.a * block + self.b) >> np.uint64(32)).astype(np.uint32)
+            signature = np.minimum(signature, values.min(axis=0))
+        return signature
+
+
+def similarity(signature: np.ndarray, other: np.ndarray) -> float:
+    """
+    Estimated Jaccard similarity of two MinHash signatures
+    """
+    return float(np.mean(signature == other))
+
+
+def _book_signatures(job: Tuple[str, List[Tuple[int, str]], Dict]) -> Tuple[str, List[Tuple[int, int, bytes]]]:
+    """
+    Computes the signatures of the chapters of a book. Runs in the worker processes of dedup_corpus.
+    :return: The epub hash and the (xhtml_index, number of shingles, signature) of every chapter
+    """
+    epub_md5_hash, chapters, params = job
+    hasher = MinHasher(params['num_perm'], params['seed'])
+    signatures = []
+    for xhtml_index, text in chapters:
+        chapter_shingles = shingles(text, params['shingle_size'])
+        signatures.append((xhtml_index, len(chapter_shingles), hasher.signature(chapter_shingles).tobytes()))
+    return epub_md5_hash, signatures
+
+
+class DedupIndex:
+    """
+    A persistent (sqlite) index of the MinHash signatures of chapters and books. Every signature is split
+    into bands, and two chapters (or books) become candidates if they share a band, so a new book is
+    compared only with the few chapters that are likely similar (locality sensitive hashing). The
+    candidates above the similarity threshold are stored as pairs and form the clusters of near
+    duplicates. A book signature is the minimum of its chapter signatures, i.e. the MinHash of all of
+    its shingles.
+    """
+
+    def __init__(self, db_file: str, num_perm: int = 128, bands: int = 16, threshold: float = 0.8,
+                 shingle_size: int = 5, min_shingles: int = 50, seed: int = 1, timeout: float = 60.0) -> None:
+        """
+        :param db_file: Path of the sqlite database
+        :param num_perm: Length of the signatures
+        :param bands: Number of bands (num_perm must be a multiple of it). More bands find pairs of lower
+        similarity, at the cost of more candidates
+        :param threshold: Minimum estimated Jaccard similarity of the near duplicates
+        :param shingle_size: Number of words per shingle
+        :param min_shingles: Chapters with fewer shingles (title pages, copyright notices, ...) are not compared
+        :param seed: Seed of the hash functions
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.params = {'num_perm': num_perm, 'bands': bands, 'shingle_size': shingle_size, 'seed': seed}
+        self.threshold = threshold
+        self.min_shingles = min_shingles
+        self.connection = sqlite3.connect(db_file, timeout=timeout)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS chapters (id INTEGER PRIMARY KEY, "
+                                    "epub_md5_hash TEXT, xhtml_index INTEGER, shingles INTEGER, signature BLOB)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS books (epub_md5_hash TEXT PRIMARY KEY, "
+                                    "chapters INTEGER, signature BLOB)")
+            for level, key_type in [("chapter", "INTEGER"), ("book", "TEXT")]:
+                self.connection.execute("CREATE TABLE IF NOT EXISTS {0}_bands (band INTEGER, bucket INTEGER, "
+                                        "id {1})".format(level, key_type))
+                self.connection.execute("CREATE INDEX IF NOT EXISTS {0}_buckets ON {0}_bands (band, bucket)"
+                                        .format(level))
+                self.connection.execute("CREATE TABLE IF NOT EXISTS {0}_pairs (id {1}, other_id {1}, "
+                                        "similarity REAL)".format(level, key_type))
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+            if row is None:
+                self.connection.execute("INSERT INTO meta VALUES ('params', ?)", (json.dumps(self.params),))
+            elif json.loads(row[0]) != self.params:
+                raise ValueError("The index was built with other parameters: {0}".format(row[0]))
+
+    def __enter__(self) -> "DedupIndex":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def _buckets(self, signature: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        The (band, bucket) of every band of a signature
+        """
+        return [(band, int.from_bytes(hashlib.blake2b(rows.tobytes(), digest_size=8).digest(), "little", signed=True))
+                for band, rows in enumerate(signature.reshape(self.params['bands'], -1))]
+
+    def _candidates(self, level: str, buckets: List[Tuple[int, int]]) -> List:
+        query = "SELECT DISTINCT id FROM {0}_bands WHERE band = ? AND bucket = ?".format(level)
+        return sorted({a_row[0] for a_bucket in buckets for a_row in self.connection.execute(query, a_bucket)})
+
+    def has_book(self, epub_md5_hash: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM books WHERE epub_md5_hash = ?",
+                                       (epub_md5_hash,)).fetchone() is not None
+
+    def books(self) -> Set[str]:
+        """
+        :return: The epub hashes of the books in the index
+        """
+        return {a_row[0] for a_row in self.connection.execute("SELECT epub_md5_hash FROM books")}
+
+    def add_book(self, epub_md5_hash: str, chapters: List[Tuple[int, int, bytes]]) -> Dict:
+        """
+        Adds the chapter signatures of a book (as computed by _book_signatures) and finds its near duplicates
+        :return: The near duplicate chapters (of other books) and books
+        """
+        result = {'epub_md5_hash': epub_md5_hash, 'duplicate_chapters': [], 'duplicate_books': []}
+        if self.has_book(epub_md5_hash):
+            result['skipped'] = True
+            return result
+        book_signature = None
+        with self.connection:
+            for xhtml_index, n_shingles, signature in chapters:
+                cursor = self.connection.execute("INSERT INTO chapters VALUES (NULL, ?, ?, ?, ?)",
+                                                 (epub_md5_hash, xhtml_index, n_shingles, signature))
+                if n_shingles < self.min_shingles:
+                    continue
+                signature = np.frombuffer(signature, dtype=np.uint32)
+                book_signature = signature if book_signature is None else np.minimum(book_signature, signature)
+                buckets = self._buckets(signature)
+                candidates = self._candidates("chapter", buckets)
+                for i in range(0, len(candidates), 500):
+                    rows = self.connection.execute(
+                        "SELECT id, epub_md5_hash, xhtml_index, signature FROM chapters WHERE id IN ({0})".format(
+                            ",".join("?" * len(candidates[i:i + 500]))), candidates[i:i + 500])
+                    for other_id, other_hash, other_index, other_signature in rows:
+                        a_similarity = similarity(signature, np.frombuffer(other_signature, dtype=np.uint32))
+                        if other_hash == epub_md5_hash or a_similarity < self.threshold:
+                            continue
+                        self.connection.execute("INSERT INTO chapter_pairs VALUES (?, ?, ?)",
+                                                (cursor.lastrowid, other_id, a_similarity))
+                        result['duplicate_chapters'].append({'xhtml_index': xhtml_index,
+                                                             'other_epub_md5_hash': other_hash,
+                                                             'other_xhtml_index': other_index,
+                                                             'similarity': a_similarity})
+                self.connection.executemany("INSERT INTO chapter_bands VALUES (?, ?, ?)",
+                                            [a_bucket + (cursor.lastrowid,) for a_bucket in buckets])
+
+            self.connection.execute("INSERT INTO books VALUES (?, ?, ?)",
+                                    (epub_md5_hash, len(chapters),
+                                     book_signature.tobytes() if book_signature is not None else None))
+            if book_signature is None:
+                return result
+            buckets = self._buckets(book_signature)
+            for other_hash in self._candidates("book", buckets):
+                other_signature = self.connection.execute("SELECT signature FROM books WHERE epub_md5_hash = ?",
+                                                          (other_hash,)).fetchone()[0]
+                a_similarity = similarity(book_signature, np.frombuffer(other_signature, dtype=np.uint32))
+                if a_similarity >= self.threshold:
+                    self.connection.execute("INSERT INTO book_pairs VALUES (?, ?, ?)",
+                                            (epub_md5_hash, other_hash, a_similarity))
+                    result['duplicate_books'].append({'other_epub_md5_hash': other_hash,
+                                                      'similarity': a_similarity})
+            self.connection.executemany("INSERT INTO book_bands VALUES (?, ?, ?)",
+                                        [a_bucket + (epub_md5_hash,) for a_bucket in buckets])
+        return result
+
+    def add_chapters(self, epub_md5_hash: str, chapters: List[Tuple[int, str]]) -> Dict:
+        """
+        Adds a book given the (xhtml_index, text) of its chapters
+        """
+        return self.add_book(*_book_signatures((epub_md5_hash, chapters, self.params)))
+
+    def clusters(self, level: str = "book") -> List[List]:
+        """
+        Groups the near duplicate pairs into clusters (connected components)
+        :param level: "book" or "chapter"
+        :return: The clusters of epub hashes (books) or of [epub hash, xhtml index] (chapters), largest first
+        """
+        if level not in ("book", "chapter"):
+            raise ValueError("level must be either book or chapter")
+        parents = {}
+
+        def find(a_key):
+            parents.setdefault(a_key, a_key)
+            while parents[a_key] != a_key:
+                parents[a_key] = parents[parents[a_key]]
+                a_key = parents[a_key]
+            return a_key
+
+        for a_key, other_key in self.connection.execute("SELECT id, other_id FROM {0}_pairs".format(level)):
+            parents[find(a_key)] = find(other_key)
+        groups = {}
+        for a_key in list(parents):
+            groups.setdefault(find(a_key), []).append(a_key)
+        clusters = [sorted(a_group) for a_group in groups.values()]
+        if level == "chapter":
+            names = {}
+            for i in range(0, len(parents), 500):
+                ids = list(parents)[i:i + 500]
+                names.update({a_row[0]: [a_row[1], a_row[2]] for a_row in self.connection.execute(
+                    "SELECT id, epub_md5_hash, xhtml_index FROM chapters WHERE id IN ({0})".format(
+                        ",".join("?" * len(ids))), ids)})
+            clusters = [[names[a_key] for a_key in a_cluster] for a_cluster in clusters]
+        return sorted(clusters, key=lambda a_cluster: (-len(a_cluster), a_cluster))
+
+
+def _book_jobs(records: Iterable[Dict], known_books: Set[str],
+               params: Dict) -> Iterable[Tuple[str, List[Tuple[int, str]], Dict]]:
+    """
+    Groups the consecutive records of the same book, skipping the known books
+    """
+    for epub_md5_hash, book_records in itertools.groupby(records, key=lambda a_record: a_record['epub_md5_hash']):
+        if epub_md5_hash in known_books:
+            continue
+        known_books.add(epub_md5_hash)
+        chapters = [(a_record['xhtml_index'], " ".join(a_record['text_split']) if 'text_split' in a_record
+                     else a_record.get('text', "")) for a_record in book_records]
+        yield epub_md5_hash, chapters, params
+
+
+def dedup_corpus(records: Iterable[Dict], index: DedupIndex, workers: int = None) -> Iterable[Dict]:
+    """
+    Adds the books of the records of epub_extract_contents (the records of a book must be consecutive, as
+    written by --get_epub_text) to the index. The signatures are computed by a pool of worker processes.
+    :return: Yields the near duplicates of every added book
+    """
+    # the known books are read here, the jobs are consumed by a thread of the pool and the connection
+    # belongs to this one
+    jobs = _book_jobs(records, index.books(), index.params)
+    if workers == 1:
+        for a_job in jobs:
+            yield index.add_book(*_book_signatures(a_job))
+        return
+    with Pool(workers) as pool:
+        for epub_md5_hash, signatures in pool.imap(_book_signatures, jobs, chunksize=4):
+            yield index.add_book(epub_md5_hash, signatures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Near duplicate chapters and books of an epub library")
+    parser.add_argument("--db", action="store", required=True, type=str,
+                        help="sqlite file of the signatures")
+    parser.add_argument("--add", action="store", default=None, type=str, nargs="+",
+                        help="Adds the books of the ndjson files written by --get_epub_text (- for stdin) and "
+                             "prints their near duplicates as ndjson")
+    parser.add_argument("--clusters", action="store", default=None, choices=["book", "chapter"],
+                        help="Prints the clusters of near duplicate books or chapters as ndjson")
+    parser.add_argument("--threshold", action="store", default=0.8, type=float,
+                        help="Minimum (estimated Jaccard) similarity of the near duplicates (default: 0.8)")
+    parser.add_argument("--num_perm", action="store", default=128, type=int,
+                        help="Length of the MinHash signatures (default: 128)")
+    parser.add_argument("--bands", action="store", default=16, type=int,
+                        help="Number of LSH bands (default: 16)")
+    parser.add_argument("--shingle_size", action="store", default=5, type=int,
+                        help="Number of words per shingle (default: 5)")
+    parser.add_argument("--workers", action="store", default=None, type=int,
+                        help="Number of worker processes (default: number of cpus)")
+    args = parser.parse_args()
+
+    with DedupIndex(args.db, num_perm=args.num_perm, bands=args.bands, threshold=args.threshold,
+                    shingle_size=args.shingle_size) as index:
+        if args.add:
+            start_time = time.time()
+            summary = {'books': 0, 'duplicate_books': 0, 'duplicate_chapters': 0}
+            for result in dedup_corpus(read_ndjson(args.add), index, args.workers):
+                summary['books'] += 1
+                summary['duplicate_books'] += len(result['duplicate_books'])
+                summary['duplicate_chapters'] += len(result['duplicate_chapters'])
+                if result['duplicate_books'] or result['duplicate_chapters']:
+                    sys.stdout.write(json.dumps(result) + "\n")
+            summary['seconds'] = time.time() - start_time
+            sys.stderr.write(json.dumps(summary) + "\n")
+        if args.clusters:
+            for a_cluster in index.clusters(args.clusters):
+                sys.stdout.write(json.dumps(a_cluster) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+import argparse
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import sys
+import time
+from collections import Counter
+from multiprocessing import Pool
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from shobdokutir.encoding.tokenizer import words, grapheme_clusters
+
+
+class BoundedCounter:
+    """
+    A counter that keeps at most about capacity keys. When it grows to twice the capacity, only the
+    capacity most frequent keys are kept. A dropped key counts from zero when it comes back, so every
+    prune adds the largest count it drops to max_dropped (as in Misra-Gries). The count of a kept key is
+    short by at most max_dropped and any key with a larger count is never missing.
+    """
+
+    def __init__(self, capacity: int = None) -> None:
+        """
+        :param capacity: Number of keys to keep. Unbounded (exact counts) if None
+        """
+        self.capacity = capacity
+        self.counts = Counter()
+        self.max_dropped = 0
+
+    def update(self, counts: Dict[str, int]) -> None:
+        self.counts.update(counts)
+        if self.capacity is not None and len(self.counts) > 2 * self.capacity:
+            self.prune(self.capacity)
+
+    def prune(self, capacity: int) -> None:
+        """
+        Keeps the capacity most frequent keys
+        """
+        if len(self.counts) <= capacity:
+            return
+        # the largest dropped count is the capacity + 1-th largest count
+        kept = heapq.nlargest(capacity + 1, self.counts.items(), key=lambda an_item: an_item[1])
+        self.max_dropped += kept[-1][1]
+        self.counts = Counter(dict(kept[:capacity]))
+
+    def merge(self, other: "BoundedCounter") -> None:
+        """
+        Adds the counts of another counter. The error bounds add up, together with that of the prune
+        of the merged counts.
+        """
+        self.max_dropped += other.max_dropped
+        self.update(other.counts)
+
+    def most_common(self, k: int = None) -> List[Tuple[str, int]]:
+        return self.counts.most_common(k)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+
+class CountMinSketch:
+    """
+    Approximate counts of any number of keys in a fixed depth x width table. An estimate is never below
+    the true count, and above it by at most 2 * total / width with probability 1 - 0.5 ** depth.
+    Sketches of the same shape can be merged by adding the tables.
+    """
+
+    def __init__(self, width: int = 1 << 20, depth: int = 4) -> None:
+        self.table = np.zeros((depth, width), dtype=np.uint64)
+
+    def _indices(self, keys: List[str]) -> np.ndarray:
+        # two independent 32 bit hashes per key, the rows use h1 + i * h2 (the process independent blake2b
+        # is used instead of hash, so that the sketches of the workers can be merged)
+        hashes = np.array([int.from_bytes(hashlib.blake2b(a_key.encode("utf-8"), digest_size=8).digest(), "little")
+                           for a_key in keys], dtype=np.uint64).reshape(1, -1)
+        depth, width = self.table.shape
+        rows = np.arange(depth, dtype=np.uint64).reshape(-1, 1)
+        return ((hashes & np.uint64(0xFFFFFFFF)) + rows * (hashes >> np.uint64(32) | np.uint64(1))) % np.uint64(width)
+
+    def update(self, counts: Dict[str, int]) -> None:
+        if not counts:
+            return
+        keys = list(counts)
+        indices = self._indices(keys)
+        values = np.array([counts[a_key] for a_key in keys], dtype=np.uint64)
+        for row, row_indices in enumerate(indices):
+            np.add.at(self.table[row], row_indices.astype(np.int64), values)
+
+    def estimate(self, key: str) -> int:
+        indices = self._indices([key])[:, 0].astype(np.int64)
+        return int(self.table[np.arange(len(indices)), indices].min())
+
+    def merge(self, other: "CountMinSketch") -> None:
+        if self.table.shape != other.table.shape:
+            raise ValueError("Only the sketches of the same shape can be merged")
+        self.table += other.table
+
+
+class CorpusStats:
+    """
+    Character, grapheme cluster, word and word n-gram counts of a corpus. The counts are updated one
+    paragraph at a time, and the partial counts of several workers (or several runs) can be merged.
+    The memory is bounded by the capacity of the counters; with a sketch, the n-grams that were pruned
+    from the counters still have (over)estimated counts.
+    """
+
+    def __init__(self, max_n: int = 3, capacity: int = None, sketch_width: int = 0, sketch_depth: int = 4) -> None:
+        """
+        :param max_n: Longest word n-gram to count (1 counts only the words)
+        :param capacity: Number of keys to keep per counter. Exact counts if None
+        :param sketch_width: Width of the count-min sketches of the n-grams. No sketch if 0
+        :param sketch_depth: Depth of the count-min sketches
+        """
+        self.max_n = max_n
+        self.chars = BoundedCounter()
+        self.graphemes = BoundedCounter(capacity)
+        self.ngrams = {n: BoundedCounter(capacity) for n in range(1, max_n + 1)}
+        self.sketches = {n: CountMinSketch(sketch_width, sketch_depth) for n in range(2, max_n + 1)} \
+            if sketch_width else {}
+        self.totals = {'records': 0, 'paragraphs': 0, 'chars': 0, 'graphemes': 0}
+        self.totals.update({"{0}grams".format(n): 0 for n in range(1, max_n + 1)})
+
+    @property
+    def words(self) -> BoundedCounter:
+        return self.ngrams[1]
+
+    def add_text(self, text: str) -> None:
+        """
+        Counts a paragraph. The n-grams do not cross paragraphs.
+        """
+        self.totals['paragraphs'] += 1
+        self.totals['chars'] += len(text)
+        self.chars.update(Counter(text))
+        graphemes = grapheme_clusters(text)
+        self.totals['graphemes'] += len(graphemes)
+        self.graphemes.update(Counter(graphemes))
+        text_words = words(text)
+        for n in range(1, self.max_n + 1):
+            ngrams = Counter(" ".join(text_words[i:i + n]) for i in range(len(text_words) - n + 1)) if n > 1 \
+                else Counter(text_words)
+            self.totals["{0}grams".format(n)] += max(0, len(text_words) - n + 1)
+            self.ngrams[n].update(ngrams)
+            if n in self.sketches:
+                self.sketches[n].update(ngrams)
+
+    def add_record(self, record: Dict) -> None:
+        """
+        Counts a record of epub_extract_contents (its text_split paragraphs) or of pdf_iter (its text)
+        """
+        self.totals['records'] += 1
+        paragraphs = record.get('text_split')
+        for a_paragraph in paragraphs if paragraphs is not None else [record.get('text') or ""]:
+            self.add_text(a_paragraph)
+
+    def add_records(self, records: Iterable[Dict]) -> "CorpusStats":
+        for a_record in records:
+            self.add_record(a_record)
+        return self
+
+    def count(self, ngram: str) -> int:
+        """
+        The count of a word or of a (space separated) n-gram. An n-gram that was pruned is estimated by the
+        sketch if there is one.
+        """
+        n = len(ngram.split(" "))
+        counter = self.ngrams.get(n)
+        if counter is None:
+            raise ValueError("Only the n-grams up to {0} words are counted".format(self.max_n))
+        if ngram in counter.counts or n not in self.sketches:
+            return counter.counts.get(ngram, 0)
+        return self.sketches[n].estimate(ngram)
+
+    def merge(self, other: "CorpusStats") -> "CorpusStats":
+        """
+        Adds the counts of another (partial) result with the same parameters
+        """
+        if other.max_n != self.max_n or set(other.sketches) != set(self.sketches):
+            raise ValueError("Only the stats with the same max_n and sketches can be merged")
+        self.chars.merge(other.chars)
+        self.graphemes.merge(other.graphemes)
+        for n in self.ngrams:
+            self.ngrams[n].merge(other.ngrams[n])
+        for n in self.sketches:
+            self.sketches[n].merge(other.sketches[n])
+        for a_key in self.totals:
+            self.totals[a_key] += other.totals[a_key]
+        return self
+
+    def summary(self, top: int = 20) -> Dict:
+        """
+        The totals, the number of distinct keys, the error bounds and the top keys of every counter
+        """
+        counters = [('chars', self.chars), ('graphemes', self.graphemes)] + \
+                   [("{0}grams".format(n), self.ngrams[n]) for n in self.ngrams]
+        return {'totals': dict(self.totals),
+                'distinct': {name: len(counter) for name, counter in counters},
+                'max_dropped': {name: counter.max_dropped for name, counter in counters},
+                'top': {name: counter.most_common(top) for name, counter in counters}}
+
+    def save(self, stats_file: str) -> None:
+        """
+        Writes the counts (and the sketches) in a .npz file, that can be loaded and merged later
+        """
+        counters = {'chars': self.chars, 'graphemes': self.graphemes}
+        counters.update({str(n): self.ngrams[n] for n in self.ngrams})
+        header = {'max_n': self.max_n, 'totals': self.totals,
+                  'capacity': self.graphemes.capacity,
+                  'counters': {name: {'counts': counter.counts, 'max_dropped': counter.max_dropped}
+                               for name, counter in counters.items()}}
+        np.savez_compressed(stats_file, header=np.array(json.dumps(header, ensure_ascii=False)),
+                            **{"sketch_{0}".format(n): a_sketch.table for n, a_sketch in self.sketches.items()})
+
+    @staticmethod
+    def load(stats_file: str) -> "CorpusStats":
+        with np.load(stats_file) as saved:
+            header = json.loads(str(saved['header']))
+            stats = CorpusStats(header['max_n'], header['capacity'])
+            for n in range(2, stats.max_n + 1):
+                if "sketch_{0}".format(n) in saved.files:
+                    stats.sketches[n] = CountMinSketch(1, 1)
+                    stats.sketches[n].table = saved["sketch_{0}".format(n)]
+        stats.totals = header['totals']
+        counters = {'chars': stats.chars, 'graphemes': stats.graphemes}
+        counters.update({str(n): stats.ngrams[n] for n in stats.ngrams})
+        for name, counter in counters.items():
+            counter.counts = Counter(header['counters'][name]['counts'])
+            counter.max_dropped = header['counters'][name]['max_dropped']
+        return stats
+
+
+def _file_chunks(path: str, chunk_size: int) -> List[Tuple[str, int, int]]:
+    """
+    Splits an ndjson file into byte ranges that can be read in parallel. A gzipped file is a single chunk.
+    """
+    if path.endswith(".gz"):
+        return [(path, 0, -1)]
+    size = os.path.getsize(path)
+    return [(path, start, min(start + chunk_size, size)) for start in range(0, max(size, 1), chunk_size)]
+
+
+def _read_chunk(path: str, start: int, end: int) -> Iterator[Dict]:
+    """
+    Reads the records whose lines start in [start, end) of an ndjson file (the whole file if end is -1)
+    """
+    if end < 0:
+        with gzip.open(path, "rt", encoding="utf-8") if path.endswith(".gz") else open(path, encoding="utf-8") \
+                as f_in:
+            for a_line in f_in:
+                if a_line.strip():
+                    yield json.loads(a_line)
+        return
+    with open(path, "rb") as f_in:
+        if start:
+            # the line that started in the previous chunk belongs to it
+            f_in.seek(start - 1)
+            f_in.readline()
+        while f_in.tell() < end:
+            a_line = f_in.readline()
+            if not a_line:
+                break
+            if a_line.strip():
+                yield json.loads(a_line.decode("utf-8"))
+
+
+def _count_chunk(job: Tuple[str, int, int, Dict]) -> CorpusStats:
+    """
+    Counts a chunk of an ndjson file. Runs in the worker processes of corpus_stats.
+    """
+    path, start, end, params = job
+    return CorpusStats(**params).add_records(_read_chunk(path, start, end))
+
+
+def corpus_stats(paths: List[str], max_n: int = 3, capacity: int = None, sketch_width: int = 0,
+                 sketch_depth: int = 4, workers: int = None, chunk_size: int = 64 * 1024 * 1024) -> CorpusStats:
+    """
+    Counts the ndjson files written by --get_epub_text or --get_pdf_text (gzipped or not) in a pool of
+    worker processes. Every worker counts chunks of the files and the partial counts are merged as they
+    arrive.
+    :param paths: Paths of the ndjson files
+    :param workers: Number of worker processes. Defaults to the number of cpus
+    :param chunk_size: Size (in bytes) of the chunks of the uncompressed files
+    See CorpusStats for the other parameters.
+    """
+    params = {'max_n': max_n, 'capacity': capacity, 'sketch_width': sketch_width, 'sketch_depth': sketch_depth}
+    jobs = [a_chunk + (params,) for a_path in paths for a_chunk in _file_chunks(a_path, chunk_size)]
+    stats = CorpusStats(**params)
+    if workers == 1:
+        for a_job in jobs:
+            stats.merge(_count_chunk(a_job))
+        return stats
+    with Pool(workers) as pool:
+        for partial in pool.imap_unordered(_count_chunk, jobs):
+            stats.merge(partial)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Character, grapheme, word and n-gram counts of a Bangla corpus")
+    parser.add_argument("paths", action="store", type=str, nargs="*",
+                        help="ndjson files written by --get_epub_text or --get_pdf_text (optionally gzipped)")
+    parser.add_argument("--merge", action="store", default=[], type=str, nargs="+",
+                        help="Saved stats (.npz) to merge with the counts of the ndjson files")
+    parser.add_argument("--max_n", action="store", default=3, type=int,
+                        help="Longest word n-gram to count (default: 3)")
+    parser.add_argument("--capacity", action="store", default=None, type=int,
+                        help="Number of keys to keep per counter (default: unbounded)")
+    parser.add_argument("--sketch_width", action="store", default=0, type=int,
+                        help="Width of the count-min sketches of the n-grams (default: no sketch)")
+    parser.add_argument("--workers", action="store", default=None, type=int,
+                        help="Number of worker processes (default: number of cpus)")
+    parser.add_argument("--save", action="store", default=None, type=str,
+                        help="Saves the counts in this .npz file, to be merged later")
+    parser.add_argument("--top", action="store", default=20, type=int,
+                        help="Number of the most frequent keys to print per counter (default: 20)")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    stats = corpus_stats(args.paths, args.max_n, args.capacity, args.sketch_width, workers=args.workers)
+    for a_file in args.merge:
+        stats.merge(CorpusStats.load(a_file))
+    if args.save:
+        stats.save(args.save)
+    summary = stats.summary(args.top)
+    summary['seconds'] = time.time() - start_time
+    sys.stdout.write(json.dumps(summary, ensure_ascii=False, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
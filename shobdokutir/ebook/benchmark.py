@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from collections import Counter
+
+from shobdokutir.ebook.parser import EpubReader, parse_xhtml_contents, list_epub_files, pdf_iter
+from shobdokutir.encoding.benchmark import synthetic_text
+
+
+def synthetic_pages(n_pages: int, paragraphs: int = 30, seed: int = 0) -> List[bytes]:
+    """
+    Generates xhtml pages of random bengali text, indented as most epub pages are
+    """
+    rng = random.Random(seed)
+    pages = []
+    for i in range(n_pages):
+        body = ["  <h1>অধ্যায় {0}</h1>".format(i)]
+        for j in range(paragraphs):
+            a_paragraph = synthetic_text(rng.randint(50, 600), seed=rng.random())
+            body.append("  <p class=\"para\">{0}</p>".format(a_paragraph.replace("\n", "<br/>")))
+        pages.append("<?xml version=\"1.0\" encoding=\"utf-8\"?>\n"
+                     "<html xmlns=\"http://www.w3.org/1999/xhtml\">\n"
+                     "<head>\n  <title>অধ্যায় {0}</title>\n</head>\n<body>\n{1}\n</body>\n</html>\n"
+                     .format(i, "\n".join(body)).encode("utf-8"))
+    return pages
+
+
+def _pdf_string(data: bytes) -> bytes:
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def write_sample_pdf(pdf_file: str, pages: List[List[List[Tuple[str, str]]]], font_size: int = 12) -> None:
+    """
+    Writes a minimal pdf (without embedded fonts) for tests and benchmarks. A page is a list of lines and
+    a line is a list of (font name, text) runs. A run that can be encoded in cp1252 (e.g. english or bijoy
+    text) is written with a simple font of the given name; any other run (e.g. unicode bengali) with a
+    composite font of that name that has a ToUnicode map, as the pdf writers of unicode bengali do.
+    """
+    objects = [None, None]  # the catalog and the page tree are the first two objects
+    fonts = {}
+    unicode_codes = {}
+
+    def add_object(data: bytes) -> int:
+        objects.append(data)
+        return len(objects)
+
+    def font_resource(font_name: str, is_simple: bool) -> str:
+        if (font_name, is_simple) not in fonts:
+            fonts[font_name, is_simple] = {'name': "F{0}".format(len(fonts) + 1), 'object': None}
+        return fonts[font_name, is_simple]['name']
+
+    page_contents = []
+    for a_page in pages:
+        content = [b"BT"]
+        for i, a_line in enumerate(a_page):
+            content.append("1 0 0 1 50 {0} Tm".format(800 - (font_size + 4) * i).encode("ascii"))
+            for font_name, text in a_line:
+                try:
+                    data = _pdf_string(text.encode("cp1252"))
+                    is_simple = True
+                except UnicodeEncodeError:
+                    codes = unicode_codes.setdefault(font_name, {})
+                    data = b"<" + "".join("{0:04X}".format(codes.setdefault(a_char, len(codes) + 1))
+                                          for a_char in text).encode("ascii") + b">"
+                    is_simple = False
+                content.append("/{0} {1} Tf ".format(font_resource(font_name, is_simple), font_size).encode("ascii")
+                               + data + b" Tj")
+        content.append(b"ET")
+        page_contents.append(b"\n".join(content))
+
+    for (font_name, is_simple), a_font in fonts.items():
+        descriptor = add_object("<< /Type /FontDescriptor /FontName /{0} /Flags 32 /FontBBox [0 -200 1000 800] "
+                                "/ItalicAngle 0 /Ascent 800 /Descent -200 /CapHeight 700 /StemV 80 >>"
+                                .format(font_name).encode("ascii"))
+        if is_simple:
+            a_font['object'] = add_object(
+                "<< /Type /Font /Subtype /Type1 /BaseFont /{0} /Encoding /WinAnsiEncoding /FirstChar 0 "
+                "/LastChar 255 /Widths [{1}] /FontDescriptor {2} 0 R >>"
+                .format(font_name, " ".join(["500"] * 256), descriptor).encode("ascii"))
+            continue
+        mappings = ["<{0:04X}> <{1}>".format(code, a_char.encode("utf-16-be").hex().upper())
+                    for a_char, code in unicode_codes[font_name].items()]
+        cmap = ("/CIDInit /ProcSet findresource begin 12 dict begin begincmap /CIDSystemInfo << /Registry (Adobe) "
+                "/Ordering (UCS) /Supplement 0 >> def /CMapName /Adobe-Identity-UCS def /CMapType 2 def\n"
+                "1 begincodespacerange <0000> <FFFF> endcodespacerange\n" +
+                "".join("{0} beginbfchar\n{1}\nendbfchar\n".format(len(mappings[i:i + 100]),
+                                                                   "\n".join(mappings[i:i + 100]))
+                        for i in range(0, len(mappings), 100)) +
+                "endcmap CMapName currentdict /CMap defineresource pop end end").encode("ascii")
+        to_unicode = add_object("<< /Length {0} >>\nstream\n".format(len(cmap)).encode("ascii") + cmap +
+                                b"\nendstream")
+        descendant = add_object("<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{0} /CIDSystemInfo << /Registry "
+                                "(Adobe) /Ordering (Identity) /Supplement 0 >> /DW 500 /FontDescriptor {1} 0 R >>"
+                                .format(font_name, descriptor)
+                                .encode("ascii"))
+        a_font['object'] = add_object("<< /Type /Font /Subtype /Type0 /BaseFont /{0} /Encoding /Identity-H "
+                                      "/DescendantFonts [{1} 0 R] /ToUnicode {2} 0 R >>"
+                                      .format(font_name, descendant, to_unicode).encode("ascii"))
+    resources = "<< /Font << {0} >> >>".format(" ".join("/{0} {1} 0 R".format(a_font['name'], a_font['object'])
+                                                        for a_font in fonts.values()))
+    page_objects = []
+    for content in page_contents:
+        content_object = add_object("<< /Length {0} >>\nstream\n".format(len(content)).encode("ascii") + content +
+                                    b"\nendstream")
+        page_objects.append(add_object("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources {0} "
+                                       "/Contents {1} 0 R >>".format(resources, content_object).encode("ascii")))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = "<< /Type /Pages /Kids [{0}] /Count {1} >>".format(
+        " ".join("{0} 0 R".format(an_object) for an_object in page_objects), len(page_objects)).encode("ascii")
+
+    with open(pdf_file, "wb") as f_out:
+        f_out.write(b"%PDF-1.4\n")
+        offsets = []
+        for i, an_object in enumerate(objects):
+            offsets.append(f_out.tell())
+            f_out.write("{0} 0 obj\n".format(i + 1).encode("ascii") + an_object + b"\nendobj\n")
+        xref_offset = f_out.tell()
+        f_out.write("xref\n0 {0}\n0000000000 65535 f \n".format(len(objects) + 1).encode("ascii"))
+        for an_offset in offsets:
+            f_out.write("{0:010d} 00000 n \n".format(an_offset).encode("ascii"))
+        f_out.write("trailer\n<< /Size {0} /Root 1 0 R >>\nstartxref\n{1}\n%%EOF\n"
+                    .format(len(objects) + 1, xref_offset).encode("ascii"))
+
+
+def benchmark_engines(pages: List[bytes], engines=("soup", "lxml"), repeats: int = 3) -> Dict:
+    """
+    Measures how many pages per second parse_xhtml_contents parses with every engine, and checks that
+    the engines produce the same records
+    :param pages: xhtml pages
+    :param repeats: The best of this many runs is reported
+    :return: A dict with pages/sec and MB/sec of every engine and the indices of the mismatched pages
+    """
+    page_bytes = sum(len(a_page) for a_page in pages)
+    results = {'pages': len(pages), 'bytes': page_bytes, 'engines': {}}
+    records = {}
+    for engine in engines:
+        best = None
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            records[engine] = [parse_xhtml_contents(a_page, engine) for a_page in pages]
+            elapsed = time.perf_counter() - start_time
+            best = elapsed if best is None else min(best, elapsed)
+        results['engines'][engine] = {'seconds': best,
+                                      'pages_per_second': len(pages) / best if best else 0.0,
+                                      'mb_per_second': page_bytes / best / 1e6 if best else 0.0}
+    results['mismatched_pages'] = [i for i in range(len(pages))
+                                   if any(records[engine][i] != records[engines[0]][i] for engine in engines)]
+    return results
+
+
+def synthetic_pdf(pdf_file: str, n_pages: int, lines: int = 45, seed: int = 0) -> None:
+    """
+    Writes a pdf of random bengali (unicode) lines, with an english line now and then
+    """
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(n_pages):
+        a_page = []
+        for _ in range(lines):
+            if rng.random() < 0.2:
+                a_line = "The quick brown fox jumps over the lazy dog {0}".format(rng.randint(1, 99))
+                a_page.append([("Helvetica", a_line)])
+            else:
+                a_line = synthetic_text(70, seed=rng.random()).replace("\n", " ").strip()
+                a_page.append([("Kalpurush", a_line)])
+        pages.append(a_page)
+    write_sample_pdf(pdf_file, pages)
+
+
+def _words(text: str) -> Counter:
+    return Counter(text.split())
+
+
+def benchmark_pdf_modes(pdf_file: str, modes=("layout", "text"), repeats: int = 1) -> Dict:
+    """
+    Measures how many pages per second pdf_iter extracts in every mode. The quality of a mode is the share
+    of the words of the layout mode that it finds (word recall) and whether its lines are the same.
+    :param repeats: The best of this many runs is reported
+    :return: A dict with pages/sec, chars/sec, word recall and line match rate of every mode
+    """
+    results = {'pdf': pdf_file, 'modes': {}}
+    texts = {}
+    for mode in modes:
+        best = None
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            texts[mode] = [a_record['text'] for a_record in pdf_iter(pdf_file, mode=mode)]
+            elapsed = time.perf_counter() - start_time
+            best = elapsed if best is None else min(best, elapsed)
+        n_chars = sum(len(a_text) for a_text in texts[mode])
+        results['pages'] = len(texts[mode])
+        results['modes'][mode] = {'seconds': best,
+                                  'pages_per_second': len(texts[mode]) / best if best else 0.0,
+                                  'chars_per_second': n_chars / best if best else 0.0}
+    reference = texts["layout"] if "layout" in texts else texts[modes[0]]
+    reference_words = sum((_words(a_text) for a_text in reference), Counter())
+    reference_lines = [a_line.strip() for a_text in reference for a_line in a_text.splitlines() if a_line.strip()]
+    for mode in modes:
+        words = sum((_words(a_text) for a_text in texts[mode]), Counter())
+        lines = {a_line.strip() for a_text in texts[mode] for a_line in a_text.splitlines()}
+        results['modes'][mode]['word_recall'] = \
+            sum((words & reference_words).values()) / max(1, sum(reference_words.values()))
+        results['modes'][mode]['line_match_rate'] = \
+            sum(a_line in lines for a_line in reference_lines) / max(1, len(reference_lines))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares the speed of the xhtml parse engines or of the pdf "
+                                                 "extraction modes")
+    parser.add_argument("--epubs", action="store", default=None, type=str, nargs="+",
+                        help="Epub files, directories or glob patterns to take the pages from")
+    parser.add_argument("--pages", action="store", default=200, type=int,
+                        help="Number of synthetic pages, if no epub is given")
+    parser.add_argument("--repeats", action="store", default=3, type=int,
+                        help="The best of this many runs is reported")
+    parser.add_argument("--pdf", action="store", default=None, type=str,
+                        help="Benchmarks the pdf extraction modes on this pdf instead of the xhtml engines. "
+                             "A pdf of --pages synthetic pages is generated here if it does not exist.")
+    args = parser.parse_args()
+
+    if args.pdf:
+        if not os.path.exists(args.pdf):
+            synthetic_pdf(args.pdf, args.pages)
+        json.dump(benchmark_pdf_modes(args.pdf, repeats=args.repeats), sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return
+
+    if args.epubs:
+        pages = []
+        for epub_file in list_epub_files(args.epubs):
+            with EpubReader(epub_file) as epub:
+                pages.extend(a_page['xhtml_content'] for a_page in epub.pages())
+    else:
+        pages = synthetic_pages(args.pages)
+    results = benchmark_engines(pages, repeats=args.repeats)
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    if results['mismatched_pages']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import json
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class ExtractionCache:
+    """
+    A persistent (sqlite) cache of the parsed epub records. The parsed contents of a page are keyed by
+    the md5 hash of the xhtml (so a page shared by two books is parsed only once), and the meta and the
+    list of pages of a book by the md5 hash of the epub. Everything is keyed by the parse engine as well.
+    The least recently used entries are evicted when the cache grows beyond max_size bytes.
+    """
+
+    def __init__(self, cache_file: str, max_size: int = None, timeout: float = 60.0) -> None:
+        """
+        :param cache_file: Path of the sqlite database
+        :param max_size: Maximum size (in bytes) of the cached records. Unlimited if not given
+        :param timeout: Seconds to wait for another process that is writing to the cache
+        """
+        self.cache_file = cache_file
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(cache_file, timeout=timeout)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS pages (xhtml_md5_hash TEXT, engine TEXT, "
+                                    "record TEXT, size INTEGER, last_used REAL, "
+                                    "PRIMARY KEY (xhtml_md5_hash, engine))")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS books (epub_md5_hash TEXT, engine TEXT, "
+                                    "meta TEXT, pages TEXT, size INTEGER, last_used REAL, "
+                                    "PRIMARY KEY (epub_md5_hash, engine))")
+
+    def __enter__(self) -> "ExtractionCache":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def _count(self, found: bool) -> None:
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def get_page(self, xhtml_md5_hash: str, engine: str) -> Optional[Dict]:
+        """
+        Returns the parsed contents of a page (as in parse_xhtml_contents), or None if it is not cached
+        """
+        row = self.connection.execute("SELECT record FROM pages WHERE xhtml_md5_hash = ? AND engine = ?",
+                                      (xhtml_md5_hash, engine)).fetchone()
+        self._count(row is not None)
+        if row is None:
+            return None
+        with self.connection:
+            self.connection.execute("UPDATE pages SET last_used = ? WHERE xhtml_md5_hash = ? AND engine = ?",
+                                    (time.time(), xhtml_md5_hash, engine))
+        return json.loads(row[0])
+
+    def put_page(self, xhtml_md5_hash: str, engine: str, record: Dict) -> None:
+        record = json.dumps(record, ensure_ascii=False)
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                                    (xhtml_md5_hash, engine, record, len(record.encode("utf-8")), time.time()))
+
+    def _get_book(self, epub_md5_hash: str, engine: str, column: str) -> Optional[str]:
+        row = self.connection.execute("SELECT {0} FROM books WHERE epub_md5_hash = ? AND engine = ?".format(column),
+                                      (epub_md5_hash, engine)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        with self.connection:
+            self.connection.execute("UPDATE books SET last_used = ? WHERE epub_md5_hash = ? AND engine = ?",
+                                    (time.time(), epub_md5_hash, engine))
+        return row[0]
+
+    def _put_book(self, epub_md5_hash: str, engine: str, column: str, value: str) -> None:
+        with self.connection:
+            self.connection.execute("INSERT OR IGNORE INTO books VALUES (?, ?, NULL, NULL, 0, ?)",
+                                    (epub_md5_hash, engine, time.time()))
+            self.connection.execute("UPDATE books SET {0} = ?, last_used = ? "
+                                    "WHERE epub_md5_hash = ? AND engine = ?".format(column),
+                                    (value, time.time(), epub_md5_hash, engine))
+            self.connection.execute("UPDATE books SET size = length(CAST(coalesce(meta, '') AS BLOB)) + "
+                                    "length(CAST(coalesce(pages, '') AS BLOB)) "
+                                    "WHERE epub_md5_hash = ? AND engine = ?", (epub_md5_hash, engine))
+
+    def get_meta(self, epub_md5_hash: str, engine: str) -> Optional[Dict]:
+        """
+        Returns the meta of a book (as in epub_get_meta), or None if it is not cached
+        """
+        meta = self._get_book(epub_md5_hash, engine, "meta")
+        self._count(meta is not None)
+        return json.loads(meta) if meta is not None else None
+
+    def put_meta(self, epub_md5_hash: str, engine: str, meta: Dict) -> None:
+        self._put_book(epub_md5_hash, engine, "meta", json.dumps(meta, ensure_ascii=False))
+
+    def get_book(self, epub_md5_hash: str, engine: str) -> Optional[List[Dict]]:
+        """
+        Returns all the records of a book (as in epub_extract_contents), or None if the book or any of its
+        pages is not cached. Only a hit is counted, on a miss the pages are looked up (and counted) one by one.
+        """
+        pages = self._get_book(epub_md5_hash, engine, "pages")
+        if pages is None:
+            return None
+        records = []
+        for i, (xhtml_href, xhtml_md5_hash) in enumerate(json.loads(pages)):
+            row = self.connection.execute("SELECT record FROM pages WHERE xhtml_md5_hash = ? AND engine = ?",
+                                          (xhtml_md5_hash, engine)).fetchone()
+            if row is None:
+                return None
+            record = {'xhtml_md5_hash': xhtml_md5_hash, 'epub_md5_hash': epub_md5_hash,
+                      'xhtml_href': xhtml_href, 'xhtml_index': i}
+            record.update(json.loads(row[0]))
+            records.append(record)
+        with self.connection:
+            self.connection.executemany("UPDATE pages SET last_used = ? WHERE xhtml_md5_hash = ? AND engine = ?",
+                                        [(time.time(), a_record['xhtml_md5_hash'], engine) for a_record in records])
+        self._count(True)
+        return records
+
+    def put_book(self, epub_md5_hash: str, engine: str, pages: List[Tuple[str, str]]) -> None:
+        """
+        Stores the (xhtml_href, xhtml_md5_hash) of the pages of a book in the reading order. The parsed
+        pages themselves are stored by put_page.
+        """
+        self._put_book(epub_md5_hash, engine, "pages", json.dumps(pages, ensure_ascii=False))
+
+    def size(self) -> int:
+        """
+        Total size of the cached records in bytes
+        """
+        return sum(self.connection.execute("SELECT coalesce(sum(size), 0) FROM {0}".format(table)).fetchone()[0]
+                   for table in ["pages", "books"])
+
+    def evict(self) -> int:
+        """
+        Deletes the least recently used pages and books until the cache is not larger than max_size
+        :return: Number of deleted entries
+        """
+        if self.max_size is None:
+            return 0
+        excess = self.size() - self.max_size
+        entries = self.connection.execute(
+            "SELECT 'pages', xhtml_md5_hash, engine, size, last_used FROM pages UNION ALL "
+            "SELECT 'books', epub_md5_hash, engine, size, last_used FROM books ORDER BY last_used")
+        to_delete = []
+        for table, key, engine, size, _ in entries:
+            if excess <= 0:
+                break
+            to_delete.append((table, key, engine))
+            excess -= size
+        with self.connection:
+            for table, key, engine in to_delete:
+                self.connection.execute("DELETE FROM {0} WHERE {1} = ? AND engine = ?".format(
+                    table, "xhtml_md5_hash" if table == "pages" else "epub_md5_hash"), (key, engine))
+        return len(to_delete)
+
+    def clear(self) -> None:
+        """
+        Empties the cache and resets the statistics
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM pages")
+            self.connection.execute("DELETE FROM books")
+        self.hits = 0
+        self.misses = 0
+
+    def cache_info(self) -> Dict:
+        """
+        Returns the hits, misses, hit rate, number of pages and books, size and maximum size of the cache
+        """
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0,
+                'pages': self.connection.execute("SELECT count(*) FROM pages").fetchone()[0],
+                'books': self.connection.execute("SELECT count(*) FROM books").fetchone()[0],
+                'size': self.size(), 'max_size': self.max_size}
@@ -1,21 +1,302 @@
 import os
 import sys
+import glob
+import gzip
 import json
+import time
+import hashlib
 import argparse
-from typing import Iterator, List, Dict
+import itertools
+from collections import deque
+from multiprocessing import Pool
+from io import BytesIO
+from typing import Iterable, Iterator, List, Dict, Tuple
 import zipfile as zf
 
 from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
 from pdfminer.layout import LAParams
 from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
 from pdfminer.converter import PDFPageAggregator
 from pdfminer.pdfpage import PDFPage
-from pdfminer.layout import LTTextBoxHorizontal
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfdevice import PDFDevice
+from pdfminer.pdffont import PDFUnicodeNotDefined
+from pdfminer.layout import LTTextBoxHorizontal, LTChar
 
-from shobdokutir.encoding.utils import file_hash
+from shobdokutir.ebook.cache import ExtractionCache
+from shobdokutir.encoding.fonts import BIJOY_FONTS, is_bijoy_font
+from shobdokutir.encoding.utils import bijoy2unicode
 
 
-def epub_get_meta(epub_file: str) -> Dict:
+# Tags whose strings BeautifulSoup leaves out of the text of the enclosing tags
+_string_containers = ("script", "style", "template", "rt", "rp")
+# Tags in which BeautifulSoup keeps the whitespace-only strings as they are
+_preserve_whitespace_tags = ("pre", "textarea")
+_ascii_spaces = "\x20\x0a\x09\x0c\x0d"
+_lxml_parser = lxml_html.HTMLParser(encoding="utf-8")
+_lxml_main_text = etree.XPath(
+    "descendant::text()[not({0})]".format(" or ".join("ancestor::" + a_tag for a_tag in _string_containers)))
+
+
+def _check_engine(engine: str) -> None:
+    if engine not in ("soup", "lxml"):
+        raise ValueError("engine must be either soup or lxml")
+
+
+def _lxml_parse(xhtml: bytes) -> etree.ElementBase:
+    """
+    Parses utf-8 encoded (x)html with the same lxml html parser that BeautifulSoup(..., "lxml") uses
+    """
+    return lxml_html.document_fromstring(xhtml, parser=_lxml_parser)
+
+
+def _lxml_string(a_string: str, preserve: bool) -> str:
+    """
+    BeautifulSoup collapses a whitespace-only string to a single newline (if it has one) or space
+    """
+    if preserve or a_string.strip(_ascii_spaces):
+        return a_string
+    return "\n" if "\n" in a_string else " "
+
+
+def _lxml_in_preserved(element: etree.ElementBase) -> bool:
+    """
+    Checks if an element is (within) a pre or textarea tag
+    """
+    while element is not None:
+        if element.tag in _preserve_whitespace_tags:
+            return True
+        element = element.getparent()
+    return False
+
+
+def _lxml_string_in_preserved(a_string: etree._ElementUnicodeResult) -> bool:
+    """
+    Checks if a string found by xpath is within a pre or textarea tag
+    """
+    return _lxml_in_preserved(a_string.getparent().getparent() if a_string.is_tail else a_string.getparent())
+
+
+def _lxml_get_text(element: etree.ElementBase) -> str:
+    """
+    Equivalent of BeautifulSoup's get_text for an lxml element. The strings within script, style, template,
+    rt and rp tags belong to those tags only, comments are left out, and the whitespace-only strings are
+    collapsed as BeautifulSoup does.
+    """
+    if element.tag not in _string_containers:
+        return "".join([a_string if a_string.strip(_ascii_spaces) else
+                        _lxml_string(a_string, _lxml_string_in_preserved(a_string))
+                        for a_string in _lxml_main_text(element)])
+    parts = []
+
+    def collect(an_element, container, preserve):
+        if an_element.tag in _string_containers:
+            container = an_element.tag
+        preserve = preserve or an_element.tag in _preserve_whitespace_tags
+        if an_element.text and container == element.tag:
+            parts.append(_lxml_string(an_element.text, preserve))
+        for a_child in an_element:
+            if isinstance(a_child.tag, str):
+                collect(a_child, container, preserve)
+            if a_child.tail and container == element.tag:
+                parts.append(_lxml_string(a_child.tail, preserve))
+
+    collect(element, None, _lxml_in_preserved(element))
+    return "".join(parts)
+
+
+def _find_content_file(epub: zf.ZipFile) -> str:
+    content_file = [a_file for a_file in epub.namelist() if "content.opf" in a_file.lower()]
+    if not content_file:
+        raise Exception("content.opf file not found in epub")
+    return content_file[0]
+
+
+def _extract_meta(content: str, epub_filename: str, md5_hash: str, engine: str = "soup") -> Dict:
+    """
+    Parses a cleaned content.opf into the metadata schema of epub_get_meta
+    """
+    _check_engine(engine)
+    if engine == "lxml":
+        return _extract_meta_lxml(content, epub_filename, md5_hash)
+    output_blob = {'md5_hash': md5_hash, 'epub_filename': epub_filename, 'content_str': content}
+    content_parsed = BeautifulSoup(content, "lxml")
+    if content_parsed.metadata is None:
+        output_blob['all_ids'] = None
+        output_blob['title'] = None
+        output_blob['creator'] = None
+    else:
+        all_ids = []
+        all_id_tags = content_parsed.find_all("dc:identifier")
+        for an_id in all_id_tags:
+            an_id_attrs = {a_key.replace(":", "_"): an_id.attrs[a_key] for a_key in an_id.attrs}
+            all_ids.append({"value": an_id.text, "attrs": an_id_attrs})
+        output_blob['all_ids'] = all_ids
+        title = content_parsed.find("dc:title")
+        output_blob['title'] = title.text if title is not None else None
+        creator = content_parsed.find("dc:creator")
+        output_blob['creator'] = creator.text if creator is not None else None
+
+    if content_parsed.manifest is None:
+        output_blob['manifest'] = None
+    else:
+        output_blob['manifest'] = [{'id':an_item['id'], 'item':an_item['href'], 'media_type':an_item['media-type']} 
+                                            for an_item in content_parsed.manifest.find_all("item")]
+    if content_parsed.spine is None:
+        output_blob['spine'] = None
+    else:
+        output_blob['spine'] = [an_itemref['idref'] for an_itemref in content_parsed.spine.find_all('itemref')]
+
+    return output_blob
+
+
+def _extract_meta_lxml(content: str, epub_filename: str, md5_hash: str) -> Dict:
+    """
+    Same as _extract_meta, using lxml directly instead of BeautifulSoup
+    """
+    output_blob = {'md5_hash': md5_hash, 'epub_filename': epub_filename, 'content_str': content}
+    content_parsed = _lxml_parse(content.encode("utf-8"))
+    if content_parsed.find(".//metadata") is None:
+        output_blob['all_ids'] = None
+        output_blob['title'] = None
+        output_blob['creator'] = None
+    else:
+        output_blob['all_ids'] = [{"value": _lxml_get_text(an_id),
+                                   "attrs": {a_key.replace(":", "_"): an_id.attrib[a_key] for a_key in an_id.attrib}}
+                                  for an_id in content_parsed.iter("dc:identifier")]
+        title = content_parsed.find(".//dc:title")
+        output_blob['title'] = _lxml_get_text(title) if title is not None else None
+        creator = content_parsed.find(".//dc:creator")
+        output_blob['creator'] = _lxml_get_text(creator) if creator is not None else None
+
+    manifest = content_parsed.find(".//manifest")
+    if manifest is None:
+        output_blob['manifest'] = None
+    else:
+        output_blob['manifest'] = [{'id': an_item.attrib['id'], 'item': an_item.attrib['href'],
+                                    'media_type': an_item.attrib['media-type']} for an_item in manifest.iter("item")]
+    spine = content_parsed.find(".//spine")
+    if spine is None:
+        output_blob['spine'] = None
+    else:
+        output_blob['spine'] = [an_itemref.attrib['idref'] for an_itemref in spine.iter("itemref")]
+
+    return output_blob
+
+
+class EpubReader:
+    """
+    Reads an epub through a single open ZipFile. The md5 hash of the epub is computed while the file is
+    read, and the md5 hash of every page while the page itself is read, so no data is read twice.
+    Epubs up to max_memory bytes are read into memory in one pass; a larger epub is hashed in a separate
+    sequential pass and then read from the disk. The meta, the spine and the pages are read lazily.
+    The meta is parsed with the given engine ("soup" for BeautifulSoup or "lxml").
+
+    with EpubReader(epub_file) as epub:
+        for a_page in epub.pages():
+            ...
+    """
+
+    def __init__(self, epub_file: str, max_memory: int = 64 * 1024 * 1024, buffer_size: int = 65536,
+                 engine: str = "soup") -> None:
+        """
+        :param epub_file: Full path of the epub file
+        :param max_memory: Largest epub (in bytes) that is read into memory
+        :param buffer_size: Size of the reads while hashing
+        :param engine: Parser of the meta, "soup" or "lxml"
+        """
+        _check_engine(engine)
+        self.epub_file = epub_file
+        self.engine = engine
+        md5 = hashlib.md5()
+        if os.path.getsize(epub_file) <= max_memory:
+            epub_data = BytesIO()
+            with open(epub_file, "rb") as f_in:
+                for data in iter(lambda: f_in.read(buffer_size), b""):
+                    md5.update(data)
+                    epub_data.write(data)
+            self.zip = zf.ZipFile(epub_data)
+        else:
+            with open(epub_file, "rb") as f_in:
+                for data in iter(lambda: f_in.read(buffer_size), b""):
+                    md5.update(data)
+            self.zip = zf.ZipFile(epub_file)
+        self.md5_hash = md5.hexdigest()
+        self._meta = None
+        self._spine = None
+
+    def __enter__(self) -> "EpubReader":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.zip.close()
+
+    def read_member(self, name: str) -> Tuple[bytes, str]:
+        """
+        Reads a member of the epub
+        :return: The contents of the member and their md5 hash
+        """
+        contents = self.zip.read(name)
+        return contents, hashlib.md5(contents).hexdigest()
+
+    @property
+    def meta(self) -> Dict:
+        """
+        The meta of the epub, as described in epub_get_meta
+        """
+        if self._meta is None:
+            root_folder, content_file = os.path.split(_find_content_file(self.zip))
+            with self.zip.open(os.path.join(root_folder, content_file)) as meta_file:
+                meta_data = clean_xhtml_code(meta_file.read())
+            _, epub_filename = os.path.split(self.epub_file)
+            self._meta = _extract_meta(meta_data, epub_filename, self.md5_hash, self.engine)
+            self._meta['root_folder'] = root_folder
+        return self._meta
+
+    @property
+    def spine(self) -> List[str]:
+        """
+        The names of the xhtml members of the epub in the reading order
+        """
+        if self._spine is None:
+            meta_data = self.meta
+            if 'spine' not in meta_data or meta_data['spine'] is None or \
+                    'manifest' not in meta_data or meta_data['manifest'] is None:
+                raise Exception(
+                    "Critical metainfo was not found in: {0}".format(self.epub_file))
+            manifest_map = {
+                manifest_item['id']: manifest_item for manifest_item in meta_data['manifest']}
+            epub_nameset = set(self.zip.namelist())
+            spine = []
+            for idref in meta_data['spine']:
+                if not idref in manifest_map:
+                    raise Exception("Spine content was not found in manifest {0}".format(self.epub_file))
+                xhtml = os.path.join(meta_data['root_folder'], manifest_map[idref]['item'])
+                if xhtml not in epub_nameset:
+                    xhtml_temp = xhtml.replace("%20", " ")
+                    if xhtml_temp in epub_nameset:
+                        xhtml = xhtml_temp
+                spine.append(xhtml)
+            self._spine = spine
+        return self._spine
+
+    def pages(self) -> Iterator[Dict]:
+        """
+        Lazily reads the xhtml pages of the epub in the reading order
+        :return: Iterator of dicts with xhtml_content, xhtml_md5_hash, epub_md5_hash, xhtml_href and xhtml_index
+        """
+        for i, xhtml in enumerate(self.spine):
+            xhtml_content, xhtml_md5_hash = self.read_member(xhtml)
+            yield {'xhtml_content': xhtml_content, 'xhtml_md5_hash': xhtml_md5_hash,
+                   'epub_md5_hash': self.md5_hash, 'xhtml_href': xhtml, 'xhtml_index': i}
+
+
+def epub_get_meta(epub_file: str, engine: str = "soup", cache: ExtractionCache = None) -> Dict:
     """
     Reads the content.opf file of an epub and produces a dict with the following schema.
     The schema is designed to be stored as a bigquery table.
@@ -28,92 +309,42 @@ def epub_get_meta(epub_file: str) -> Dict:
 
     ## Spine Schema
     [idref, idref, ...]
+
+    The content.opf is parsed with BeautifulSoup, or with lxml directly if engine is "lxml".
+    If a cache is given, the meta of an epub that is already in the cache is not parsed again.
     """
-    def find_content_file(epub) -> str:
-        content_file = [a_file for a_file in epub.namelist() if "content.opf" in a_file.lower()]
-        if not content_file:
-            raise Exception("content.opf file not found in epub")
-        return content_file[0]
-
-    def extract_meta(content, epub_file) -> Dict:
-        _, epub_filename = os.path.split(epub_file)
-        output_blob = {'md5_hash': file_hash(open(epub_file, "rb")), 'epub_filename': epub_filename, 'content_str': content}
-        content_parsed = BeautifulSoup(content, "lxml")
-        if content_parsed.metadata is None:
-            output_blob['all_ids'] = None
-            output_blob['title'] = None
-            output_blob['creator'] = None
-        else:
-            all_ids = []
-            all_id_tags = content_parsed.find_all("dc:identifier")
-            for an_id in all_id_tags:
-                an_id_attrs = {a_key.replace(":", "_"): an_id.attrs[a_key] for a_key in an_id.attrs}
-                all_ids.append({"value": an_id.text, "attrs": an_id_attrs})
-            output_blob['all_ids'] = all_ids
-            title = content_parsed.find("dc:title")
-            output_blob['title'] = title.text if title is not None else None
-            creator = content_parsed.find("dc:creator")
-            output_blob['creator'] = creator.text if creator is not None else None
-
-        if content_parsed.manifest is None:
-            output_blob['manifest'] = None
+    with EpubReader(epub_file, engine=engine) as epub:
+        if cache is None:
+            return epub.meta
+        meta = cache.get_meta(epub.md5_hash, engine)
+        if meta is None:
+            meta = epub.meta
+            cache.put_meta(epub.md5_hash, engine, meta)
         else:
-            output_blob['manifest'] = [{'id':an_item['id'], 'item':an_item['href'], 'media_type':an_item['media-type']} 
-                                                for an_item in content_parsed.manifest.find_all("item")]
-        if content_parsed.spine is None:
-            output_blob['spine'] = None
-        else:
-            output_blob['spine'] = [an_itemref['idref'] for an_itemref in content_parsed.spine.find_all('itemref')]
-
-        return output_blob
-
-    with zf.ZipFile(epub_file) as epub:
-        content_file = find_content_file(epub)
-        root_folder, content_file = os.path.split(content_file)
-        with epub.open(os.path.join(root_folder, content_file)) as meta_file:
-            meta_data = clean_xhtml_code(meta_file.read())
-            return_dict = extract_meta(meta_data, epub_file)
-            return_dict['root_folder'] = root_folder
-            return return_dict
+            _, meta['epub_filename'] = os.path.split(epub_file)
+        return meta
 
 
 def clean_xhtml_code(xhtml: str) -> str:
     return " ".join(xhtml.decode("utf-8").split('\n'))
 
 
-def epub_xhtml_iter(epub_file: str) -> str:
+def epub_xhtml_iter(epub_file: str) -> Iterator[Dict]:
     """
     An iterator that yields the xhtml contents of an epub and other info
     """
-    meta_data = epub_get_meta(epub_file)
-    if 'spine' not in meta_data or meta_data['spine'] is None or \
-            'manifest' not in meta_data or meta_data['manifest'] is None:
-        raise Exception(
-            "Critical metainfo was not found in: {0}".format(epub_file))
-    manifest_map = {
-        manifest_item['id']: manifest_item for manifest_item in meta_data['manifest']}
-    with zf.ZipFile(epub_file) as epub:
-        epub_nameset = set(epub.namelist())
-        for i, idref in enumerate(meta_data['spine']):
-            if not idref in manifest_map:
-                raise Exception("Spine content was not found in manifest {0}".format(epub_file))
-            xhtml = os.path.join(meta_data['root_folder'], manifest_map[idref]['item'])
-            if xhtml not in epub_nameset:
-                xhtml_temp = xhtml.replace("%20", " ")
-                if xhtml_temp in epub_nameset:
-                    xhtml = xhtml_temp
-            with epub.open(xhtml) as epub_page:
-                xhtml_md5_hash = file_hash(epub_page)
-            with epub.open(xhtml) as epub_page:
-                xhtml_content = epub_page.read()
-            yield {'xhtml_content': xhtml_content, 'xhtml_md5_hash': xhtml_md5_hash,
-                   'epub_md5_hash': meta_data['md5_hash'], 'xhtml_href': xhtml, 'xhtml_index': i}
+    with EpubReader(epub_file) as epub:
+        yield from epub.pages()
 
 
-def parse_xhtml_contents(xhtml: str) -> Dict:
+def parse_xhtml_contents(xhtml: str, engine: str = "soup") -> Dict:
     """
     Given an xhtml code, extracts the relevant contents
+    :param engine: "soup" parses with BeautifulSoup, "lxml" with lxml directly (faster, same records)
     """
+    _check_engine(engine)
+    if engine == "lxml":
+        return _parse_xhtml_contents_lxml(xhtml)
     cleaned_content = clean_xhtml_code(xhtml)
     parsed_content = BeautifulSoup(cleaned_content, "lxml")
     
@@ -136,7 +367,36 @@ def parse_xhtml_contents(xhtml: str) -> Dict:
     return record
 
 
-def epub_extract_contents(epub_file: str) -> List[str]:
+def _parse_xhtml_contents_lxml(xhtml: bytes) -> Dict:
+    """
+    Same as parse_xhtml_contents, using lxml directly instead of BeautifulSoup
+    """
+    # same as clean_xhtml_code, without splitting the page into lines
+    xhtml = xhtml.replace(b"\n", b" ")
+    parsed_content = _lxml_parse(xhtml)
+    body = parsed_content.find("body")
+    title = parsed_content.find(".//title")
+
+    text_split = []
+    text_split_type = []
+    for a_tag in body:
+        if not isinstance(a_tag.tag, str):
+            continue
+        tag_text = _lxml_get_text(a_tag)
+        if tag_text.strip():
+            text_split.append(tag_text)
+            text_split_type.append(a_tag.tag)
+
+    record = {'xhtml_code': xhtml.decode("utf-8"),
+              'title': _lxml_get_text(title) if title is not None else "",
+              'text': _lxml_get_text(body),
+              'text_split': text_split,
+              'text_split_type': text_split_type
+              }
+    return record
+
+
+def epub_extract_contents(epub_file: str, engine: str = "soup", cache: ExtractionCache = None) -> List[str]:
     """
     Reads the xhtml files of an epub and produces a list of json strings with the following schema.
     The schema is designed to be stored as a bigquery table.
@@ -153,23 +413,54 @@ def epub_extract_contents(epub_file: str) -> List[str]:
     text_split_type
     ---------------
     [h1, h2, p, ... ]
+
+    The pages are parsed with BeautifulSoup, or with lxml directly if engine is "lxml".
+    If a cache is given, the books and the pages that are already in the cache are not parsed again.
     """
-    output_records = []
-    for a_page in epub_xhtml_iter(epub_file):
-        record = {a_key: a_page[a_key] for a_key in a_page if not a_key == 'xhtml_content'}
-        parsed_xhtml = parse_xhtml_contents(a_page['xhtml_content'])
-        record.update(parsed_xhtml)
-        output_records.append(record)
-    return output_records
+    return list(epub_extract_contents_iter(epub_file, engine, cache))
 
 
-def epub_iter(epub_file: str) -> Iterator[Dict]:
+def epub_extract_contents_iter(epub_file: str, engine: str = "soup",
+                               cache: ExtractionCache = None) -> Iterator[Dict]:
+    """
+    Lazy version of epub_extract_contents that yields the records one page at a time
+    """
+    with EpubReader(epub_file, engine=engine) as epub:
+        if cache is not None:
+            records = cache.get_book(epub.md5_hash, engine)
+            if records is not None:
+                yield from records
+                return
+        pages = []
+        for a_page in epub.pages():
+            record = {a_key: a_page[a_key] for a_key in a_page if not a_key == 'xhtml_content'}
+            parsed_xhtml = cache.get_page(a_page['xhtml_md5_hash'], engine) if cache is not None else None
+            if parsed_xhtml is None:
+                parsed_xhtml = parse_xhtml_contents(a_page['xhtml_content'], engine)
+                if cache is not None:
+                    cache.put_page(a_page['xhtml_md5_hash'], engine, parsed_xhtml)
+            record.update(parsed_xhtml)
+            pages.append((a_page['xhtml_href'], a_page['xhtml_md5_hash']))
+            yield record
+        if cache is not None:
+            cache.put_book(epub.md5_hash, engine, pages)
+
+
+def epub_iter(epub_file: str, engine: str = "soup") -> Iterator[Dict]:
     """
     A python generator that iterates over the html files within an epub file.
     :param epub_file: Full path of the file
+    :param engine: "soup" parses with BeautifulSoup, "lxml" with lxml directly
     :return: Iterator containing a dictionary of 'title' and body ('text') texts for each html within the epub
     """
+    _check_engine(engine)
     for an_item in epub_xhtml_iter(epub_file):
+        if engine == "lxml":
+            text_seg = _lxml_parse(an_item['xhtml_content'])
+            title = text_seg.find(".//title")
+            yield {'title': _lxml_get_text(title) if title is not None else "",
+                   'text': _lxml_get_text(text_seg.find("body"))}
+            continue
         text_seg = BeautifulSoup(an_item['xhtml_content'].decode(), 'lxml')
         yield {'title': text_seg.title.get_text() if text_seg.title else "", 'text': text_seg.body.get_text()}
 
@@ -186,58 +477,435 @@ def read_epub(epub_file: str) -> List[Dict]:
     return full_text
 
 
-def pdf_iter(pdf_file: str, accumulate_per_page: bool = True) -> Iterator[Dict]:
+class BijoyRuns:
+    """
+    Collects the text of a pdf page as runs of consecutive characters that are either set in a bijoy font
+    or not. Only the bijoy runs are converted to unicode, so that a page mixing bijoy, unicode and
+    english text comes out entirely in unicode.
+    """
+
+    def __init__(self, bijoy_fonts: Iterable[str] = None) -> None:
+        """
+        :param bijoy_fonts: Patterns of the bijoy font families (see encoding.fonts). Nothing is converted if None
+        """
+        self.bijoy_fonts = tuple(bijoy_fonts) if bijoy_fonts is not None else None
+        self.runs = []
+
+    def is_bijoy(self, font_name: str) -> bool:
+        return self.bijoy_fonts is not None and is_bijoy_font(font_name, self.bijoy_fonts)
+
+    def add(self, text: str, font_name: str = None) -> None:
+        """
+        Adds text set in a font. Text without a font (e.g. the spaces and newlines inserted by the layout
+        analysis) is added to the current run.
+        """
+        bijoy = self.is_bijoy(font_name) if font_name is not None else None
+        if self.runs and (bijoy is None or self.runs[-1][0] == bijoy):
+            self.runs[-1][1].append(text)
+        else:
+            self.runs.append((bool(bijoy), [text]))
+
+    def clear(self) -> None:
+        self.runs = []
+
+    def last(self) -> str:
+        return self.runs[-1][1][-1] if self.runs else ""
+
+    def get_text(self) -> str:
+        return "".join(bijoy2unicode("".join(texts)) if bijoy else "".join(texts) for bijoy, texts in self.runs)
+
+
+def _layout_text(element: LTTextBoxHorizontal, bijoy_fonts: Iterable[str] = None) -> str:
+    """
+    The text of a text box, where the characters set in a bijoy font are converted to unicode
+    """
+    if bijoy_fonts is None:
+        return element.get_text()
+    runs = BijoyRuns(bijoy_fonts)
+    for a_line in element:
+        for an_object in a_line:
+            runs.add(an_object.get_text(), an_object.fontname if isinstance(an_object, LTChar) else None)
+    return runs.get_text()
+
+
+class PDFRawTextDevice(PDFDevice):
+    """
+    A pdfminer device that only collects the text of a page in the order of its content stream. It skips
+    the character geometry and the layout analysis, and starts a new line whenever the text moves
+    vertically. A large negative adjustment within a TJ array is taken as a space. The text set in the
+    bijoy fonts is converted to unicode.
+    """
+
+    # Adjustments (in thousandths of the font size) larger than this are taken as spaces
+    space_threshold = 200
+
+    def __init__(self, resource_manager: PDFResourceManager, bijoy_fonts: Iterable[str] = None) -> None:
+        super().__init__(resource_manager)
+        self.texts = BijoyRuns(bijoy_fonts)
+        self.last_y = None
+
+    def begin_page(self, page, ctm) -> None:
+        self.texts.clear()
+        self.last_y = None
+
+    def render_string(self, textstate, seq) -> None:
+        a, b, c, d, e, f = textstate.matrix
+        x, y = textstate.linematrix
+        y = b * x + d * y + f
+        if self.last_y is not None and abs(y - self.last_y) > 0.1:
+            self.texts.add("\n")
+        self.last_y = y
+        font = textstate.font
+        for an_object in seq:
+            if isinstance(an_object, bytes):
+                for cid in font.decode(an_object):
+                    try:
+                        self.texts.add(font.to_unichr(cid), font.fontname)
+                    except PDFUnicodeNotDefined:
+                        self.texts.add("(cid:{0})".format(cid))
+            elif an_object < -self.space_threshold and self.texts.last() and not self.texts.last().isspace():
+                self.texts.add(" ")
+
+    def get_text(self) -> str:
+        text = self.texts.get_text()
+        return text + "\n" if text else text
+
+
+def _pdf_extract_pages(pdf_file: str, pages: List[int] = None, accumulate_per_page: bool = True,
+                       mode: str = "layout", bijoy_fonts: Iterable[str] = None) -> Iterator[Dict]:
+    """
+    Extracts the text blobs of the given pages (all pages if None) of a pdf file in a single process
+    """
+    if mode not in ("layout", "text"):
+        raise ValueError("mode must be either layout or text")
+    if pages is not None and not pages:
+        return
+    page_numbers = sorted(set(pages)) if pages is not None else None
+    with open(pdf_file, 'rb') as document:
+        # Create resource manager
+        resource_manager = PDFResourceManager()
+        if mode == "text":
+            device = PDFRawTextDevice(resource_manager, bijoy_fonts)
+        else:
+            # Set parameters for analysis
+            layout_params = LAParams()
+            # Create a PDF page aggregator object
+            device = PDFPageAggregator(resource_manager, laparams=layout_params)
+        interpreter = PDFPageInterpreter(resource_manager, device)
+        page_iter = PDFPage.get_pages(document, pagenos=set(page_numbers) if page_numbers else None)
+        try:
+            for page_number, page in zip(page_numbers or itertools.count(), page_iter):
+                start_time = time.perf_counter()
+                texts_per_page = []
+                interpreter.process_page(page)
+                if mode == "text":
+                    # the text of a page is a single blob in this mode
+                    yield {'text': device.get_text(), 'page': page_number,
+                           'seconds': time.perf_counter() - start_time}
+                    continue
+                # receive the LTPage object for the page.
+                layout = device.get_result()
+                for element in layout:
+                    if isinstance(element, LTTextBoxHorizontal):
+                        extracted_text = _layout_text(element, bijoy_fonts)
+                        if accumulate_per_page:
+                            texts_per_page.append(extracted_text)
+                        else:
+                            yield {'text': extracted_text, 'page': page_number}
+                if accumulate_per_page:
+                    yield {'text': "\n".join(texts_per_page), 'page': page_number,
+                           'seconds': time.perf_counter() - start_time}
+        finally:
+            device.close()
+
+
+def _pdf_extract_pages_job(job: Tuple[str, List[int], bool, str, Tuple[str]]) -> List[Dict]:
+    """
+    Extracts a chunk of pages. Runs in the worker processes of pdf_iter.
+    """
+    pdf_file, pages, accumulate_per_page, mode, bijoy_fonts = job
+    return list(_pdf_extract_pages(pdf_file, pages, accumulate_per_page, mode, bijoy_fonts))
+
+
+def pdf_page_count(pdf_file: str) -> int:
+    """
+    Counts the pages of a pdf file without processing their contents
+    """
+    with open(pdf_file, 'rb') as document:
+        return sum(1 for _ in PDFPage.create_pages(PDFDocument(PDFParser(document))))
+
+
+def pdf_iter(pdf_file: str, accumulate_per_page: bool = True, pages: Iterable[int] = None,
+             workers: int = 1, mode: str = "layout", bijoy_fonts: Iterable[str] = None) -> Iterator[Dict]:
     """
     Extracts text blobs from a pdf file
     :param pdf_file: full path of the pdf file
     :param accumulate_per_page: if true, texts within a page are merged together
-    :return: yields a dictionary containing the 'text' blobs as stipulated by accumulate_per_page
-    """
-    document = open(pdf_file, 'rb')
-    # Create resource manager
-    resource_manager = PDFResourceManager()
-    # Set parameters for analysis
-    layout_params = LAParams()
-    # Create a PDF page aggregator object
-    device = PDFPageAggregator(resource_manager, laparams=layout_params)
-    interpreter = PDFPageInterpreter(resource_manager, device)
-    for page in PDFPage.get_pages(document):
-        texts_per_page = []
-        interpreter.process_page(page)
-        # receive the LTPage object for the page.
-        layout = device.get_result()
-        for element in layout:
-            if isinstance(element, LTTextBoxHorizontal):
-                extracted_text = element.get_text()
-                if accumulate_per_page:
-                    texts_per_page.append(extracted_text)
-                else:
-                    yield {'text': extracted_text}
-        if accumulate_per_page:
-            yield {'text': "\n".join(texts_per_page)}
+    :param pages: (0 based) numbers of the pages to extract, e.g. range(10, 20). All pages if None
+    :param workers: number of worker processes. The pages are split into chunks that are extracted in
+    parallel, and the results are yielded in the order of the pages
+    :param mode: "layout" runs the full layout analysis of pdfminer (accurate text boxes and spaces).
+    "text" only collects the text in the order of the content stream (much faster, good enough for
+    indexing, but the reading order and the spaces of some pdfs are not right). In this mode a page is
+    always a single blob.
+    :param bijoy_fonts: Patterns of the bijoy font families, e.g. encoding.fonts.BIJOY_FONTS. The text set in
+    these fonts is converted from bijoy to unicode, the rest is left untouched. Nothing is converted if None
+    :return: yields a dictionary containing the 'text' blobs as stipulated by accumulate_per_page and the
+    'page' number. With accumulate_per_page, the processing time of the page is given in 'seconds'
+    """
+    if workers == 1:
+        yield from _pdf_extract_pages(pdf_file, list(pages) if pages is not None else None, accumulate_per_page,
+                                      mode, bijoy_fonts)
+        return
+    bijoy_fonts = tuple(bijoy_fonts) if bijoy_fonts is not None else None
+    workers = workers or os.cpu_count() or 1
+    pages = sorted(set(pages)) if pages is not None else list(range(pdf_page_count(pdf_file)))
+    # a few chunks per worker, so that a worker with slow pages does not hold back the others
+    chunk_size = max(1, -(-len(pages) // (4 * workers)))
+    jobs = [(pdf_file, pages[i:i + chunk_size], accumulate_per_page, mode, bijoy_fonts)
+            for i in range(0, len(pages), chunk_size)]
+    with Pool(workers) as pool:
+        for results in pool.imap(_pdf_extract_pages_job, jobs):
+            yield from results
+
+
+def list_epub_files(paths: List[str]) -> List[str]:
+    """
+    Expands a list of epub files, directories (searched recursively for .epub files) and glob patterns into
+    a sorted list of epub files. If the paths together are the name of an existing file (i.e. a file name
+    with spaces split by the shell), that file is returned.
+    """
+    if os.path.isfile(" ".join(paths)):
+        return [" ".join(paths)]
+    epub_files = set()
+    for a_path in paths:
+        if os.path.isdir(a_path):
+            epub_files.update(os.path.join(path, file) for path, _, files in os.walk(a_path)
+                              for file in files if file.lower().endswith(".epub"))
+        elif os.path.isfile(a_path):
+            epub_files.add(a_path)
+        else:
+            epub_files.update(a_file for a_file in glob.glob(a_path, recursive=True) if os.path.isfile(a_file))
+    return sorted(epub_files)
+
+
+def _extract_epub(job: Tuple[str, str, str, str]) -> Dict:
+    """
+    Extracts the records (meta or text) of a single epub. Runs in the worker processes of extract_epub_corpus.
+    """
+    epub_file, target, engine, cache_file = job
+    result = {'file': epub_file, 'records': [], 'error': None, 'cache_hits': 0, 'cache_misses': 0}
+    cache = ExtractionCache(cache_file) if cache_file else None
+    try:
+        if target == "meta":
+            result['records'] = [epub_get_meta(epub_file, engine, cache)]
+        else:
+            result['records'] = epub_extract_contents(epub_file, engine, cache)
+    except Exception as e:
+        result['error'] = "{0}: {1}".format(type(e).__name__, e)
+    finally:
+        if cache is not None:
+            result['cache_hits'], result['cache_misses'] = cache.hits, cache.misses
+            cache.close()
+    return result
+
+
+class NdjsonWriter:
+    """
+    Writes records as newline-delimited json to stdout or to shards named <output>-00000.ndjson(.gz),
+    <output>-00001.ndjson(.gz) ... with at most shard_size records each
+    """
+
+    def __init__(self, output: str = None, shard_size: int = None, compress: bool = False) -> None:
+        self.output = output
+        self.shard_size = shard_size
+        self.compress = compress
+        self.shard_index = -1
+        self.shard_records = 0
+        self.f_out = sys.stdout.buffer if output is None else None
+
+    def _next_shard(self) -> None:
+        self.close()
+        self.shard_index += 1
+        self.shard_records = 0
+        shard_file = "{0}-{1:05d}.ndjson".format(self.output, self.shard_index)
+        self.f_out = gzip.open(shard_file + ".gz", "wb") if self.compress else open(shard_file, "wb")
+
+    def write(self, record: Dict) -> None:
+        if self.output is not None and (self.f_out is None or self.shard_records == self.shard_size):
+            self._next_shard()
+        self.f_out.write("{0}\n".format(json.dumps(record, ensure_ascii=False)).encode("utf8"))
+        self.shard_records += 1
+
+    def close(self) -> None:
+        if self.f_out is None:
+            return
+        if self.output is None:
+            self.f_out.flush()
+        else:
+            self.f_out.close()
+            self.f_out = None
+
+    def __enter__(self) -> "NdjsonWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def _bounded_imap(pool: Pool, func, jobs: List, max_pending: int) -> Iterator:
+    """
+    Ordered pool.imap that never has more than max_pending results waiting to be consumed
+    """
+    pending = deque()
+    for a_job in jobs:
+        if len(pending) == max_pending:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(func, (a_job,)))
+    while pending:
+        yield pending.popleft().get()
+
+
+def extract_epub_corpus(epub_files: List[str], target: str = "text", output: str = None,
+                        shard_size: int = None, compress: bool = False, workers: int = None,
+                        engine: str = "soup", cache_file: str = None, cache_size: int = None,
+                        rebuild_cache: bool = False) -> Dict:
+    """
+    Extracts the text contents (as in epub_extract_contents) or the meta (as in epub_get_meta) of many
+    epubs in a pool of worker processes and streams the records as newline-delimited json, in the order
+    of epub_files. Only a few epubs per worker are in flight at a time, so the memory stays bounded.
+    A failed epub is reported to stderr and the run goes on.
+    :param epub_files: Full paths of the epub files
+    :param target: "text" or "meta"
+    :param output: Prefix of the output shards. Writes to stdout if not given
+    :param shard_size: Maximum number of records per shard
+    :param compress: Compresses the shards with gzip
+    :param workers: Number of worker processes. Defaults to the number of cpus
+    :param engine: "soup" or "lxml"
+    :param cache_file: sqlite file of an ExtractionCache, so that unchanged books and pages are not parsed again
+    :param cache_size: Maximum size of the cache in bytes
+    :param rebuild_cache: Empties the cache before the run
+    :return: A summary of the run
+    """
+    if target not in ("text", "meta"):
+        raise ValueError("target must be either text or meta")
+    summary = {'files': len(epub_files), 'extracted': 0, 'records': 0, 'failed': []}
+    start_time = time.time()
+    if cache_file and rebuild_cache:
+        with ExtractionCache(cache_file) as cache:
+            cache.clear()
+    jobs = [(epub_file, target, engine, cache_file) for epub_file in epub_files]
+    cache_hits = cache_misses = 0
+    pool = Pool(workers) if workers != 1 and len(jobs) > 1 else None
+    with NdjsonWriter(output, shard_size, compress) as writer:
+        try:
+            if pool:
+                results = _bounded_imap(pool, _extract_epub, jobs, 2 * (workers or os.cpu_count() or 1))
+            else:
+                results = map(_extract_epub, jobs)
+            for i, result in enumerate(results):
+                cache_hits += result['cache_hits']
+                cache_misses += result['cache_misses']
+                if result['error']:
+                    summary['failed'].append({'file': result['file'], 'error': result['error']})
+                    sys.stderr.write("[{0}/{1}] FAILED {2}: {3}\n".format(i + 1, len(jobs), result['file'],
+                                                                         result['error']))
+                    continue
+                for a_record in result['records']:
+                    writer.write(a_record)
+                summary['extracted'] += 1
+                summary['records'] += len(result['records'])
+        finally:
+            if pool:
+                pool.terminate()
+                pool.join()
+    if cache_file:
+        with ExtractionCache(cache_file, max_size=cache_size) as cache:
+            summary['cache_evicted'] = cache.evict()
+            summary['cache'] = cache.cache_info()
+            summary['cache'].update({'hits': cache_hits, 'misses': cache_misses,
+                                     'hit_rate': cache_hits / (cache_hits + cache_misses)
+                                     if cache_hits + cache_misses else 0.0})
+    summary['seconds'] = time.time() - start_time
+    return summary
+
+
+def parse_page_ranges(page_ranges: str) -> List[int]:
+    """
+    Parses (0 based) page ranges like "0-9,15,20-24" into a list of page numbers
+    """
+    pages = []
+    for a_range in page_ranges.split(","):
+        first, _, last = a_range.strip().partition("-")
+        pages.extend(range(int(first), int(last or first) + 1))
+    return pages
 
 
 def main():
     parser = argparse.ArgumentParser(description="Bangla Ebook Parser")
     parser.add_argument("--get_epub_meta", action="store", default=None, type=str, 
         nargs="+", help="Extracts the meta for a given epub and outputs to stdout \
-        as a newline-delimited json. Please provide the full path of the epub file as the input argument.")
+        as a newline-delimited json. Please provide the full path of the epub file as the input argument. \
+        Directories and glob patterns are extracted in parallel.")
     parser.add_argument("--get_epub_text", action="store", default=None, type=str, 
         nargs="+", help="Extracts the text contents of a given epub and outputs to stdout \
-        as a newline-delimited json. Please provide the full path of the epub file as the input argument.")
+        as a newline-delimited json. Please provide the full path of the epub file as the input argument. \
+        Directories and glob patterns are extracted in parallel.")
+    parser.add_argument("--get_pdf_text", action="store", default=None, type=str,
+        nargs="+", help="Extracts the text of every page of a given pdf and outputs to stdout \
+        as a newline-delimited json. Please provide the full path of the pdf file as the input argument.")
+    parser.add_argument("--pages", action="store", default=None, type=str,
+        help="(0 based) pages of --get_pdf_text to extract, e.g. 0-9,15 (default: all pages)")
+    parser.add_argument("--pdf_mode", action="store", default="layout", choices=["layout", "text"],
+        help="layout: accurate text with pdfminer's layout analysis, text: fast raw text (default: layout)")
+    parser.add_argument("--convert_bijoy", action="store_true", default=False,
+        help="Converts the text of --get_pdf_text that is set in bijoy fonts to unicode")
+    parser.add_argument("--bijoy_fonts", action="store", default=list(BIJOY_FONTS), type=str, nargs="+",
+        help="Patterns of the bijoy font families for --convert_bijoy (default: {0})".format(" ".join(BIJOY_FONTS)))
+    parser.add_argument("--output", action="store", default=None, type=str,
+        help="Writes the records in files named <output>-00000.ndjson, ... instead of stdout")
+    parser.add_argument("--shard_size", action="store", default=None, type=int,
+        help="Maximum number of records per output file")
+    parser.add_argument("--gzip", action="store_true", default=False,
+        help="Compresses the output files with gzip")
+    parser.add_argument("--workers", action="store", default=None, type=int,
+        help="Number of worker processes (default: number of cpus for the epubs, 1 for --get_pdf_text)")
+    parser.add_argument("--engine", action="store", default="soup", choices=["soup", "lxml"],
+        help="Parses the xhtml with BeautifulSoup (soup) or with lxml directly (lxml, faster)")
+    parser.add_argument("--cache", action="store", default=None, type=str,
+        help="sqlite file that caches the parsed books and pages between the runs (default: no cache)")
+    parser.add_argument("--cache_size", action="store", default=None, type=int,
+        help="Maximum size of the cache in megabytes (default: unlimited)")
+    parser.add_argument("--rebuild_cache", action="store_true", default=False,
+        help="Empties the cache before extracting")
     args = parser.parse_args()
-
-    if args.get_epub_meta:
-        filename = " ".join(args.get_epub_meta)
-        meta = json.dumps(epub_get_meta(filename), ensure_ascii=False)
-        meta = "{0}\n".format(meta).encode("utf8")
-        sys.stdout.buffer.write(meta)
-
-    if args.get_epub_text:
-        filename = " ".join(args.get_epub_text)
-        data = "\n".join([json.dumps(a_record, ensure_ascii=False) for a_record in epub_extract_contents(filename)])
-        data = "{0}\n".format(data).encode("utf8")
-        sys.stdout.buffer.write(data)
+    if args.output and sum(bool(a_target) for a_target in [args.get_epub_meta, args.get_epub_text,
+                                                           args.get_pdf_text]) > 1:
+        parser.error("--output takes a single one of --get_epub_meta, --get_epub_text and --get_pdf_text, "
+                     "as they would write the same files")
+
+    failed = False
+    for target, paths in [("meta", args.get_epub_meta), ("text", args.get_epub_text)]:
+        if not paths:
+            continue
+        summary = extract_epub_corpus(list_epub_files(paths), target=target, output=args.output,
+                                      shard_size=args.shard_size, compress=args.gzip, workers=args.workers,
+                                      engine=args.engine, cache_file=args.cache,
+                                      cache_size=args.cache_size * 1024 * 1024 if args.cache_size is not None else None,
+                                      rebuild_cache=args.rebuild_cache)
+        failed = failed or bool(summary['failed'])
+        if summary['files'] > 1 or args.cache:
+            sys.stderr.write("{0}\n".format(json.dumps(summary, ensure_ascii=False)))
+    if args.get_pdf_text:
+        filename = " ".join(args.get_pdf_text)
+        pages = parse_page_ranges(args.pages) if args.pages else None
+        with NdjsonWriter(args.output, args.shard_size, args.gzip) as writer:
+            for a_record in pdf_iter(filename, pages=pages, workers=args.workers or 1, mode=args.pdf_mode,
+                                     bijoy_fonts=args.bijoy_fonts if args.convert_bijoy else None):
+                writer.write(a_record)
+
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,243 @@
+import argparse
+import hashlib
+import json
+import platform
+import random
+import re
+import sys
+import time
+import tracemalloc
+from io import StringIO
+from typing import Callable, Dict, List
+
+from shobdokutir.encoding.cache import CachedConverter
+from shobdokutir.encoding.utils import u2b_maps, bijoy2unicode, unicode2bijoy, bijoy2unicode_stream, \
+    BijoyConverter, UnicodeConverter, _bengali_conjunct
+
+_consonants = "কখগঘঙচছজঝঞটঠডঢণতথদধনপফবভমযরলশষসহড়ঢ়য়"
+# Juktobornos that have a glyph in bijoy
+_conjuncts = sorted(a_key for a_key in u2b_maps
+                    if "্" in a_key and not a_key.endswith("্") and re.fullmatch(_bengali_conjunct, a_key))
+_kars = ["", "", "", "া", "ি", "ী", "ু", "ূ", "ৃ", "ে", "ৈ", "ো", "ৌ"]
+_vowels = "অআইঈউঊঋএঐওঔ"
+_signs = "ংঃঁ"
+_punctuations = ["।", ",", "?", "!", "-"]
+_digits = "০১২৩৪৫৬৭৮৯"
+
+# Converters under benchmark: name -> (function, input encoding)
+_converters = {
+    'bijoy2unicode': (bijoy2unicode, "bijoy"),
+    'bijoy2unicode_stream': (lambda a_string: "".join(bijoy2unicode_stream(StringIO(a_string))), "bijoy"),
+    'unicode2bijoy': (unicode2bijoy, "unicode"),
+}
+
+
+def random_word(rng: random.Random) -> str:
+    """
+    Generates a random well formed bengali word that has a bijoy representation.
+    A ref is not combined with okar/oukar or with a chandrabindu after a postkar, because bijoy2unicode
+    can not yet restore those clusters.
+    """
+    if rng.random() < 0.05:
+        return "".join(rng.choice(_digits) for _ in range(rng.randint(1, 4)))
+    clusters = []
+    if rng.random() < 0.15:
+        clusters.append(rng.choice(_vowels) + (rng.choice(_signs) if rng.random() < 0.1 else ""))
+    for _ in range(rng.randint(1, 4)):
+        base = rng.choice(_consonants) if rng.random() < 0.8 else rng.choice(_conjuncts)
+        kar = rng.choice(_kars)
+        ref = rng.random() < 0.08 and kar not in ("ো", "ৌ")
+        sign = rng.choice(_signs) if rng.random() < 0.08 else ""
+        if ref and sign == "ঁ" and kar:
+            sign = ""
+        clusters.append(("র্" if ref else "") + base + kar + sign)
+    return "".join(clusters)
+
+
+def synthetic_text(n_chars: int, seed: int = 0) -> str:
+    """
+    Generates about n_chars characters of random bengali text in unicode, with punctuations and line breaks
+    """
+    rng = random.Random(seed)
+    words = []
+    length = 0
+    while length < n_chars:
+        a_word = random_word(rng)
+        if rng.random() < 0.1:
+            a_word += rng.choice(_punctuations)
+        a_word += "\n" if rng.random() < 0.05 else " "
+        words.append(a_word)
+        length += len(a_word)
+    return "".join(words)
+
+
+def build_inputs(sizes: List[int], seed: int = 0) -> Dict:
+    """
+    Builds the benchmark inputs of the given sizes (in characters), half from the sample documents and half
+    from synthetic text
+    :return: A dict of size -> {'bijoy': text, 'unicode': text}
+    """
+    with open("resources/sample_docs/bijoy_sample.txt", encoding="cp1252") as f_bijoy:
+        bijoy_sample = f_bijoy.read()
+    with open("resources/sample_docs/unicode_sample.txt", encoding="utf-8") as f_unicode:
+        unicode_sample = f_unicode.read()
+    inputs = {}
+    for size in sizes:
+        synthetic = synthetic_text(size, seed)
+        inputs[size] = {
+            'bijoy': ((bijoy_sample * (size // 2 // len(bijoy_sample) + 1))[:size // 2] +
+                      unicode2bijoy(synthetic))[:size],
+            'unicode': ((unicode_sample * (size // 2 // len(unicode_sample) + 1))[:size // 2] + synthetic)[:size]
+        }
+    return inputs
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))]
+
+
+def measure(func: Callable[[str], str], text: str, repeats: int) -> Dict:
+    """
+    Measures the throughput, the latency percentiles and the peak memory of func over text
+    """
+    latencies = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        func(text)
+        latencies.append(time.perf_counter() - start_time)
+    # tracemalloc slows down the conversion, so the memory is measured in a separate call
+    tracemalloc.start()
+    func(text)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    median = _percentile(latencies, 50)
+    return {'chars_per_second': len(text) / median if median else 0.0,
+            'latency_p50': median,
+            'latency_p90': _percentile(latencies, 90),
+            'latency_p99': _percentile(latencies, 99),
+            'peak_memory': peak_memory}
+
+
+def check_roundtrip(n_words: int = 20000, seed: int = 0) -> Dict:
+    """
+    Property based checks over a corpus of random words:
+    1. bijoy2unicode(unicode2bijoy(word)) == word
+    2. the streaming, cached and batch converters give the same output as bijoy2unicode/unicode2bijoy
+    The digests of the converted corpus are reported, so that a faster version can be compared with
+    the output of the previous one.
+    """
+    rng = random.Random(seed)
+    words = [random_word(rng) for _ in range(n_words)]
+    failures = []
+    bijoy_words = [unicode2bijoy(a_word) for a_word in words]
+    unicode_words = [bijoy2unicode(a_word) for a_word in bijoy_words]
+    for a_word, bijoy_word, unicode_word in zip(words, bijoy_words, unicode_words):
+        if unicode_word != a_word:
+            failures.append({'check': "roundtrip", 'word': a_word, 'bijoy': bijoy_word, 'unicode': unicode_word})
+
+    bijoy_text = " ".join(bijoy_words)
+    unicode_text = " ".join(unicode_words)
+    expected = bijoy2unicode(bijoy_text)
+    for chunk_size in [1, 7, 4096]:
+        converted = "".join(bijoy2unicode_stream(StringIO(bijoy_text), chunk_size=chunk_size))
+        if converted != expected:
+            failures.append({'check': "bijoy2unicode_stream", 'chunk_size': chunk_size})
+    if CachedConverter(BijoyConverter()).convert(bijoy_text) != expected:
+        failures.append({'check': "cached bijoy2unicode"})
+    if list(BijoyConverter().convert_many(bijoy_words)) != unicode_words:
+        failures.append({'check': "batch bijoy2unicode"})
+    if CachedConverter(UnicodeConverter()).convert(unicode_text) != unicode2bijoy(unicode_text):
+        failures.append({'check': "cached unicode2bijoy"})
+    if list(UnicodeConverter().convert_many(words)) != bijoy_words:
+        failures.append({'check': "batch unicode2bijoy"})
+
+    return {'words': n_words, 'seed': seed, 'failures': failures,
+            'bijoy_digest': hashlib.sha256(bijoy_text.encode("utf8")).hexdigest(),
+            'unicode_digest': hashlib.sha256(expected.encode("utf8")).hexdigest()}
+
+
+def run_benchmarks(sizes: List[int], repeats: int = 20, seed: int = 0, n_words: int = 20000) -> Dict:
+    """
+    Runs all the converters over inputs of increasing size and checks the round trip corpus
+    :param sizes: Input sizes in characters
+    :param repeats: Number of timed calls for every converter and size
+    :param seed: Seed of the synthetic text and of the round trip corpus
+    :param n_words: Number of words in the round trip corpus
+    :return: The results, ready to be written as json
+    """
+    inputs = build_inputs(sizes, seed)
+    results = []
+    for name, (func, encoding) in _converters.items():
+        for size in sizes:
+            a_result = {'converter': name, 'size': size}
+            a_result.update(measure(func, inputs[size][encoding], repeats))
+            results.append(a_result)
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'time': time.time(),
+            'results': results, 'roundtrip': check_roundtrip(n_words, seed)}
+
+
+def compare_to_baseline(current: Dict, baseline: Dict, tolerance: float = 0.2) -> List[str]:
+    """
+    Compares a benchmark run with a stored baseline
+    :param tolerance: Allowed relative drop of the throughput
+    :return: Descriptions of the regressions (empty when there is none)
+    """
+    regressions = []
+    current_results = {(a_result['converter'], a_result['size']): a_result for a_result in current['results']}
+    for a_result in baseline['results']:
+        key = (a_result['converter'], a_result['size'])
+        if key not in current_results:
+            continue
+        if current_results[key]['chars_per_second'] < a_result['chars_per_second'] * (1 - tolerance):
+            regressions.append("{0} on {1} chars: {2:.0f} chars/sec, baseline {3:.0f} chars/sec".format(
+                key[0], key[1], current_results[key]['chars_per_second'], a_result['chars_per_second']))
+    for a_key in ['bijoy_digest', 'unicode_digest']:
+        if current['roundtrip']['seed'] == baseline['roundtrip']['seed'] and \
+                current['roundtrip']['words'] == baseline['roundtrip']['words'] and \
+                current['roundtrip'][a_key] != baseline['roundtrip'][a_key]:
+            regressions.append("The output of the round trip corpus has changed ({0})".format(a_key))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and correctness benchmarks of the encoding converters")
+    parser.add_argument("--sizes", action="store", default=[1000, 10000, 100000, 1000000], type=int, nargs="+",
+                        help="Input sizes in characters")
+    parser.add_argument("--repeats", action="store", default=20, type=int,
+                        help="Number of timed calls for every converter and size")
+    parser.add_argument("--seed", action="store", default=0, type=int,
+                        help="Seed of the synthetic inputs and of the round trip corpus")
+    parser.add_argument("--words", action="store", default=20000, type=int,
+                        help="Number of words in the round trip corpus")
+    parser.add_argument("--output", action="store", default=None, type=str,
+                        help="Writes the results as json in this file (default: stdout)")
+    parser.add_argument("--baseline", action="store", default=None, type=str,
+                        help="Fails if the throughput drops below this stored result file")
+    parser.add_argument("--tolerance", action="store", default=0.2, type=float,
+                        help="Allowed relative drop of the throughput compared to the baseline (default: 0.2)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.repeats, args.seed, args.words)
+    if args.output:
+        with open(args.output, "w") as f_out:
+            json.dump(results, f_out, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    failed = False
+    for a_failure in results['roundtrip']['failures'][:20]:
+        sys.stderr.write("Round trip failure: {0}\n".format(json.dumps(a_failure, ensure_ascii=False)))
+        failed = True
+    if args.baseline:
+        with open(args.baseline) as f_in:
+            for a_regression in compare_to_baseline(results, json.load(f_in), args.tolerance):
+                sys.stderr.write("Regression: {0}\n".format(a_regression))
+                failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import json
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator
+
+_whitespace_pattern = re.compile(r"(\s+)")
+
+
+class CachedConverter:
+    """
+    Memoizes a converter (e.g. BijoyConverter or UnicodeConverter) at the word level. A string is split
+    on whitespaces, the words already seen are served from a bounded LRU cache and only the rest are
+    converted. The words of a well formed text never affect each other during conversion, so the
+    result is the same as converting the whole string.
+    """
+
+    def __init__(self, converter, capacity: int = 100000) -> None:
+        """
+        :param converter: Any object with a convert(str) -> str method
+        :param capacity: Maximum number of words to keep in the cache
+        """
+        self.converter = converter
+        self.capacity = capacity
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def convert_word(self, word: str) -> str:
+        """
+        Converts a single word (without whitespaces) through the cache
+        """
+        cache = self.cache
+        if word in cache:
+            self.hits += 1
+            cache.move_to_end(word)
+            return cache[word]
+        self.misses += 1
+        converted = self.converter.convert(word)
+        if self.capacity > 0:
+            cache[word] = converted
+            if len(cache) > self.capacity:
+                cache.popitem(last=False)
+        return converted
+
+    def convert(self, src_string: str) -> str:
+        """
+        Converts a string word by word
+        """
+        if not src_string:
+            return src_string
+        parts = _whitespace_pattern.split(src_string)
+        # the words are at the even positions, the whitespaces in between at the odd positions
+        for i in range(0, len(parts), 2):
+            if parts[i]:
+                parts[i] = self.convert_word(parts[i])
+        return "".join(parts)
+
+    def convert_many(self, src_strings: Iterable[str]) -> Iterator[str]:
+        """
+        Lazily converts a sequence of strings
+        """
+        for a_string in src_strings:
+            yield self.convert(a_string)
+
+    def cache_info(self) -> Dict:
+        """
+        Returns the hits, misses, hit rate, current size and capacity of the cache
+        """
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self.cache), 'capacity': self.capacity}
+
+    def cache_clear(self) -> None:
+        """
+        Empties the cache and resets the statistics
+        """
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def save(self, cache_file: str) -> None:
+        """
+        Writes the cached words to a newline delimited json file, from the least to the most recently used
+        """
+        with open(cache_file, "w", encoding="utf-8") as f_out:
+            for word, converted in self.cache.items():
+                f_out.write(json.dumps([word, converted], ensure_ascii=False) + "\n")
+
+    def load(self, cache_file: str) -> None:
+        """
+        Warms up the cache from a file written by save. If the file has more words than the capacity, the
+        most recently used ones are kept.
+        """
+        with open(cache_file, encoding="utf-8") as f_in:
+            for a_line in f_in:
+                if not a_line.strip():
+                    continue
+                word, converted = json.loads(a_line)
+                self.cache[word] = converted
+                self.cache.move_to_end(word)
+                if len(self.cache) > self.capacity:
+                    self.cache.popitem(last=False)
@@ -0,0 +1,113 @@
+import numpy as np
+
+# Start of the bengali unicode block (U+0980 - U+09FF)
+BENGALI_BLOCK_START = 0x0980
+BENGALI_BLOCK_SIZE = 128
+
+# Every character belongs to exactly one class
+CLASS_OTHER = 0
+CLASS_SOR_BORNO = 1
+CLASS_BANJON_BORNO = 2
+CLASS_PRE_KAR = 3
+CLASS_POST_KAR = 4
+CLASS_MID_KAR = 5
+CLASS_HASANT = 6
+CLASS_NUKTA = 7
+CLASS_DIGIT = 8
+CLASS_SIGN = 9  # chandrabindu, anusvara and visarga
+
+# A character can have more than one flag, e.g. a chandrabindu is also treated as a banjonborno
+FLAG_SOR_BORNO = 1 << 0
+FLAG_BANJON_BORNO = 1 << 1
+FLAG_PRE_KAR = 1 << 2
+FLAG_POST_KAR = 1 << 3
+FLAG_MID_KAR = 1 << 4
+FLAG_KAR = 1 << 5
+FLAG_HASANT = 1 << 6
+FLAG_NUKTA = 1 << 7
+FLAG_DIGIT = 1 << 8
+FLAG_CHANDRABINDU = 1 << 9
+
+
+def _build_tables():
+    """
+    Builds the codepoint -> class and codepoint -> flags tables of the bengali block
+    """
+    classes = [CLASS_OTHER] * BENGALI_BLOCK_SIZE
+    flags = [0] * BENGALI_BLOCK_SIZE
+
+    def mark(chars, a_class, a_flag):
+        for c in chars:
+            offset = ord(c) - BENGALI_BLOCK_START
+            classes[offset] = a_class
+            flags[offset] |= a_flag
+
+    def char_range(first, last):
+        return [chr(i) for i in range(ord(first), ord(last) + 1)]
+
+    mark(char_range('অ', 'ঌ') + ['এ', 'ঐ', 'ও', 'ঔ'], CLASS_SOR_BORNO, FLAG_SOR_BORNO)
+    # ড়, ঢ় and য় are written as escapes as their precomposed forms do not survive unicode normalization
+    mark(char_range('ক', 'ন') + char_range('প', 'র') + ['ল'] + char_range('শ', 'হ') +
+         ['\u09dc', '\u09dd', '\u09df', 'ৎ'], CLASS_BANJON_BORNO, FLAG_BANJON_BORNO)
+    mark(['ং', 'ঃ', 'ঁ'], CLASS_SIGN, FLAG_BANJON_BORNO)
+    mark(['ঁ'], CLASS_SIGN, FLAG_CHANDRABINDU)
+    mark(['ি', 'ৈ', 'ে'], CLASS_PRE_KAR, FLAG_PRE_KAR | FLAG_KAR)
+    mark(['া', 'ৗ', 'ু', 'ূ', 'ী', 'ৃ'], CLASS_POST_KAR, FLAG_POST_KAR | FLAG_KAR)
+    mark(['ো', 'ৌ'], CLASS_MID_KAR, FLAG_MID_KAR | FLAG_KAR)
+    mark(['্'], CLASS_HASANT, FLAG_HASANT)
+    mark(['়'], CLASS_NUKTA, FLAG_NUKTA)
+    mark(char_range('০', '৯'), CLASS_DIGIT, FLAG_DIGIT)
+    return tuple(classes), tuple(flags)
+
+
+BENGALI_CLASSES, BENGALI_FLAGS = _build_tables()
+
+# character -> class/flags maps for the scalar lookups, arrays (with an extra CLASS_OTHER entry for
+# the characters outside the block) for the bulk lookups
+BENGALI_CHAR_CLASSES = {chr(BENGALI_BLOCK_START + i): a_class for i, a_class in enumerate(BENGALI_CLASSES) if a_class}
+BENGALI_CHAR_FLAGS = {chr(BENGALI_BLOCK_START + i): a_flag for i, a_flag in enumerate(BENGALI_FLAGS) if a_flag}
+_classes_array = np.array(BENGALI_CLASSES + (CLASS_OTHER,), dtype=np.uint8)
+_flags_array = np.array(BENGALI_FLAGS + (0,), dtype=np.uint16)
+
+
+def char_class(c: str) -> int:
+    """
+    Returns the class of a single character. Anything outside the bengali block is CLASS_OTHER.
+    """
+    return BENGALI_CHAR_CLASSES.get(c, CLASS_OTHER)
+
+
+def char_flags(c: str) -> int:
+    """
+    Returns the flag bitmask of a single character. Anything outside the bengali block has no flags.
+    """
+    return BENGALI_CHAR_FLAGS.get(c, 0)
+
+
+def _block_offsets(text: str) -> np.ndarray:
+    """
+    Offsets of all the characters of text from the start of the bengali block. Characters outside
+    the block are pointed to the extra (CLASS_OTHER) entry at the end of the tables.
+    """
+    codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    offsets = codepoints - np.uint32(BENGALI_BLOCK_START)
+    # characters before the block wrap around and become large as well
+    return np.minimum(offsets, BENGALI_BLOCK_SIZE)
+
+
+def classify(text: str) -> np.ndarray:
+    """
+    Classifies all the characters of a string in one call
+    :param text: A unicode string
+    :return: A uint8 array of the same length as text containing the class of every character
+    """
+    return _classes_array[_block_offsets(text)]
+
+
+def classify_flags(text: str) -> np.ndarray:
+    """
+    Finds the flags of all the characters of a string in one call
+    :param text: A unicode string
+    :return: A uint16 array of the same length as text containing the flag bitmask of every character
+    """
+    return _flags_array[_block_offsets(text)]
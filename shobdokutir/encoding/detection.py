@@ -0,0 +1,207 @@
+import math
+import unicodedata
+from typing import Dict, List
+
+import numpy as np
+
+from shobdokutir.encoding.char_classes import BENGALI_BLOCK_START, BENGALI_BLOCK_SIZE
+from shobdokutir.encoding.utils import b2u_maps, bijoy2unicode
+
+SPAN_BIJOY = "bijoy"
+SPAN_UNICODE = "unicode-bengali"
+SPAN_LATIN = "latin"
+SPAN_OTHER = "other"
+_span_types = [SPAN_OTHER, SPAN_UNICODE, SPAN_BIJOY, SPAN_LATIN]
+
+# Per mille frequencies of the ascii characters in bijoy text (from resources/sample_docs/bijoy_sample.txt)
+# and of the letters in english text
+_bijoy_frequencies = {
+    'v': 145.4, 'w': 84.3, 'e': 73.5, 'i': 64.9, 'b': 59.5, 'K': 45.9, 'Z': 44.3, 'c': 40.4, 'm': 37.3, 'k': 33.8,
+    '`': 33.0, 'j': 27.2, 'q': 26.4, 'g': 24.1, 'R': 20.6, 'A': 17.5, 'I': 17.1, 'M': 14.8, 'D': 14.8, 'n': 13.2,
+    '|': 13.2, 'y': 12.8, 's': 12.4, 'Y': 11.3, 'x': 10.1, 'h': 8.9, 'f': 8.9, 'a': 7.0, '~': 6.6, 'B': 5.8,
+    'G': 5.4, 'L': 5.1, '_': 4.3, 'l': 4.3, 'P': 3.1, 'r': 3.1, 'U': 2.7, 'Q': 2.3, 'z': 1.9, 'u': 1.6, 'V': 1.6,
+    'N': 1.6, 'H': 1.2, 'd': 0.8, 'p': 0.8, 'o': 0.8, '^': 0.8, 'F': 0.4, 'E': 0.4, 't': 0.4
+}
+_english_frequencies = {
+    'e': 127.0, 't': 91.0, 'a': 82.0, 'o': 75.0, 'i': 70.0, 'n': 67.0, 's': 63.0, 'h': 61.0, 'r': 60.0, 'd': 43.0,
+    'l': 40.0, 'c': 28.0, 'u': 28.0, 'm': 24.0, 'w': 24.0, 'f': 22.0, 'g': 20.0, 'y': 20.0, 'p': 19.0, 'b': 15.0,
+    'v': 9.8, 'k': 7.7, 'j': 1.5, 'x': 1.5, 'q': 0.95, 'z': 0.74
+}
+# Share of the upper case letters in english text
+_english_upper_share = 0.04
+# Symbols that bijoy uses as letters
+_bijoy_symbols = "`~_|^&"
+# Non-ascii characters of the bijoy alphabet that are also common in unicode and english text
+_shared_symbols = "“”‘’—–…•"
+# Weight of a character that is found only in bijoy text
+_bijoy_only_weight = 8.0
+
+# Character classes of the detector
+_CHAR_NEUTRAL = 0
+_CHAR_SPACE = 1
+_CHAR_ASCII = 2
+_CHAR_BIJOY_ONLY = 3
+_CHAR_BENGALI = 4
+_CHAR_OTHER_LETTER = 5
+
+# All characters above the basic multilingual plane share the last entry of the tables
+_table_size = 0x10001
+# The counts of a word are packed in 16 bit fields, so a block can not have more characters than this
+_block_size = 0xFFFF
+
+
+def _build_tables():
+    """
+    Builds the character class, the weight (log odds of bijoy vs english) and the packed count tables
+    """
+    classes = np.zeros(_table_size, dtype=np.uint8)
+    weights = np.zeros(_table_size, dtype=np.float32)
+    for a_char in " \t\n\r\x0b\x0c\x85\xa0\u2028\u2029\u3000":
+        classes[ord(a_char)] = _CHAR_SPACE
+    for i in range(0x100, 0x10000):
+        if unicodedata.category(chr(i)).startswith("L"):
+            classes[i] = _CHAR_OTHER_LETTER
+    classes[BENGALI_BLOCK_START:BENGALI_BLOCK_START + BENGALI_BLOCK_SIZE] = _CHAR_BENGALI
+    for a_char in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ" + _bijoy_symbols:
+        if a_char.islower():
+            english = _english_frequencies[a_char] * (1 - _english_upper_share)
+        elif a_char.isupper():
+            english = _english_frequencies[a_char.lower()] * _english_upper_share
+        else:
+            english = 0.05
+        classes[ord(a_char)] = _CHAR_ASCII
+        weights[ord(a_char)] = math.log((_bijoy_frequencies.get(a_char, 0) + 0.3) / (english + 0.3))
+    for a_char in {a_char for a_key in b2u_maps for a_char in a_key if ord(a_char) > 127}:
+        if a_char not in _shared_symbols:
+            classes[ord(a_char)] = _CHAR_BIJOY_ONLY
+            weights[ord(a_char)] = _bijoy_only_weight
+        else:
+            classes[ord(a_char)] = _CHAR_NEUTRAL
+    # Words in all capitals are scored as if they were in lower case
+    folded_weights = weights.copy()
+    folded_weights[ord('A'):ord('Z') + 1] = weights[ord('a'):ord('z') + 1]
+    # Number of bengali, ascii, bijoy only and other letters, packed in 16 bit fields
+    counts = np.zeros(_table_size, dtype=np.int64)
+    counts[classes == _CHAR_BENGALI] = 1
+    counts[classes == _CHAR_ASCII] = 1 << 16
+    counts[classes == _CHAR_BIJOY_ONLY] = 1 << 32
+    counts[classes == _CHAR_OTHER_LETTER] = 1 << 48
+    # Number of upper and lower case ascii letters, packed in 16 bit fields
+    cases = np.zeros(_table_size, dtype=np.int32)
+    cases[ord('A'):ord('Z') + 1] = 1
+    cases[ord('a'):ord('z') + 1] = 1 << 16
+    return classes, weights, folded_weights, counts, cases
+
+
+_classes, _weights, _folded_weights, _counts, _cases = _build_tables()
+
+
+def _score_words(text: str, offset: int) -> Dict:
+    """
+    Splits a block of text (not longer than _block_size) into words, each followed by its whitespaces,
+    and computes the statistics of every word
+    """
+    codepoints = np.minimum(np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32), _table_size - 1)
+    is_space = _classes[codepoints] == _CHAR_SPACE
+    word_starts = np.flatnonzero(~is_space[1:] & is_space[:-1]) + 1
+    word_starts = np.concatenate(([0], word_starts))
+    counts = np.add.reduceat(_counts[codepoints], word_starts)
+    cases = np.add.reduceat(_cases[codepoints], word_starts)
+    all_capitals = (cases >> 16 == 0) & ((cases & 0xFFFF) > 1)
+    scores = np.where(all_capitals,
+                      np.add.reduceat(_folded_weights[codepoints], word_starts),
+                      np.add.reduceat(_weights[codepoints], word_starts))
+    return {'starts': word_starts + offset,
+            'bengali': counts & 0xFFFF,
+            'ascii': (counts >> 16) & 0xFFFF,
+            'bijoy_only': (counts >> 32) & 0xFFFF,
+            'other': (counts >> 48) & 0xFFFF,
+            'scores': scores}
+
+
+def _blocks(text: str) -> List[int]:
+    """
+    Cuts the text into blocks of at most _block_size characters, at whitespaces where possible
+    """
+    starts = [0]
+    while len(text) - starts[-1] > _block_size:
+        end = starts[-1] + _block_size
+        cut = max(text.rfind(" ", starts[-1] + 1, end), text.rfind("\n", starts[-1] + 1, end))
+        starts.append(cut + 1 if cut > 0 else end)
+    return starts
+
+
+def detect_spans(text: str, smoothing: int = 2) -> List[Dict]:
+    """
+    Splits a document into spans of bijoy, unicode bengali, latin and other texts. Every whitespace
+    delimited word is classified from the statistics of its characters. A word with characters that only
+    bijoy uses is bijoy; for a word in ascii letters, the letter frequencies of bijoy and english are
+    compared, together with the neighbouring words. Words without any letters (numbers, punctuations)
+    join the span before them.
+    :param text: The document
+    :param smoothing: Number of words on each side whose scores are added to a word's own score
+    :return: A list of dicts with 'start', 'end', 'type' and 'confidence' covering the whole text
+    """
+    if not text:
+        return []
+    block_starts = _blocks(text)
+    block_ends = block_starts[1:] + [len(text)]
+    blocks = [_score_words(text[start:end], start) for start, end in zip(block_starts, block_ends)]
+    words = {a_key: np.concatenate([a_block[a_key] for a_block in blocks]) for a_key in blocks[0]}
+
+    latin_letters = words['ascii'] + words['bijoy_only']
+    letters = words['bengali'] + latin_letters + words['other']
+    is_unicode = (words['bengali'] > 0) & (words['bengali'] >= latin_letters) & (words['bengali'] >= words['other'])
+    is_other = ~is_unicode & (words['other'] > latin_letters)
+    is_latin_script = (letters > 0) & ~is_unicode & ~is_other
+
+    # Short words are decided together with their neighbours
+    kernel = np.array([1.0 / (1 + abs(i)) for i in range(-smoothing, smoothing + 1)], dtype=np.float32)
+    scores = np.convolve(np.where(is_latin_script, words['scores'], 0), kernel)[smoothing:smoothing + len(letters)]
+    scores = np.where(words['bijoy_only'] > 0, np.maximum(scores, words['scores']), scores)
+    bijoy_probability = 1 / (1 + np.exp(-np.clip(scores, -30, 30)))
+
+    # 0: other, 1: unicode, 2: bijoy, 3: latin. Words without letters are -1 until they are filled
+    word_types = np.full(len(letters), -1, dtype=np.int8)
+    word_types[is_other] = 0
+    word_types[is_unicode] = 1
+    word_types[is_latin_script & (scores > 0)] = 2
+    word_types[is_latin_script & (scores <= 0)] = 3
+    confidences = np.select([is_unicode, is_other, word_types == 2, word_types == 3],
+                            [words['bengali'] / np.maximum(letters, 1), words['other'] / np.maximum(letters, 1),
+                             bijoy_probability, 1 - bijoy_probability], 0)
+
+    # Words without letters take the type of the previous word (or of the next one at the beginning)
+    has_type = word_types >= 0
+    if not has_type.any():
+        return [{'start': 0, 'end': len(text), 'type': SPAN_OTHER, 'confidence': 1.0}]
+    last_typed = np.maximum.accumulate(np.where(has_type, np.arange(len(word_types)), -1))
+    last_typed[last_typed < 0] = np.flatnonzero(has_type)[0]
+    word_types = word_types[last_typed]
+
+    span_starts = np.concatenate(([0], np.flatnonzero(word_types[1:] != word_types[:-1]) + 1))
+    typed_counts = np.add.reduceat(has_type.astype(np.int64), span_starts)
+    confidence_sums = np.add.reduceat(np.where(has_type, confidences, 0), span_starts)
+    char_starts = words['starts'][span_starts].tolist() + [len(text)]
+    spans = []
+    for i, a_word in enumerate(span_starts.tolist()):
+        spans.append({'start': char_starts[i], 'end': char_starts[i + 1],
+                      'type': _span_types[word_types[a_word]],
+                      'confidence': float(confidence_sums[i] / typed_counts[i])})
+    return spans
+
+
+def convert_mixed(text: str, min_confidence: float = 0.0) -> str:
+    """
+    Converts only the bijoy spans of a document to unicode and keeps everything else as it is
+    :param text: A document with mixed bijoy, unicode and english texts
+    :param min_confidence: Bijoy spans detected with a lower confidence are not converted
+    :return: The document in unicode
+    """
+    converted = []
+    for a_span in detect_spans(text):
+        span_text = text[a_span['start']:a_span['end']]
+        if a_span['type'] == SPAN_BIJOY and a_span['confidence'] >= min_confidence:
+            span_text = bijoy2unicode(span_text)
+        converted.append(span_text)
+    return "".join(converted)
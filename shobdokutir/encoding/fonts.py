@@ -0,0 +1,52 @@
+import os
+import re
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from typing import Dict, Iterable
+
+from PIL import ImageFont
+
+# Patterns (case insensitive, fnmatch style) of the font families that use the bijoy encoding. All the fonts
+# of bijoy (SutonnyMJ, SutonnyOMJ, JamunaMJ, ...) are named with an "MJ" at the end.
+BIJOY_FONTS = ("*MJ",)
+# The unicode font that replaces the bijoy fonts in the converted documents (NikoshBAN has the metrics of SutonnyMJ)
+UNICODE_FONT = "NikoshBAN"
+
+_subset_prefix = re.compile(r"^[A-Z]{6}\+")
+_style_suffix = re.compile(r"[-,].*$")
+
+
+def font_family(font_name: str) -> str:
+    """
+    Extracts the family from a font name as found in pdf or office documents,
+    e.g. "ABCDEF+SutonnyMJ-Bold" -> "SutonnyMJ", "Sutonny MJ" -> "SutonnyMJ"
+    """
+    return _style_suffix.sub("", _subset_prefix.sub("", font_name or "")).replace(" ", "")
+
+
+@lru_cache(maxsize=4096)
+def _is_bijoy_font(font_name: str, bijoy_fonts: tuple) -> bool:
+    family = font_family(font_name).lower()
+    return any(fnmatchcase(family, a_pattern.replace(" ", "").lower()) for a_pattern in bijoy_fonts)
+
+
+def is_bijoy_font(font_name: str, bijoy_fonts: Iterable[str] = BIJOY_FONTS) -> bool:
+    """
+    Checks if a font uses the bijoy encoding
+    :param font_name: Name of the font, as found in the document
+    :param bijoy_fonts: Patterns of the bijoy font families, e.g. ["SutonnyMJ", "*MJ"]
+    """
+    return _is_bijoy_font(font_name, tuple(bijoy_fonts))
+
+
+def unicode_font_families(font_folder: str = "resources/bangla_fonts") -> Dict[str, str]:
+    """
+    Lists the family names of the unicode bengali fonts of a folder
+    :return: A dict of family name -> path of the font file
+    """
+    families = {}
+    for a_file in sorted(os.listdir(font_folder)):
+        if os.path.splitext(a_file)[1].lower() in (".ttf", ".ttc", ".otf"):
+            family, _ = ImageFont.truetype(os.path.join(font_folder, a_file), 12).getname()
+            families.setdefault(family, os.path.join(font_folder, a_file))
+    return families
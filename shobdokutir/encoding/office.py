@@ -0,0 +1,522 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import zipfile as zf
+from multiprocessing import Pool
+from typing import Callable, Dict, IO, Iterable, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from lxml import etree
+
+from shobdokutir.encoding.fonts import BIJOY_FONTS, UNICODE_FONT, is_bijoy_font, unicode_font_families
+from shobdokutir.encoding.utils import bijoy2unicode, _list_files
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_OFFICE = "{urn:oasis:names:tc:opendocument:xmlns:office:1.0}"
+_STYLE = "{urn:oasis:names:tc:opendocument:xmlns:style:1.0}"
+_TEXT = "{urn:oasis:names:tc:opendocument:xmlns:text:1.0}"
+_FO = "{urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0}"
+_SVG = "{urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0}"
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+_docx_extensions = (".docx", ".docm", ".dotx", ".dotm")
+_odt_extensions = (".odt", ".ott")
+# Parts of a docx with text, and parts with fonts only
+_docx_text_parts = re.compile(r"^word/(document|header\d*|footer\d*|footnotes|endnotes|comments)\.xml$")
+_docx_font_parts = re.compile(r"^word/(styles|numbering)\.xml$")
+# Elements of a docx run that separate the words
+_docx_breaks = {_W + "tab", _W + "br", _W + "cr", _W + "ptab", _W + "noBreakHyphen", _W + "sym"}
+# Elements of an odt paragraph that carry the text of their parent (with their own style)
+_odt_spans = {_TEXT + "span", _TEXT + "a", _TEXT + "ruby", _TEXT + "ruby-base"}
+# Elements of an odt paragraph that separate the words
+_odt_breaks = {_TEXT + "s", _TEXT + "tab", _TEXT + "line-break"}
+_leading_word = re.compile(r"^\S+")
+
+# A piece of text in a document is an (element, "text" or "tail") pair. None separates the words.
+Piece = Optional[Tuple[etree.ElementBase, str]]
+
+
+def _strip_declarations(start_tag: bytes, root_nsmap: Optional[Dict]) -> bytes:
+    """
+    Removes the namespace declarations that are already on the root from a start tag
+    """
+    for prefix, uri in (root_nsmap or {}).items():
+        declaration = ' xmlns{0}="{1}"'.format(":" + prefix if prefix else "", uri).encode("utf-8")
+        start_tag = start_tag.replace(declaration, b"", 1)
+    return start_tag
+
+
+def _start_tag(element: etree.ElementBase, root_nsmap: Optional[Dict]) -> bytes:
+    """
+    Serializes the start tag of an element with its attributes and namespace declarations
+    """
+    empty = etree.tostring(etree.Element(element.tag, element.attrib, nsmap=element.nsmap))
+    return _strip_declarations(empty[:-2], root_nsmap) + b">"
+
+
+def _end_tag(element: etree.ElementBase) -> bytes:
+    name = etree.QName(element).localname
+    return "</{0}>".format(element.prefix + ":" + name if element.prefix else name).encode("utf-8")
+
+
+def _chunk_bytes(element: etree.ElementBase, root_nsmap: Dict) -> bytes:
+    """
+    Serializes a chunk of the document without the namespace declarations that are already on the root
+    """
+    chunk = etree.tostring(element, encoding="utf-8", with_tail=True)
+    end = chunk.index(b">")
+    return _strip_declarations(chunk[:end], root_nsmap) + chunk[end:]
+
+
+def stream_xml(f_in: IO[bytes], f_out: IO[bytes], containers: Iterable[str],
+               process: Callable[[etree.ElementBase], None]) -> None:
+    """
+    Rewrites an xml document without loading it as a whole. The root and the container elements are
+    copied tag by tag, every other child of them (a chunk, e.g. a paragraph or a table) is parsed
+    completely, passed to process (which modifies it in place), written and discarded.
+    :param containers: Tags (in clark notation) of the elements to stream into
+    """
+    containers = set(containers)
+    f_out.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n')
+    open_elements = []
+    text_written = set()
+    root_nsmap = None
+    for event, element in etree.iterparse(f_in, events=("start", "end", "comment", "pi"), resolve_entities=False,
+                                          huge_tree=True):
+        parent = open_elements[-1] if open_elements else None
+        if parent is not None and parent is not element and id(parent) not in text_written:
+            # the text before the first child
+            f_out.write(escape(parent.text or "").encode("utf-8"))
+            text_written.add(id(parent))
+        if event == "start":
+            if parent is None or (element.tag in containers and element.getparent() is parent):
+                f_out.write(_start_tag(element, root_nsmap))
+                if parent is None:
+                    root_nsmap = element.nsmap
+                open_elements.append(element)
+        elif parent is element:
+            if id(element) not in text_written:
+                f_out.write(escape(element.text or "").encode("utf-8"))
+            text_written.discard(id(element))
+            open_elements.pop()
+            f_out.write(_end_tag(element))
+            if open_elements:
+                f_out.write(escape(element.tail or "").encode("utf-8"))
+                open_elements[-1].remove(element)
+        elif parent is None:
+            # comments and processing instructions around the root
+            f_out.write(etree.tostring(element, encoding="utf-8") + b"\n")
+        elif element.getparent() is parent:
+            if event == "end":
+                process(element)
+                f_out.write(_chunk_bytes(element, root_nsmap))
+            else:
+                f_out.write(etree.tostring(element, encoding="utf-8", with_tail=True))
+            parent.remove(element)
+
+
+def _get_piece(piece: Tuple[etree.ElementBase, str]) -> str:
+    return getattr(piece[0], piece[1]) or ""
+
+
+def _set_piece(piece: Tuple[etree.ElementBase, str], text: str) -> None:
+    setattr(piece[0], piece[1], text)
+
+
+def convert_pieces(pieces: List[Piece]) -> int:
+    """
+    Converts the bijoy text pieces of a paragraph to unicode in place. A word that is split over several
+    pieces (e.g. by a change of formatting) is moved into the piece where it starts, because the
+    conversion reorders the characters of a word.
+    :param pieces: Text pieces in the reading order, None where the words are separated
+    :return: Number of converted characters
+    """
+    chars = 0
+    current = []
+    for a_piece in pieces + [None]:
+        if a_piece is not None:
+            if current and _get_piece(a_piece) and not _get_piece(a_piece)[0].isspace():
+                owner = next((a_previous for a_previous in reversed(current) if _get_piece(a_previous)), None)
+                if owner is not None and not _get_piece(owner)[-1].isspace():
+                    word = _leading_word.match(_get_piece(a_piece)).group()
+                    _set_piece(owner, _get_piece(owner) + word)
+                    _set_piece(a_piece, _get_piece(a_piece)[len(word):])
+            current.append(a_piece)
+            continue
+        for a_current in current:
+            text = _get_piece(a_current)
+            if text:
+                _set_piece(a_current, bijoy2unicode(text))
+                chars += len(text)
+        current = []
+    return chars
+
+
+class _DocxStyles:
+    """
+    The fonts of the styles of a docx (word/styles.xml)
+    """
+
+    def __init__(self) -> None:
+        self.fonts = {}
+        self.based_on = {}
+        self.default_paragraph_style = None
+        self.default_font = None
+
+    def add(self, element: etree.ElementBase) -> None:
+        """
+        Adds a w:style or the w:docDefaults
+        """
+        if element.tag == _W + "docDefaults":
+            self.default_font = _docx_font(element.find(_W + "rPrDefault/" + _W + "rPr"))
+        elif element.tag == _W + "style":
+            style_id = element.get(_W + "styleId")
+            self.fonts[style_id] = _docx_font(element.find(_W + "rPr"))
+            based_on = element.find(_W + "basedOn")
+            if based_on is not None:
+                self.based_on[style_id] = based_on.get(_W + "val")
+            if element.get(_W + "type") == "paragraph" and element.get(_W + "default") in ("1", "true", "on"):
+                self.default_paragraph_style = style_id
+
+    def font(self, style_id: Optional[str]) -> Optional[str]:
+        seen = set()
+        while style_id is not None and style_id not in seen:
+            seen.add(style_id)
+            if self.fonts.get(style_id):
+                return self.fonts[style_id]
+            style_id = self.based_on.get(style_id)
+        return None
+
+    def paragraph_font(self, paragraph: etree.ElementBase) -> Optional[str]:
+        style = paragraph.find(_W + "pPr/" + _W + "pStyle")
+        return self.font(style.get(_W + "val") if style is not None else self.default_paragraph_style) or \
+            self.default_font
+
+    def run_font(self, run: etree.ElementBase, paragraph_font: Optional[str]) -> Optional[str]:
+        properties = run.find(_W + "rPr")
+        font = _docx_font(properties)
+        if font is None and properties is not None and properties.find(_W + "rStyle") is not None:
+            font = self.font(properties.find(_W + "rStyle").get(_W + "val"))
+        return font or paragraph_font
+
+
+def _docx_font(properties: Optional[etree.ElementBase]) -> Optional[str]:
+    """
+    The font of the ascii characters (that bijoy is made of) in a w:rPr
+    """
+    fonts = properties.find(_W + "rFonts") if properties is not None else None
+    if fonts is None:
+        return None
+    return fonts.get(_W + "ascii") or fonts.get(_W + "hAnsi")
+
+
+def _remap_docx_fonts(element: etree.ElementBase, unicode_font: str, bijoy_fonts: Tuple[str]) -> None:
+    """
+    Replaces the bijoy fonts by the unicode font. Word renders bengali with the complex script font and
+    size, so these are set as well.
+    """
+    for fonts in element.iter(_W + "rFonts"):
+        if not any(is_bijoy_font(fonts.get(_W + a_key) or "", bijoy_fonts) for a_key in ("ascii", "hAnsi")):
+            continue
+        for a_key in ("ascii", "hAnsi", "cs"):
+            fonts.set(_W + a_key, unicode_font)
+        for a_key in ("asciiTheme", "hAnsiTheme", "cstheme"):
+            fonts.attrib.pop(_W + a_key, None)
+        properties = fonts.getparent()
+        for a_tag, a_complex_tag in (("sz", "szCs"), ("b", "bCs"), ("i", "iCs")):
+            a_property = properties.find(_W + a_tag)
+            if a_property is not None and properties.find(_W + a_complex_tag) is None:
+                a_property.addnext(etree.Element(_W + a_complex_tag, a_property.attrib))
+
+
+def _docx_pieces(paragraph: etree.ElementBase, styles: _DocxStyles, bijoy_fonts: Tuple[str]) -> List[Piece]:
+    paragraph_font = styles.paragraph_font(paragraph)
+    pieces = []
+    for a_run in paragraph.iter(_W + "r"):
+        if next(a_run.iterancestors(_W + "p")) is not paragraph:
+            # a run of a nested paragraph, e.g. in a text box
+            continue
+        if not is_bijoy_font(styles.run_font(a_run, paragraph_font) or "", bijoy_fonts):
+            pieces.append(None)
+            continue
+        for a_child in a_run:
+            if a_child.tag in (_W + "t", _W + "delText"):
+                pieces.append((a_child, "text"))
+            elif a_child.tag in _docx_breaks:
+                pieces.append(None)
+    return pieces
+
+
+def _convert_docx_chunk(chunk: etree.ElementBase, styles: _DocxStyles, unicode_font: str,
+                        bijoy_fonts: Tuple[str], stats: Dict) -> None:
+    for a_paragraph in chunk.iter(_W + "p"):
+        pieces = _docx_pieces(a_paragraph, styles, bijoy_fonts)
+        converted = convert_pieces(pieces)
+        if converted:
+            stats['paragraphs'] += 1
+            stats['chars'] += converted
+            for a_piece in pieces:
+                if a_piece is not None:
+                    a_piece[0].set(_XML_SPACE, "preserve")
+    _remap_docx_fonts(chunk, unicode_font, bijoy_fonts)
+
+
+class _OdtStyles:
+    """
+    The fonts of the font faces, the styles and the default styles of an odt
+    """
+
+    def __init__(self) -> None:
+        self.faces = {}
+        self.styles = {}
+        self.defaults = {}
+
+    def copy(self) -> "_OdtStyles":
+        a_copy = _OdtStyles()
+        a_copy.faces, a_copy.styles, a_copy.defaults = dict(self.faces), dict(self.styles), dict(self.defaults)
+        return a_copy
+
+    def add(self, chunk: etree.ElementBase) -> None:
+        """
+        Adds the style:font-face, style:style and style:default-style elements of a chunk
+        """
+        for a_face in chunk.iter(_STYLE + "font-face"):
+            self.faces[a_face.get(_STYLE + "name")] = (a_face.get(_SVG + "font-family") or "").strip("'\"")
+        for a_style in chunk.iter(_STYLE + "style", _STYLE + "default-style"):
+            properties = a_style.find(_STYLE + "text-properties")
+            font = None
+            if properties is not None:
+                font = properties.get(_STYLE + "font-name") or properties.get(_FO + "font-family")
+            if a_style.tag == _STYLE + "default-style":
+                self.defaults[a_style.get(_STYLE + "family")] = font
+            else:
+                self.styles[(a_style.get(_STYLE + "family"), a_style.get(_STYLE + "name"))] = \
+                    (font, a_style.get(_STYLE + "parent-style-name"))
+
+    def font(self, family: str, name: Optional[str]) -> Optional[str]:
+        seen = set()
+        while name is not None and (family, name) not in seen:
+            seen.add((family, name))
+            font, name = self.styles.get((family, name), (None, None))
+            if font:
+                return self.faces.get(font, font.strip("'\""))
+        font = self.defaults.get(family)
+        return self.faces.get(font, font.strip("'\"")) if font else None
+
+
+def _odt_paragraph_pieces(element: etree.ElementBase, font: Optional[str], styles: _OdtStyles,
+                          bijoy_fonts: Tuple[str], pieces: List[Piece]) -> None:
+    if element.get(_TEXT + "style-name") is not None and element.tag in _odt_spans:
+        font = styles.font("text", element.get(_TEXT + "style-name")) or font
+    bijoy = is_bijoy_font(font or "", bijoy_fonts)
+    pieces.append((element, "text") if bijoy else None)
+    for a_child in element:
+        if a_child.tag in _odt_spans:
+            _odt_paragraph_pieces(a_child, font, styles, bijoy_fonts, pieces)
+        elif a_child.tag in _odt_breaks or len(a_child) or a_child.text:
+            # word breaks, notes, frames, ... (nested paragraphs are converted on their own)
+            pieces.append(None)
+        pieces.append((a_child, "tail") if bijoy else None)
+
+
+def _remap_odt_fonts(chunk: etree.ElementBase, unicode_font: str, bijoy_fonts: Tuple[str],
+                     styles: _OdtStyles) -> None:
+    """
+    Replaces the bijoy fonts by the unicode font. LibreOffice renders bengali with the complex font, size,
+    weight and style, so these are set as well.
+    """
+    family = "'{0}'".format(unicode_font) if " " in unicode_font else unicode_font
+    for a_face in chunk.iter(_STYLE + "font-face"):
+        if is_bijoy_font(a_face.get(_SVG + "font-family", "").strip("'\""), bijoy_fonts):
+            a_face.set(_SVG + "font-family", family)
+    for properties in chunk.iter(_STYLE + "text-properties"):
+        font_name = properties.get(_STYLE + "font-name")
+        if font_name is not None and is_bijoy_font(styles.faces.get(font_name, font_name), bijoy_fonts):
+            properties.set(_STYLE + "font-name-complex", font_name)
+        elif is_bijoy_font((properties.get(_FO + "font-family") or "").strip("'\""), bijoy_fonts):
+            properties.set(_FO + "font-family", family)
+            properties.set(_STYLE + "font-family-complex", family)
+        else:
+            continue
+        for a_property in ("font-size", "font-weight", "font-style"):
+            if properties.get(_FO + a_property) is not None and properties.get(_STYLE + a_property + "-complex") is None:
+                properties.set(_STYLE + a_property + "-complex", properties.get(_FO + a_property))
+
+
+def _convert_odt_chunk(chunk: etree.ElementBase, styles: _OdtStyles, unicode_font: str,
+                       bijoy_fonts: Tuple[str], stats: Dict) -> None:
+    styles.add(chunk)
+    for a_paragraph in chunk.iter(_TEXT + "p", _TEXT + "h"):
+        pieces = []
+        _odt_paragraph_pieces(a_paragraph, styles.font("paragraph", a_paragraph.get(_TEXT + "style-name")),
+                              styles, bijoy_fonts, pieces)
+        converted = convert_pieces(pieces)
+        if converted:
+            stats['paragraphs'] += 1
+            stats['chars'] += converted
+    _remap_odt_fonts(chunk, unicode_font, bijoy_fonts, styles)
+
+
+def _collect_styles(document: zf.ZipFile, name: str, styles) -> None:
+    """
+    Collects the styles of a part of the document in a streaming pass
+    """
+    if name not in document.namelist():
+        return
+    with document.open(name) as f_in:
+        for _, element in etree.iterparse(f_in, resolve_entities=False, huge_tree=True):
+            if element.tag in (_W + "style", _W + "docDefaults", _STYLE + "font-face", _STYLE + "style",
+                               _STYLE + "default-style"):
+                styles.add(element)
+                element.clear()
+
+
+def convert_office_document(src_file: str, dest_file: str, unicode_font: str = UNICODE_FONT,
+                            bijoy_fonts: Iterable[str] = BIJOY_FONTS) -> Dict:
+    """
+    Converts the text set in bijoy fonts in a docx or an odt document to unicode and replaces the bijoy
+    fonts by a unicode font, keeping the formatting. The xml parts of the document are streamed from
+    the zip one paragraph at a time, so the document is never loaded as a whole.
+    :param src_file: Path of the .docx or .odt document
+    :param dest_file: Path of the converted document
+    :param unicode_font: Family of the unicode font that replaces the bijoy fonts
+    :param bijoy_fonts: Patterns of the bijoy font families (see encoding.fonts)
+    :return: Number of converted paragraphs and characters
+    """
+    extension = os.path.splitext(src_file)[1].lower()
+    if extension not in _docx_extensions + _odt_extensions:
+        raise ValueError("Only the {0} documents are supported".format(", ".join(_docx_extensions + _odt_extensions)))
+    bijoy_fonts = tuple(bijoy_fonts)
+    stats = {'paragraphs': 0, 'chars': 0}
+    with zf.ZipFile(src_file) as src, zf.ZipFile(dest_file, "w") as dest:
+        if extension in _docx_extensions:
+            styles = _DocxStyles()
+            _collect_styles(src, "word/styles.xml", styles)
+        else:
+            styles = _OdtStyles()
+            _collect_styles(src, "styles.xml", styles)
+        for info in src.infolist():
+            dest_info = zf.ZipInfo(info.filename, info.date_time)
+            dest_info.compress_type = info.compress_type
+            dest_info.external_attr = info.external_attr
+            with src.open(info) as f_in, dest.open(dest_info, "w") as f_out:
+                if extension in _docx_extensions and _docx_text_parts.match(info.filename):
+                    stream_xml(f_in, f_out, [_W + "body"],
+                               lambda chunk: _convert_docx_chunk(chunk, styles, unicode_font, bijoy_fonts, stats))
+                elif extension in _docx_extensions and _docx_font_parts.match(info.filename):
+                    stream_xml(f_in, f_out, [],
+                               lambda chunk: _remap_docx_fonts(chunk, unicode_font, bijoy_fonts))
+                elif extension in _odt_extensions and info.filename in ("content.xml", "styles.xml"):
+                    # the automatic styles of a part are only visible in that part
+                    part_styles = styles.copy()
+                    stream_xml(f_in, f_out, [_OFFICE + "body", _OFFICE + "text"],
+                               lambda chunk: _convert_odt_chunk(chunk, part_styles, unicode_font, bijoy_fonts,
+                                                                stats))
+                else:
+                    shutil.copyfileobj(f_in, f_out)
+    return stats
+
+
+def _convert_document(job: Dict) -> Dict:
+    """
+    Converts a single document as described by job. Runs in the worker processes of convert_office_folder.
+    """
+    result = {'file': job['rel_path'], 'paragraphs': 0, 'chars': 0, 'seconds': 0.0, 'error': None}
+    start_time = time.time()
+    try:
+        os.makedirs(os.path.dirname(job['dest']) or ".", exist_ok=True)
+        # write to a temporary file first, so an interrupted run never leaves a complete looking output
+        result.update(convert_office_document(job['src'], job['dest'] + ".part", job['unicode_font'],
+                                              job['bijoy_fonts']))
+        os.replace(job['dest'] + ".part", job['dest'])
+    except Exception as e:
+        result['error'] = "{0}: {1}".format(type(e).__name__, e)
+        if os.path.exists(job['dest'] + ".part"):
+            os.remove(job['dest'] + ".part")
+    result['seconds'] = time.time() - start_time
+    return result
+
+
+def convert_office_folder(src: str, output_folder: str, unicode_font: str = UNICODE_FONT,
+                          bijoy_fonts: Iterable[str] = BIJOY_FONTS, workers: int = None) -> Dict:
+    """
+    Converts all the docx and odt documents of a directory (or the documents matching a glob pattern) in a
+    pool of worker processes, into a mirrored directory tree. Outputs that are already up to date are
+    skipped, so an interrupted run can be resumed. Progress and failures are reported to stderr.
+    :param src: A directory or a glob pattern
+    :param output_folder: Root of the mirrored output tree
+    :param unicode_font: Family of the unicode font that replaces the bijoy fonts
+    :param bijoy_fonts: Patterns of the bijoy font families (see encoding.fonts)
+    :param workers: Number of worker processes. Defaults to the number of cpus
+    :return: A summary of the run
+    """
+    jobs = []
+    skipped = 0
+    for a_file, rel_path in _list_files(src):
+        if os.path.splitext(a_file)[1].lower() not in _docx_extensions + _odt_extensions:
+            continue
+        dest = os.path.join(output_folder, rel_path)
+        if os.path.exists(dest) and os.path.getmtime(dest) >= os.path.getmtime(a_file):
+            skipped += 1
+            continue
+        jobs.append({'src': a_file, 'rel_path': rel_path, 'dest': dest, 'unicode_font': unicode_font,
+                     'bijoy_fonts': tuple(bijoy_fonts)})
+
+    summary = {'files': len(jobs) + skipped, 'converted': 0, 'skipped': skipped, 'failed': [], 'paragraphs': 0,
+               'chars': 0}
+    start_time = time.time()
+    pool = Pool(workers) if workers != 1 else None
+    try:
+        results = pool.imap(_convert_document, jobs) if pool else map(_convert_document, jobs)
+        for i, result in enumerate(results):
+            if result['error']:
+                summary['failed'].append({'file': result['file'], 'error': result['error']})
+                sys.stderr.write("[{0}/{1}] FAILED {2}: {3}\n".format(i + 1, len(jobs), result['file'],
+                                                                     result['error']))
+                continue
+            summary['converted'] += 1
+            summary['paragraphs'] += result['paragraphs']
+            summary['chars'] += result['chars']
+            sys.stderr.write("[{0}/{1}] {2} ({3} paragraphs, {4:.3f}s)\n".format(
+                i + 1, len(jobs), result['file'], result['paragraphs'], result['seconds']))
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    summary['seconds'] = time.time() - start_time
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts the Bijoy text of Word and LibreOffice documents to Unicode")
+    parser.add_argument("src", action="store", type=str,
+                        help="A .docx/.odt document, a directory or a (quoted) glob pattern")
+    parser.add_argument("output", action="store", type=str,
+                        help="The converted document, or the root of the mirrored output tree")
+    parser.add_argument("--unicode_font", action="store", default=UNICODE_FONT, type=str,
+                        help="Unicode font (of resources/bangla_fonts) that replaces the Bijoy fonts "
+                             "(default: {0})".format(UNICODE_FONT))
+    parser.add_argument("--bijoy_fonts", action="store", default=list(BIJOY_FONTS), type=str, nargs="+",
+                        help="Patterns of the Bijoy font families (default: {0})".format(" ".join(BIJOY_FONTS)))
+    parser.add_argument("--workers", action="store", default=None, type=int,
+                        help="Number of worker processes (default: number of cpus)")
+    args = parser.parse_args()
+
+    if os.path.isdir("resources/bangla_fonts") and args.unicode_font not in unicode_font_families():
+        parser.error("{0} is not one of the fonts of resources/bangla_fonts: {1}".format(
+            args.unicode_font, ", ".join(sorted(unicode_font_families()))))
+    if os.path.isfile(args.src):
+        summary = convert_office_document(args.src, args.output, args.unicode_font, args.bijoy_fonts)
+    else:
+        summary = convert_office_folder(args.src, args.output, args.unicode_font, args.bijoy_fonts, args.workers)
+    sys.stderr.write(json.dumps(summary, ensure_ascii=False) + "\n")
+    if summary.get('failed'):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
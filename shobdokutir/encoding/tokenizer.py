@@ -0,0 +1,71 @@
+import re
+import unicodedata
+from typing import Iterator, List, Tuple
+
+from shobdokutir.encoding.char_classes import char_class, CLASS_PRE_KAR, CLASS_POST_KAR, CLASS_MID_KAR, \
+    CLASS_HASANT, CLASS_NUKTA, CLASS_SIGN
+from shobdokutir.encoding.utils import _bengali_conjunct, _bengali_cluster_pattern
+
+# Runs of bengali letters and marks (without the digits and the currency/number signs), of bengali digits and
+# of the letters and digits of the other scripts
+_token_pattern = re.compile("[ঀ-৥ৰৱ\u200c\u200d]+|[০-৯]+|[^\\W_ঀ-৿]+")
+# A pre-kar or mid-kar typed before its consonant (e.g. by a visual order conversion)
+_misplaced_kar = re.compile("([িেৈোৌ])(" + _bengali_conjunct + ")")
+# Marks that can not start a word
+_mark_classes = {CLASS_PRE_KAR, CLASS_POST_KAR, CLASS_MID_KAR, CLASS_HASANT, CLASS_NUKTA, CLASS_SIGN}
+# Khanda ta written as ta + hasant + zero width joiner
+_khanda_ta = re.compile("ত্\u200d")
+# A bengali syllable cluster or any other visible character with its combining marks
+_grapheme_pattern = re.compile("(?:" + _bengali_cluster_pattern.pattern + ")|\\S[\u0300-\u036f\u200c\u200d]*")
+
+
+def normalize_token(token: str) -> str:
+    """
+    Brings the different spellings of a word to the same form, so that they can be matched:
+    1. NFC normalization (e.g. the decomposed and the precomposed o-kar)
+    2. ta + hasant + zero width joiner as khanda ta, no zero width (non) joiners
+    3. a pre-kar or mid-kar before its consonant is moved after it
+    4. lower case
+    """
+    token = unicodedata.normalize("NFC", token)
+    token = _khanda_ta.sub("ৎ", token).replace("\u200c", "").replace("\u200d", "")
+    a_match = _misplaced_kar.match(token)
+    if a_match:
+        token = a_match.group(2) + a_match.group(1) + token[a_match.end():]
+    return token.lower()
+
+
+def tokenize(text: str) -> Iterator[Tuple[str, int, int]]:
+    """
+    Splits a text into words. A bengali word is a run of letters, kars, hasants and signs that does not
+    start with a mark, except a pre-kar or mid-kar in front of its consonant.
+    :param text: A unicode string
+    :return: Iterator over the (normalized word, start, end) of the words, the offsets are in text
+    """
+    for a_match in _token_pattern.finditer(text):
+        start, end = a_match.span()
+        while start < end and char_class(text[start]) in _mark_classes and \
+                not _misplaced_kar.match(text, start, end):
+            start += 1
+        while start < end and text[start] in "\u200c\u200d":
+            start += 1
+        if start < end:
+            token = normalize_token(text[start:end])
+            if token:
+                yield token, start, end
+
+
+def words(text: str) -> List[str]:
+    """
+    The normalized words of a text
+    """
+    return [a_token for a_token, _, _ in tokenize(text)]
+
+
+def grapheme_clusters(text: str) -> List[str]:
+    """
+    Splits a text into the units a reader (or an OCR model) sees: bengali syllable clusters (a juktoborno
+    with its ref, kars and signs, as in encoding.utils.bengali_clusters) and the other visible characters.
+    Whitespaces are left out.
+    """
+    return [a_match.group() for a_match in _grapheme_pattern.finditer(text)]
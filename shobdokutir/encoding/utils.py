@@ -4,8 +4,16 @@ import os
 import shutil
 import sys
 import hashlib
+import json
 import re
-from typing import Dict, List, Set, BinaryIO
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+from typing import Dict, List, Set, Tuple, BinaryIO, TextIO, Iterable, Iterator, Match, Pattern
+
+from shobdokutir.encoding.char_classes import BENGALI_CHAR_FLAGS, FLAG_DIGIT, FLAG_PRE_KAR, FLAG_POST_KAR, \
+    FLAG_MID_KAR, FLAG_KAR, FLAG_BANJON_BORNO, FLAG_SOR_BORNO, FLAG_CHANDRABINDU, FLAG_HASANT, FLAG_NUKTA
 
 
 b2u_maps = {
@@ -59,75 +67,49 @@ u2b_maps = {
     "দ": "`", "ধ": "a", "ন": "b", "প": "c", "ফ": "d", "ব": "e", "ভ": "f", "ম": "g", "য": "h", "র": "i", "ল": "j",
     "শ": "k", "ষ": "l", "স": "m", "হ": "n", "ড়": "o", "ঢ়": "p", "য়": "q", "ৎ": "r", "০": "0", "১": "1", "২": "2",
     "৩": "3", "৪": "4", "৫": "5", "৬": "6", "৭": "7", "৮": "8", "৯": "9", "া": "v", "ি": "w", "ী": "x", "ু": "y",
-    "ূ": "~", "ৃ": "…", "ে": "‡", "ৈ": "‰", "ৗ": "Š", "ং": "s", "ঃ": "t", "ঁ": "u"
+    "ূ": "~", "ৃ": "…", "ে": "‡", "ৈ": "‰", "ৗ": "Š", "ং": "s", "ঃ": "t", "ঁ": "u",
+    "\u09a1\u09bc": "o", "\u09a2\u09bc": "p", "\u09af\u09bc": "q"
 }
 
 
-def apply_char_map(text: str, char_map: Dict) -> str:
-    to_match = "|".join(char_map.keys())
-    text = re.sub(to_match, lambda m: char_map[m.group(0)], text)
-    return text
-
-
 def is_bengali_digit(c: str) -> bool:
-    if '০' <= c <= '৯':
-        return True
-    return False
+    return BENGALI_CHAR_FLAGS.get(c, 0) & FLAG_DIGIT != 0
 
 
 def is_bengali_pre_kar(c: str) -> bool:
-    if c == 'ি' or c == 'ৈ' or c == 'ে':
-        return True
-    return False
+    return BENGALI_CHAR_FLAGS.get(c, 0) & FLAG_PRE_KAR != 0
 
 
 def is_bengali_post_kar(c: str) -> bool:
-    if c == 'া' or c == 'ৗ' or c == 'ু' or c == 'ূ' or c == 'ী' or c == 'ৃ':
-        return True
-    return False
+    return BENGALI_CHAR_FLAGS.get(c, 0) & FLAG_POST_KAR != 0
 
 
 def is_bengali_mid_kar(c: str) -> bool:
-    if c == 'ো' or c == 'ৌ':
-        return True
-    return False
+    return BENGALI_CHAR_FLAGS.get(c, 0) & FLAG_MID_KAR != 0
 
 
 def is_bengali_kar(c: str) -> bool:
-    if is_bengali_pre_kar(c) or is_bengali_post_kar(c) or is_bengali_mid_kar(c):
-        return True
-    return False
+    return BENGALI_CHAR_FLAGS.get(c, 0) & FLAG_KAR != 0
 
 
 def is_bengali_banjon_borno(c: str) -> bool:
-    if 'ক' <= c <= 'ন' or 'প' <= c <= 'র' or c == 'ল' or 'শ' <= c <= 'হ' or c == 'ড়' or c == 'ঢ়' or c == 'য়' \
-            or c == 'ৎ' or c == 'ং' or c == 'ঃ' or c == 'ঁ':
-        return True
-    return False
+    return BENGALI_CHAR_FLAGS.get(c, 0) & FLAG_BANJON_BORNO != 0
 
 
 def is_bengali_sor_borno(c: str) -> bool:
-    if 'অ' <= c <= 'ঌ' or c == 'এ' or c == 'ঐ' or c == 'ও' or c == 'ঔ':
-        return True
-    return False
+    return BENGALI_CHAR_FLAGS.get(c, 0) & FLAG_SOR_BORNO != 0
 
 
 def is_bengali_chandrabindu(c: str) -> bool:
-    if c and hex(ord(c)) == '0x981':
-        return True
-    return False
+    return BENGALI_CHAR_FLAGS.get(c, 0) & FLAG_CHANDRABINDU != 0
 
 
 def is_bengali_hasant(c: str) -> bool:
-    if c and hex(ord(c)) == '0x9cd':
-        return True
-    return False
+    return BENGALI_CHAR_FLAGS.get(c, 0) & FLAG_HASANT != 0
 
 
 def is_bengali_nukta(c: str) -> bool:
-    if c and hex(ord(c)) == '0x9bc':
-        return True
-    return False
+    return BENGALI_CHAR_FLAGS.get(c, 0) & FLAG_NUKTA != 0
 
 
 def is_space(c: str) -> bool:
@@ -142,240 +124,335 @@ def get_char(a_string: str, place_holder: int) -> str:
     return a_string[place_holder]
 
 
-def _find_hasant_chain(a_string: str, pos: int) -> int:
-    if not is_bengali_hasant(get_char(a_string, pos + 2)):
-        return pos
-    return _find_hasant_chain(a_string, pos + 2)
-
-
-def _rearrange_groups(groups: List) -> List:
-    """
-    Re-arrange the groups by having some considerations in mind
-    Considerations:
-    1. ref + banjonborno -> banjonborno + ref
-    2. banjonborno + prekar -> prekar + banjonborno
-    3. banjonborno + okar -> ekar + banjonborno + akar
-    4. banjonborno + oukar -> ekar + banjonborno + "ৗ"
-    """
-    for i in range(len(groups)):
-        has_postkar = False
-        has_midkar = False
-        if is_bengali_pre_kar(groups[i][-1][1]):
-            # send prekar to the front
-            groups[i].insert(0, groups[i].pop())
-        elif is_bengali_post_kar(groups[i][-1][1]):
-            has_postkar = True
-        elif is_bengali_mid_kar(groups[i][-1][1]):
-            has_midkar = True
-            if groups[i][-1][1] == "ো":
-                groups[i].insert(0, (hex(ord("ে")), "ে") )
-                groups[i].pop()
-                groups[i].insert(len(groups[i]), (hex(ord("া")), "া"))
-            elif groups[i][-1][1] == "ৌ":
-                groups[i].insert(0, (hex(ord("ে")), "ে"))
-                groups[i].pop()
-                groups[i].insert(len(groups[i]), (hex(ord("ৗ")), "ৗ"))
-        hasant_ind = _get_hasant_indices(groups[i])
-        for j in hasant_ind:
-            if groups[i][j-1][1] == 'র':
-                # send ref to the last pos if there is no postkar
-                # if there is a postKar send it to the 2nd last position
-                if has_postkar or has_midkar:                   
-                    groups[i].insert(-1, groups[i].pop(j))
-                    groups[i].insert(-2, groups[i].pop(j-1))
-                else:
-                    groups[i].insert(len(groups[i])-1, groups[i].pop(j))
-                    groups[i].insert(len(groups[i])-2, groups[i].pop(j-1))
-    return groups
-
-
-def _make_groups(a_string: str) -> List:
-    """
-    Considerations:
-    1. banjonborno > banjonborno (no kar)
-    2. shorborno > banjonborno  (no kar)
-    3. banjonborno > kar
-    4. banjonborno > Hasant (End with hasant)
-    5. banjonborno > Hasant > banjonborno (normal juktoborno)
-    6. banjonborno > Hasant > banjonborno > kar
-    7. banjonborno > Hasant > banjonborno > kar > banjonborno
-    8. banjonborno > Hasant > banjonborno > ..... > Hasant > banjonborno
-    """
-    groups = []
-    
-    place_holder = 0
-    for _ in range(len(a_string)):
-        queue = []
-        char = get_char(a_string, place_holder)
-        char_prev = get_char(a_string, place_holder -1)
-        char_next = get_char(a_string, place_holder+1)
-
-        if not char:
-            break
+_b2u_prekar_set = {"‡", "w", "‰", "†", "ˆ"}
+_b2u_fola_set = {"…", "ª", "«", "¨", "Ö", "„"}
+_b2u_kar_set = {"‡", "w", "‰", "†", "ˆ", "v", "Š", "y", "~", "x", "…"}
+_b2u_ref_fola_set = {"©", "¨", "«", "ª"}
 
-        if not char_next:
-            # Last character of the word
-            groups.append([(hex(ord(char)), char)])
-            break
 
-        if is_bengali_hasant(char_next):
-            # When the next char is hasant, just increase place_holder
-            # as the condition for dealing with hasant will also get the banjonborno before it
-            place_holder += 1
-        
-        elif is_bengali_hasant(char):
-            # Standing on Hasant
-            # append to group as long as there are hasants on 2 places in front
-            # means there are multiple Juktoborno0
-            temp_placeholder = _find_hasant_chain(a_string, place_holder)
-            
-            if is_bengali_banjon_borno(char_prev):
-                # Get the prev banjonborno i.e. for গর্ব get র or for অন্ত get ন
-                queue.append((hex(ord(char_prev)), char_prev))
-            
-            while place_holder <= temp_placeholder:
-                # deal with the hasant chain
-                queue.append((hex(ord(get_char(a_string, place_holder))), get_char(a_string, place_holder)))
-                place_holder += 1
-
-            if is_bengali_kar(get_char(a_string, place_holder)):
-                # banjonborno > Hasant > banjonborno > kar
-                queue.append((hex(ord(get_char(a_string, place_holder))), get_char(a_string, place_holder)))
-                # place_holder += 1
-
-            elif is_bengali_banjon_borno(get_char(a_string, place_holder)):
-                # banjonborno > Hasant > banjonborno > kar
-                queue.append((hex(ord(get_char(a_string, place_holder))), get_char(a_string, place_holder)))
-                place_holder += 1
-            
-            if is_bengali_kar(get_char(a_string, place_holder)):
-                # banjonborno > Hasant > banjonborno > kar
-                queue.append((hex(ord(get_char(a_string, place_holder))), get_char(a_string, place_holder)))
-                place_holder += 1
- 
-            groups.append(queue)
-
-        elif (is_bengali_banjon_borno(char) or is_bengali_sor_borno(char)) and (is_bengali_banjon_borno(char_next) or
-                                                                                is_bengali_sor_borno(char_next)):
-            # if 2 banjonborno/shorborno are one after another, append the 1st one in groups
-            # Example: কলম, আম
-            groups.append([(hex(ord(char)), char)])
-            place_holder += 1
-        
-        elif is_bengali_banjon_borno(char) and is_bengali_kar(char_next):
-            # if there is kar after a banjonborno, deal with that
-            # Example: আসে,বসে,আকাশে,বাতাসে
-            queue.append((hex(ord(char)), char))
-            queue.append((hex(ord(char_next)), char_next))
-            place_holder += 2
-            groups.append(queue)
-    
-    return _rearrange_groups(groups)
-
-
-def _get_hasant_indices(group):
-    """
-    Return all the positions that has hasant in the group
-    """
-    indices = []
-    for i, char in enumerate(group):
-        if is_bengali_hasant(char[1]):
-            indices.append(i)
-    return indices
-
-
-def _shift_right(target: List, pos: int) -> List:
-    """
-    Shift prekars to right until stopping condition is met
-    """   
-    #Blind shift once
-    target[pos], target[pos+1] = target[pos+1], target[pos]
-    pos += 1
-
-    #If there is a ref at the right, shift again
-    if pos < len(target)-1:
-        if target[pos+1] == "©" or target[pos+1] == "¨" or target[pos+1] == "«" or target[pos+1] == "ª":
-            target[pos], target[pos+1] = target[pos+1], target[pos]
-    return target
-
-
-def _rearrange_b2u(target: List, prekar_set: Set) -> List:
-    # store the indices of refs, prekars and postkars in these lists
-    refs = []
-    prekars = []
-    chondrobindus = []
-    fola_set = {"…", "ª", "«", "¨", "Ö", "„"}
-    kar_set = {"‡", "w", "‰", "†", "ˆ","v", "Š", "y", "~", "x", "…" }
-    for i, char in enumerate(target):
-        if char in prekar_set:
-            # if the character I'm standing on is a prekar
-            prekars.append(i)
-                
-    for pr in prekars:
-        if target[pr+1] == "©" or target[pr+1] in fola_set:
-            target[pr+1], target[pr+2] = target[pr+2], target[pr+1]
-        target = _shift_right(target, pr)
-
-    for i, char in enumerate(target):
-        if char == "©":
-            # if the character I'm standing on is a ref
-            refs.append(i)
-
-    for r in refs:
-        # rearrange all the refs
-        # banjonborno(or juktoborno) + ref => ref + banjonborno(or juktoborno)
-        target[r], target[r-1] = target[r-1], target[r]
-        if (target[r] in fola_set) or (target[r] in kar_set) :
-            target[r-1], target[r-2] = target[r-2], target[r-1]
-    
-    for i, char in enumerate(target):
-        if char == "u":
-            # if the character I'm standing on is a chondrobindu
-            chondrobindus.append(i)
-    
-    for c in chondrobindus:
-        if target[c+1] in kar_set:
-            target[c+1], target[c] = target[c], target[c+1]
-
-    return target
-    
+def _trie_pattern(trie: Dict) -> List[str]:
+    """
+    Produces the regex alternatives for a trie node. Children that have no children of their own
+    are merged into a single character class.
+    """
+    leaves = sorted(a_char for a_char, child in trie.items() if a_char and list(child) == [""])
+    branches = []
+    for a_char in sorted(trie):
+        if not a_char or a_char in leaves:
+            continue
+        child = trie[a_char]
+        child_pattern = "(?:" + "|".join(_trie_pattern(child)) + ")"
+        branches.append(re.escape(a_char) + (child_pattern + "?" if "" in child else child_pattern))
+    if len(leaves) == 1:
+        branches.append(re.escape(leaves[0]))
+    elif leaves:
+        branches.append("[" + "".join(re.escape(a_char) for a_char in leaves) + "]")
+    return branches
+
+
+def _compile_char_map(char_map: Dict) -> Pattern:
+    """
+    Compiles the keys of a character map into a longest-match regex. The keys are arranged in a
+    trie, so the regex engine checks every character only once instead of trying each key in turn.
+    """
+    trie = {}
+    for a_key in char_map:
+        node = trie
+        for a_char in a_key:
+            node = node.setdefault(a_char, {})
+        node[""] = {}
+    return re.compile("(" + "|".join(_trie_pattern(trie)) + ")")
 
-def bijoy2unicode(src_string: str) -> str:
+
+def apply_char_map(text: str, char_map: Dict) -> str:
     """
-    Convert Ansi Bijoy encoded Bengali string to Unicode
-    :param src_string:
-    :return:
-    """
-    if not src_string:
-        # If there is nothing in input return the same
-        return src_string
-
-    prekar_set = {"‡", "w", "‰", "†", "ˆ"}
-
-    escaped_bijoy_chars = (re.escape(a_bijoy) for a_bijoy in b2u_maps.keys())
-    to_match = "("+"|".join(escaped_bijoy_chars)+")"
-    target = [a_split for a_split in re.split(to_match, src_string) if a_split]
-        
-    target = _rearrange_b2u(target, prekar_set)
-    target_string = ""
-
-    for i, t in enumerate(target):
-        if i < len(target)-1:
-            if (t in prekar_set) and (target[i+1] == "Š"):
-                # ekar + banjonborno (or juktoborno) + akar(with urani)
-                # banjonborno (or juktoborno) + oukar
-                del target[i]
-                target_string += "ৌ"
+    Replaces the keys of char_map in text, the longest key first. Converts nothing but the characters;
+    BijoyConverter and UnicodeConverter also rearrange the kars and compile the map only once.
+    """
+    pattern = _compile_char_map(char_map)
+    return pattern.sub(lambda a_match: char_map[a_match.group(0)], text)
+
+
+def _b2u_shift_prekars(tokens: Iterable[str]) -> Iterator[str]:
+    """
+    A prekar is shifted to the right of the following banjonborno (and ref/fola). Needs a lookahead
+    of two tokens.
+    """
+    window = deque()
+    is_prekar = deque()
+
+    def pop_front() -> str:
+        if is_prekar[0] and len(window) > 1:
+            if len(window) > 2 and (window[1] == "©" or window[1] in _b2u_fola_set):
+                window[1], window[2] = window[2], window[1]
+            window[0], window[1] = window[1], window[0]
+            if len(window) > 2 and window[2] in _b2u_ref_fola_set:
+                window[1], window[2] = window[2], window[1]
+        is_prekar.popleft()
+        return window.popleft()
+
+    for token in tokens:
+        window.append(token)
+        is_prekar.append(token in _b2u_prekar_set)
+        if len(window) == 3:
+            yield pop_front()
+    while window:
+        yield pop_front()
+
+
+def _b2u_shift_refs(tokens: Iterable[str]) -> Iterator[str]:
+    """
+    Shifts a ref to the left of the preceding token.
+    banjonborno(or juktoborno) + ref => ref + banjonborno(or juktoborno)
+    Needs a lookbehind of two tokens.
+    """
+    window = deque()
+    for token in tokens:
+        window.append(token)
+        if token == "©" and len(window) > 1:
+            window[-1], window[-2] = window[-2], window[-1]
+            if len(window) > 2 and (window[-1] in _b2u_fola_set or window[-1] in _b2u_kar_set):
+                window[-2], window[-3] = window[-3], window[-2]
+        if len(window) == 3:
+            yield window.popleft()
+    yield from window
+
+
+def _b2u_shift_chondrobindus(tokens: Iterable[str]) -> Iterator[str]:
+    """
+    A chondrobindu is moved after the kar that follows it. Needs a lookahead of one token.
+    """
+    window = deque()
+    is_chondrobindu = deque()
+    for token in tokens:
+        window.append(token)
+        is_chondrobindu.append(token == "u")
+        if len(window) == 2:
+            if is_chondrobindu.popleft() and window[1] in _b2u_kar_set:
+                window[0], window[1] = window[1], window[0]
+            yield window.popleft()
+    yield from window
+
+
+def _b2u_emit(tokens: Iterable[str], char_map: Dict) -> Iterator[str]:
+    """
+    Maps the rearranged bijoy tokens to unicode. ekar + banjonborno + akar (or ৗ) are
+    already rearranged to banjonborno + ekar + akar (or ৗ) and are emitted as okar (or oukar).
+    """
+    prev = None
+    for token in tokens:
+        if prev is not None:
+            if prev in _b2u_prekar_set and token == "Š":
+                yield "ৌ"
+                prev = None
                 continue
-            elif t in prekar_set and target[i+1] == "v":
-                # ekar + banjonborno (or juktoborno) + akar
-                # banjonborno (or juktoborno) + okar
-                del target[i]
-                target_string += "ো"
+            elif prev in _b2u_prekar_set and token == "v":
+                yield "ো"
+                prev = None
                 continue
+            yield char_map.get(prev, prev)
+        prev = token
+    if prev is not None:
+        yield char_map.get(prev, prev)
 
-        target_string += b2u_maps.get(t, t)
-    return target_string
+
+class BijoyConverter:
+    """
+    A reusable Bijoy to Unicode converter. The character map is compiled only once, when the
+    converter is created, and the rearrangement of prekar, ref and chondrobindu is done
+    together with the mapping in a single pass over the tokens.
+    """
+
+    def __init__(self, char_map: Dict = None) -> None:
+        self.char_map = b2u_maps if char_map is None else char_map
+        self.pattern = _compile_char_map(self.char_map)
+        self.max_key_len = max(len(a_key) for a_key in self.char_map)
+
+    def tokenize(self, src_string: str) -> Iterator[str]:
+        """
+        Splits a bijoy string into the keys of the character map and the runs in between
+        """
+        return (a_split for a_split in self.pattern.split(src_string) if a_split)
+
+    def tokenize_stream(self, chunks: Iterable[str], max_run_len: int = 65536) -> Iterator[str]:
+        """
+        Splits a stream of bijoy text chunks the same way tokenize splits the whole text. The tail of
+        every chunk that could still be part of a longer key (or of an unfinished run between keys)
+        is carried over to the next chunk.
+        :param chunks: An iterable of bijoy strings
+        :param max_run_len: Runs of unmapped characters longer than this are yielded in pieces, except
+            right after a prekar, which is shifted over the whole run. A ref right after such a run is
+            shifted over its last piece only, unlike in tokenize.
+        :return: Iterator over the tokens
+        """
+        carry = ""
+        last = None
+        for a_chunk in chunks:
+            text = carry + a_chunk
+            # a match can only be decided if the longest key fits before the end of the text
+            undecided = len(text) - self.max_key_len + 1
+            pos = 0
+            for a_match in self.pattern.finditer(text):
+                if a_match.start() >= undecided:
+                    break
+                if a_match.start() > pos:
+                    yield text[pos:a_match.start()]
+                last = a_match.group(0)
+                yield last
+                pos = a_match.end()
+            if undecided - pos > max_run_len and last not in _b2u_prekar_set:
+                last = text[pos:undecided]
+                yield last
+                pos = undecided
+            carry = text[pos:]
+        yield from self.tokenize(carry)
+
+    def convert_tokens(self, tokens: Iterable[str]) -> Iterator[str]:
+        """
+        Rearranges and maps a stream of bijoy tokens to unicode strings
+        """
+        tokens = _b2u_shift_chondrobindus(_b2u_shift_refs(_b2u_shift_prekars(tokens)))
+        return _b2u_emit(tokens, self.char_map)
+
+    def convert(self, src_string: str) -> str:
+        """
+        Convert Ansi Bijoy encoded Bengali string to Unicode
+        :param src_string: Source string in bijoy
+        :return: src_string formatted in unicode
+        """
+        if not src_string:
+            return src_string
+        return "".join(self.convert_tokens(self.tokenize(src_string)))
+
+    def convert_many(self, src_strings: Iterable[str]) -> Iterator[str]:
+        """
+        Lazily converts a sequence of bijoy strings to unicode
+        """
+        for a_string in src_strings:
+            yield self.convert(a_string)
+
+    def convert_stream(self, chunks: Iterable[str], buffer_size: int = 4096) -> Iterator[str]:
+        """
+        Converts a stream of bijoy text chunks to unicode. Only a few tokens are kept in memory
+        at a time, so the memory use does not grow with the size of the input.
+        :param chunks: An iterable of bijoy strings. The chunks can be cut anywhere.
+        :param buffer_size: Number of converted tokens to join together before yielding
+        :return: Iterator over unicode strings
+        """
+        buffer = []
+        for a_string in self.convert_tokens(self.tokenize_stream(chunks)):
+            buffer.append(a_string)
+            if len(buffer) >= buffer_size:
+                yield "".join(buffer)
+                buffer = []
+        if buffer:
+            yield "".join(buffer)
+
+
+_bijoy_converter = BijoyConverter()
+
+
+def bijoy2unicode(src_string: str) -> str:
+    """
+    Convert Ansi Bijoy encoded Bengali string to Unicode
+    :param src_string: Source string in bijoy
+    :return: src_string formatted in unicode
+    """
+    return _bijoy_converter.convert(src_string)
+
+
+def bijoy2unicode_stream(f_in: TextIO, chunk_size: int = 65536) -> Iterator[str]:
+    """
+    Converts an Ansi Bijoy encoded text file to Unicode, chunk by chunk
+    :param f_in: A file stream opened in text mode
+    :param chunk_size: Number of characters to read at a time
+    :return: Iterator over the converted unicode strings
+    """
+    chunks = iter(lambda: f_in.read(chunk_size), "")
+    return _bijoy_converter.convert_stream(chunks)
+
+
+_bengali_consonant = "[ক-নপ-রলশ-হড়ঢ়য়]়?"
+_bengali_conjunct = "{0}(?:[‌‍]?্[‌‍]?{0})*(?:্[‌‍]?)?".format(_bengali_consonant)
+
+# A bengali cluster is either
+# 1. (ref) + banjonborno (> Hasant > banjonborno ...) + (prekar or midkar) + (postkar) + (chandrabindu etc.)
+# 2. shorborno + (chandrabindu etc.)
+_bengali_cluster_pattern = re.compile(
+    "(?P<ref>(?<!্)র্(?=[ক-হড়-য়]))?(?P<base>" + _bengali_conjunct + ")"
+    "(?:(?P<prekar>[িেৈ])|(?P<midkar>[োৌ]))?(?P<postkar>[াী-ৄৗ])?"
+    "(?P<signs>[ঁ-ঃ]*)"
+    "|[অ-ঔ][ঁ-ঃ]*"
+)
+
+
+def bengali_clusters(src_string: str) -> Iterator[Tuple[int, int]]:
+    """
+    Splits a unicode string into bengali syllable clusters (juktoborno together with its ref and kars)
+    in a single pass
+    :param src_string: Source string in unicode
+    :return: Iterator over the (start, end) offsets of the clusters. Characters that are not part of a
+    bengali cluster (e.g. spaces, digits, punctuations) are not covered by any span.
+    """
+    for a_match in _bengali_cluster_pattern.finditer(src_string):
+        yield a_match.span()
+
+
+def _u2b_reorder_cluster(a_match: Match) -> str:
+    """
+    Re-arranges a unicode cluster in the order bijoy expects
+    1. banjonborno + prekar -> prekar + banjonborno
+    2. banjonborno + okar -> ekar + banjonborno + akar
+    3. banjonborno + oukar -> ekar + banjonborno + "ৗ"
+    4. ref + banjonborno + postkar -> banjonborno + postkar + ref
+    5. banjonborno + postkar + chandrabindu -> banjonborno + chandrabindu + postkar
+    """
+    if not a_match.group("base"):
+        return a_match.group(0)
+    ref, base, prekar, midkar, postkar, signs = a_match.group("ref", "base", "prekar", "midkar", "postkar", "signs")
+    if midkar:
+        prekar = "ে"
+        postkar = ("া" if midkar == "ো" else "ৗ") + (postkar or "")
+    elif not (ref or prekar or (postkar and "ঁ" in signs)):
+        return a_match.group(0)
+    if postkar and "ঁ" in signs:
+        base += "ঁ"
+        signs = signs.replace("ঁ", "", 1)
+    return (prekar or "") + base + (postkar or "") + (ref or "") + signs
+
+
+class UnicodeConverter:
+    """
+    A reusable Unicode to Bijoy converter. The clusters are re-arranged in a single pass and the
+    character map, compiled only once when the converter is created, is applied once over the
+    re-arranged string.
+    """
+
+    def __init__(self, char_map: Dict = None) -> None:
+        self.char_map = u2b_maps if char_map is None else char_map
+        self.pattern = _compile_char_map(self.char_map)
+
+    def convert(self, src_string: str) -> str:
+        """
+        Converts a string from unicode format to ANSI Bijoy format
+        :param src_string: Source string in unicode
+        :return: src_string formatted in Bijoy
+        """
+        if not src_string:
+            return src_string
+        reordered = _bengali_cluster_pattern.sub(_u2b_reorder_cluster, src_string)
+        char_map = self.char_map
+        return "".join([char_map.get(a_split, a_split) for a_split in self.pattern.split(reordered)])
+
+    def convert_many(self, src_strings: Iterable[str]) -> Iterator[str]:
+        """
+        Lazily converts a sequence of unicode strings to bijoy
+        """
+        for a_string in src_strings:
+            yield self.convert(a_string)
+
+
+_unicode_converter = UnicodeConverter()
 
 
 def unicode2bijoy(src_string: str) -> str:
@@ -384,54 +461,293 @@ def unicode2bijoy(src_string: str) -> str:
     :param src_string: Source string in unicode
     :return: src_string formatted in Bijoy
     """
-    if not src_string:
-        # If there is nothing in input return the same
-        return src_string
-
-    target_string = ""
-    groups = _make_groups(src_string)
+    return _unicode_converter.convert(src_string)
 
-    for group in groups:
-        temp_string = ""
-        for char in group:
-            # append the characters in a string
-            temp_string += char[1]
-        target_string += apply_char_map(temp_string, u2b_maps)
-    return target_string
 
-
-def file_hash(f_in: BinaryIO, buffer_size = 65536) -> str:
+def file_hash(f_in: BinaryIO, buffer_size = 65536, algorithm: str = "md5") -> str:
     """
-    Given a file stream opened in binary mode, constructs a MD5 hash for the file
+    Given a file stream opened in binary mode, constructs a hash (MD5 by default) for the file
+    :param algorithm: Any algorithm of hashlib, e.g. md5, sha256 or blake2b
     """
-    md5 = hashlib.md5()
+    hasher = hashlib.new(algorithm)
     while True:
         data = f_in.read(buffer_size)
         if not data:
             break
-        md5.update(data)
-    return md5.hexdigest()
+        hasher.update(data)
+    return hasher.hexdigest()
+
+
+# ioctl request number of FICLONE (linux), which makes a copy-on-write clone of a file
+_FICLONE = 0x40049409
+
+
+def _place_file(src: str, dest: str, placement: str) -> str:
+    """
+    Places src at dest by a reflink, a hardlink or a copy. "auto" tries them in this order, as a reflink
+    or a hardlink is only possible on the same filesystem. The file is placed at dest + ".part" and
+    renamed, so an interrupted run never leaves a truncated dest.
+    :return: The placement that was done
+    :raises OSError: If a reflink was asked for and the filesystem (or the platform) can not make it
+    """
+    part = dest + ".part"
+    if os.path.exists(part):
+        os.remove(part)
+    if placement in ("reflink", "auto"):
+        try:
+            import fcntl
+            with open(src, "rb") as f_src, open(part, "wb") as f_dest:
+                fcntl.ioctl(f_dest.fileno(), _FICLONE, f_src.fileno())
+            os.replace(part, dest)
+            return "reflink"
+        except (ImportError, OSError) as e:
+            if os.path.exists(part):
+                os.remove(part)
+            if placement == "reflink":
+                raise OSError("Can not reflink {0} to {1}: {2}".format(src, dest, e))
+    if placement in ("hardlink", "auto"):
+        try:
+            os.link(src, part)
+            os.replace(part, dest)
+            return "hardlink"
+        except OSError:
+            if placement == "hardlink":
+                raise
+    shutil.copyfile(src, part)
+    os.replace(part, dest)
+    return "copy"
+
+
+def _read_manifest(manifest_file: str) -> Dict:
+    """
+    Reads a manifest written by hasify_folder_contents as a dict of path -> record
+    """
+    manifest = {}
+    if manifest_file and os.path.exists(manifest_file):
+        with open(manifest_file, encoding="utf-8") as f_in:
+            for a_line in f_in:
+                if a_line.strip():
+                    a_record = json.loads(a_line)
+                    manifest[a_record['path']] = a_record
+    return manifest
+
+
+def _write_manifest(manifest_file: str, records: List[Dict]) -> None:
+    """
+    Writes the manifest as newline delimited json, replacing the old one only when it is complete
+    """
+    with open(manifest_file + ".part", "w", encoding="utf-8") as f_out:
+        for a_record in records:
+            f_out.write(json.dumps(a_record, ensure_ascii=False) + "\n")
+    os.replace(manifest_file + ".part", manifest_file)
 
 
-def hasify_folder_contents(src_folder):
+def _hash_file(a_file: str, algorithm: str) -> str:
+    with open(a_file, "rb") as f_in:
+        return file_hash(f_in, buffer_size=1 << 20, algorithm=algorithm)
+
+
+def hasify_folder_contents(src_folder: str, algorithm: str = "md5", manifest_file: str = None,
+                           placement: str = "copy", workers: int = None) -> Dict:
     """
-    Renames all the contents of src_folder by their md5 hash and places them in
-    another folder (the name of this folder is augmented by the term "md5") in the same
-    level as the src_folder.
+    Renames all the contents of src_folder by their hash and places them in
+    another folder (the name of this folder is augmented by the name of the hash algorithm, e.g. "md5")
+    in the same level as the src_folder.
+    The files are hashed in a pool of threads. When a manifest file is given, the (path, size, mtime)
+    -> digest records of the previous run are reused, so the unchanged files are not read again.
+    Files that are already in the destination folder are never placed again.
+    :param src_folder: Folder of the contents
+    :param algorithm: Any algorithm of hashlib, e.g. md5, sha256 or blake2b
+    :param manifest_file: Path of the persistent manifest (newline delimited json)
+    :param placement: copy, hardlink, reflink or auto (reflink, else hardlink, else copy)
+    :param workers: Number of hashing threads
+    :return: A summary with the number of files and bytes hashed and skipped
     """
+    if placement not in ("copy", "hardlink", "reflink", "auto"):
+        raise ValueError("placement must be one of copy, hardlink, reflink or auto")
+    start_time = time.time()
+    manifest = _read_manifest(manifest_file)
+    jobs = []
     for path, _, files in os.walk(src_folder):
-        for file in files:
+        for file in sorted(files):
             a_file = os.path.join(path, file)
+            a_stat = os.stat(a_file)
+            a_record = {'path': os.path.relpath(a_file, src_folder), 'size': a_stat.st_size,
+                        'mtime': a_stat.st_mtime_ns, 'algorithm': algorithm}
+            old_record = manifest.get(a_record['path'])
+            if old_record and all(old_record.get(a_key) == a_record[a_key] for a_key in a_record):
+                a_record['digest'] = old_record['digest']
+            jobs.append((a_file, a_record))
+
+    summary = {'files': len(jobs), 'hashed': 0, 'skipped': 0, 'bytes_hashed': 0, 'bytes_skipped': 0,
+               'existing': 0, 'copy': 0, 'hardlink': 0, 'reflink': 0}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        digests = executor.map(lambda a_job: a_job[1].get('digest') or _hash_file(a_job[0], algorithm), jobs)
+        for (a_file, a_record), a_digest in zip(jobs, digests):
+            if 'digest' in a_record:
+                summary['skipped'] += 1
+                summary['bytes_skipped'] += a_record['size']
+            else:
+                a_record['digest'] = a_digest
+                summary['hashed'] += 1
+                summary['bytes_hashed'] += a_record['size']
             file_path, file_name = os.path.split(os.path.abspath(a_file))
             parent_path, content_folder = os.path.split(file_path)
             file_name, file_ext = os.path.splitext(file_name)
-            with open(a_file, "rb") as f_in:
-                file_md5 = file_hash(f_in)
-            dest_folder = os.path.join(parent_path, "{0}_md5".format(content_folder))
+            dest_folder = os.path.join(parent_path, "{0}_{1}".format(content_folder, algorithm))
             if not os.path.exists(dest_folder):
                 os.makedirs(dest_folder)
-            dest = os.path.join(dest_folder, "{0}{1}".format(file_md5, file_ext))
-            shutil.copyfile(a_file, dest)
+            dest = os.path.join(dest_folder, "{0}{1}".format(a_digest, file_ext))
+            # a dest of another size was not written by this function (the placement is atomic)
+            if os.path.exists(dest) and os.path.getsize(dest) == a_record['size']:
+                summary['existing'] += 1
+            else:
+                summary[_place_file(a_file, dest, placement)] += 1
+    if manifest_file:
+        _write_manifest(manifest_file, [a_record for _, a_record in jobs])
+    summary['seconds'] = time.time() - start_time
+    return summary
+
+
+def _list_files(src: str) -> List[Tuple[str, str]]:
+    """
+    Lists the files of a directory (recursively) or the files matching a glob pattern in a deterministic
+    order. Returns the (path, path relative to the directory or to the common folder of the matches) pairs.
+    """
+    if os.path.isdir(src):
+        all_files = [os.path.join(path, file) for path, _, files in os.walk(src) for file in files]
+        base_folder = src
+    else:
+        all_files = [a_file for a_file in glob.glob(src, recursive=True) if os.path.isfile(a_file)]
+        base_folder = os.path.commonpath([os.path.dirname(os.path.abspath(a_file)) for a_file in all_files]) \
+            if all_files else ""
+    return sorted((a_file, os.path.relpath(os.path.abspath(a_file), os.path.abspath(base_folder)))
+                  for a_file in all_files)
+
+
+def _convert_file(job: Dict) -> Dict:
+    """
+    Converts a single file as described by job. Runs in the worker processes of convert_folder_contents.
+    """
+    result = {'file': job['rel_path'], 'chars': 0, 'seconds': 0.0, 'error': None}
+    start_time = time.time()
+    to_unicode = job['target'] == "unicode"
+    in_encoding, out_encoding = (job['encoding'], "utf-8") if to_unicode else ("utf-8", job['encoding'])
+    try:
+        with open(job['src'], encoding=in_encoding) as f_in:
+            if to_unicode:
+                converted = bijoy2unicode_stream(f_in)
+            else:
+                converted = [unicode2bijoy(f_in.read())]
+            if job['dest']:
+                # write to a temporary file first, so an interrupted run never leaves a complete looking output
+                os.makedirs(os.path.dirname(job['dest']) or ".", exist_ok=True)
+                with open(job['dest'] + ".part", "w", encoding=out_encoding) as f_out:
+                    for a_string in converted:
+                        f_out.write(a_string)
+                        result['chars'] += len(a_string)
+                os.replace(job['dest'] + ".part", job['dest'])
+            else:
+                result['text'] = "".join(converted)
+                result['chars'] = len(result['text'])
+    except Exception as e:
+        result['error'] = "{0}: {1}".format(type(e).__name__, e)
+    result['seconds'] = time.time() - start_time
+    return result
+
+
+def _resume_ndjson(ndjson_file: str) -> Set[str]:
+    """
+    Reads the files already converted into an ndjson file. A partial last line (of a killed run) is truncated,
+    so that the next records are appended after the last complete one.
+    """
+    done = set()
+    end = 0
+    with open(ndjson_file, "r+b") as f_in:
+        for a_line in f_in:
+            try:
+                if not a_line.endswith(b"\n"):
+                    raise ValueError("partial line")
+                if a_line.strip():
+                    done.add(json.loads(a_line)['file'])
+            except (ValueError, KeyError):
+                f_in.truncate(end)
+                break
+            end += len(a_line)
+    return done
+
+
+def convert_folder_contents(src: str, target: str = "unicode", output_folder: str = None,
+                            ndjson_file: str = None, workers: int = None, encoding: str = "cp1252") -> Dict:
+    """
+    Converts all the files of a directory (or the files matching a glob pattern) between bijoy and unicode
+    in a pool of worker processes. The output is either a mirrored directory tree in output_folder or a
+    newline-delimited json stream of {"file", "text"} records in ndjson_file (- for stdout), in the sorted
+    order of the input files. Outputs that are already up to date (or already in the ndjson file) are
+    skipped, so an interrupted run can be resumed. Progress and failures are reported to stderr.
+    :param src: A directory or a glob pattern
+    :param target: "unicode" to convert bijoy files to unicode, "bijoy" for the reverse
+    :param output_folder: Root of the mirrored output tree
+    :param ndjson_file: Path of the newline-delimited json output
+    :param workers: Number of worker processes. Defaults to the number of cpus
+    :param encoding: Encoding of the bijoy files
+    :return: A summary of the run
+    """
+    if target not in ("unicode", "bijoy"):
+        raise ValueError("target must be either unicode or bijoy")
+    if bool(output_folder) == bool(ndjson_file):
+        raise ValueError("Please provide exactly one of output_folder and ndjson_file")
+
+    if workers is not None and workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    done = set()
+    if ndjson_file and ndjson_file != "-" and os.path.exists(ndjson_file):
+        done = _resume_ndjson(ndjson_file)
+
+    jobs = []
+    skipped = 0
+    for a_file, rel_path in _list_files(src):
+        dest = os.path.join(output_folder, rel_path) if output_folder else None
+        if rel_path in done or (dest and os.path.exists(dest) and
+                                os.path.getmtime(dest) >= os.path.getmtime(a_file)):
+            skipped += 1
+            continue
+        jobs.append({'src': a_file, 'rel_path': rel_path, 'dest': dest, 'target': target, 'encoding': encoding})
+
+    summary = {'files': len(jobs) + skipped, 'converted': 0, 'skipped': skipped, 'failed': [], 'chars': 0}
+    start_time = time.time()
+    if ndjson_file == "-":
+        f_out = open(sys.stdout.fileno(), "w", encoding="utf-8", closefd=False)
+    elif ndjson_file:
+        f_out = open(ndjson_file, "a", encoding="utf-8")
+    else:
+        f_out = None
+    pool = Pool(workers) if workers != 1 else None
+    try:
+        results = pool.imap(_convert_file, jobs) if pool else map(_convert_file, jobs)
+        for i, result in enumerate(results):
+            if result['error']:
+                summary['failed'].append({'file': result['file'], 'error': result['error']})
+                sys.stderr.write("[{0}/{1}] FAILED {2}: {3}\n".format(i + 1, len(jobs), result['file'],
+                                                                     result['error']))
+                continue
+            if f_out:
+                f_out.write(json.dumps({'file': result['file'], 'text': result['text']}, ensure_ascii=False) + "\n")
+                f_out.flush()
+            summary['converted'] += 1
+            summary['chars'] += result['chars']
+            sys.stderr.write("[{0}/{1}] {2} ({3} chars, {4:.3f}s)\n".format(i + 1, len(jobs), result['file'],
+                                                                          result['chars'], result['seconds']))
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        if f_out:
+            f_out.close()
+    summary['seconds'] = time.time() - start_time
+    summary['chars_per_second'] = summary['chars'] / summary['seconds'] if summary['seconds'] else 0.0
+    return summary
 
 
 def main():
@@ -443,10 +759,58 @@ def main():
                         another folder (the name of this folder is augmented by the term "md5") in the same
                         level as the src_folder. Please provide <src_folder> as argument.
                         """)
+    parser.add_argument("--hash_algorithm", action="store", default="md5", choices=["md5", "sha256", "blake2b"],
+                        help="Hash algorithm of --rename_md5 (default: md5)")
+    parser.add_argument("--manifest", action="store", default=None, type=str,
+                        help="Manifest file of --rename_md5, so that an unchanged file is not hashed again")
+    parser.add_argument("--placement", action="store", default="copy",
+                        choices=["copy", "hardlink", "reflink", "auto"],
+                        help="How --rename_md5 places the files in the destination folder (default: copy)")
+    parser.add_argument("--bijoy2unicode", action="store", default=None, type=str,
+                        dest="bijoy2unicode_src_file", help=
+                        """
+                        Converts an Ansi Bijoy encoded text file to Unicode and writes it to stdout.
+                        The file is converted in chunks, so it can be arbitrarily large.
+                        Please provide the path of the file (or - for stdin) as argument.
+                        """)
+    parser.add_argument("--convert", action="store", default=None, type=str,
+                        dest="convert_src", help=
+                        """
+                        Converts all the files of a directory, or the files matching a glob pattern, in
+                        parallel. Please provide the directory or the (quoted) glob pattern as argument
+                        together with either --output_dir or --ndjson.
+                        """)
+    parser.add_argument("--to", action="store", default="unicode", choices=["unicode", "bijoy"],
+                        help="Target encoding of --convert (default: unicode)")
+    parser.add_argument("--output_dir", action="store", default=None, type=str,
+                        help="Writes the converted files of --convert in a mirrored directory tree")
+    parser.add_argument("--ndjson", action="store", default=None, type=str,
+                        help="Writes the converted files of --convert as newline-delimited json (- for stdout)")
+    parser.add_argument("--workers", action="store", default=None, type=int,
+                        help="Number of worker processes of --convert or of hashing threads of --rename_md5")
+    parser.add_argument("--encoding", action="store", default="cp1252", type=str,
+                        help="Encoding of the Bijoy files (default: cp1252)")
     args = parser.parse_args()
 
     if args.rename_md5_src_folder:
-        hasify_folder_contents(args.rename_md5_src_folder)
+        summary = hasify_folder_contents(args.rename_md5_src_folder, algorithm=args.hash_algorithm,
+                                         manifest_file=args.manifest, placement=args.placement,
+                                         workers=args.workers)
+        sys.stderr.write(json.dumps(summary) + "\n")
+
+    if args.bijoy2unicode_src_file:
+        if args.bijoy2unicode_src_file == "-":
+            f_in = open(sys.stdin.fileno(), encoding=args.encoding, closefd=False)
+        else:
+            f_in = open(args.bijoy2unicode_src_file, encoding=args.encoding)
+        with f_in:
+            for a_string in bijoy2unicode_stream(f_in):
+                sys.stdout.buffer.write(a_string.encode("utf8"))
+
+    if args.convert_src:
+        summary = convert_folder_contents(args.convert_src, target=args.to, output_folder=args.output_dir,
+                                          ndjson_file=args.ndjson, workers=args.workers, encoding=args.encoding)
+        sys.stderr.write(json.dumps(summary, ensure_ascii=False) + "\n")
 
 
 if __name__ == "__main__":
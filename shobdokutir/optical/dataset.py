@@ -0,0 +1,283 @@
+import argparse
+import io
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import tarfile
+import time
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from shobdokutir.encoding.fonts import unicode_font_families
+from shobdokutir.optical.generators import RENDERERS
+from shobdokutir.optical.pool import OpticalTextBuilderPool
+from shobdokutir.search.index import read_ndjson
+
+
+def _read_lines(a_path: str) -> Iterator[str]:
+    with open(a_path, encoding="utf-8") as f_in:
+        yield from f_in
+
+
+def text_lines(paths: Iterable[str], max_words: int = None) -> Iterator[str]:
+    """
+    Streams the lines of text of the ndjson files of --get_epub_text (the text_split of the records, .ndjson or
+    .ndjson.gz) and of plain text files, with the white spaces collapsed as in the rendered images
+    :param max_words: Longer lines are split into pieces of up to max_words words
+    """
+    for a_path in paths:
+        if re.search(r"\.ndjson(\.gz)?$", a_path):
+            lines = (a_line for a_record in read_ndjson([a_path])
+                     for a_line in a_record.get('text_split') or a_record.get('text', "").split("\n"))
+        else:
+            lines = _read_lines(a_path)
+        for a_line in lines:
+            line_words = a_line.split()
+            step = max_words or len(line_words) or 1
+            for start in range(0, len(line_words), step):
+                yield " ".join(line_words[start:start + step])
+
+
+def sample_specs(lines: Iterable[str], fonts: Sequence[str], sizes: Sequence[int], seed: int = 0,
+                 variants: int = 1, batch_size: int = 16, augment: bool = True, start: int = 0) -> Iterator[Dict]:
+    """
+    Samples the font, the size and the augmentation of every image. An image depends only on the seed and its index,
+    so that a run can be resumed at any index. The font and the size are sampled once per batch of batch_size images,
+    which the browser backend renders on one page.
+    :param variants: Number of images of every line
+    :param start: Index of the first image, the images before it are skipped without sampling
+    :return: Iterator over the {index, text, font_name, font_size, augmentation} of the images
+    """
+    index = 0
+    for a_line in lines:
+        for _ in range(variants):
+            if index >= start:
+                batch_rng = random.Random(seed * 2 ** 32 + index // batch_size)
+                font_name, font_size = batch_rng.choice(fonts), batch_rng.choice(sizes)
+                rng = random.Random(seed * 2 ** 32 + 2 ** 31 + index)
+                augmentation = {}
+                if augment:
+                    augmentation = {'padding': rng.randint(2, 16), 'rotation': round(rng.gauss(0, 1), 2),
+                                    'blur': round(rng.choice([0, 0, rng.uniform(0.3, 1.2)]), 2),
+                                    'noise': round(rng.choice([0, rng.uniform(2, 12)]), 1),
+                                    'noise_seed': rng.getrandbits(31)}
+                yield {'index': index, 'text': a_line, 'font_name': font_name, 'font_size': font_size,
+                       'augmentation': augmentation}
+            index += 1
+
+
+def augment_image(img: Image, augmentation: Dict) -> Image:
+    """
+    Applies the augmentation of sample_specs to an image of a text: a white margin, a rotation (degrees), a gaussian
+    blur (radius) and a gaussian noise (standard deviation)
+    """
+    img = img.convert("L")
+    if augmentation.get('padding'):
+        padded = Image.new("L", (img.size[0] + 2 * augmentation['padding'], img.size[1] + 2 * augmentation['padding']),
+                           255)
+        padded.paste(img, (augmentation['padding'], augmentation['padding']))
+        img = padded
+    if augmentation.get('rotation'):
+        img = img.rotate(augmentation['rotation'], resample=Image.BILINEAR, expand=True, fillcolor=255)
+    if augmentation.get('blur'):
+        img = img.filter(ImageFilter.GaussianBlur(augmentation['blur']))
+    if augmentation.get('noise'):
+        rng = np.random.RandomState(augmentation['noise_seed'])
+        pixels = np.asarray(img, dtype=np.float32) + rng.normal(0, augmentation['noise'], (img.size[1], img.size[0]))
+        img = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return img
+
+
+class DatasetRenderer:
+    """
+    A renderer of OpticalTextBuilderPool that renders the samples of sample_specs, augments them and encodes them
+    as png, all in the worker process
+    """
+
+    def __init__(self, renderer: str = "pillow", **renderer_kwargs) -> None:
+        """
+        :param renderer: Name of a backend of RENDERERS, the browsers are headless on a free port
+        """
+        if renderer == "browser":
+            renderer_kwargs = dict({'server_port': None, 'headless': True}, **renderer_kwargs)
+        self.renderer = RENDERERS[renderer](**renderer_kwargs)
+
+    def clear_all(self) -> None:
+        self.renderer.clear_all()
+
+    def get_text_images(self, samples: Sequence[Dict], font_size: int = None, font_name: str = None) -> List[bytes]:
+        """
+        :return: The png of every sample, None for the texts without a visible glyph
+        """
+        images = self.renderer.get_text_images([a_sample['text'] for a_sample in samples], font_size, font_name)
+        pngs = []
+        for a_sample, img in zip(samples, images):
+            if img is None:
+                pngs.append(None)
+                continue
+            data = io.BytesIO()
+            augment_image(img, a_sample['augmentation']).save(data, format="PNG", compress_level=1)
+            pngs.append(data.getvalue())
+        return pngs
+
+
+class ShardWriter:
+    """
+    Writes the samples into tar shards in the webdataset layout: the files of a sample share the key (the index of the
+    image) and differ by the extension (.png, .txt, .json). A shard holds the images of shard_size consecutive indices
+    and is renamed from .tmp to .tar once complete, so a run can resume after its last complete shard.
+    """
+
+    def __init__(self, output_folder: str, shard_size: int = 10000, prefix: str = "ocr") -> None:
+        self.output_folder = output_folder
+        self.shard_size = shard_size
+        self.prefix = prefix
+        self.shard = None
+        self.tar = None
+        os.makedirs(output_folder, exist_ok=True)
+
+    def shard_path(self, shard: int) -> str:
+        return os.path.join(self.output_folder, "{0}-{1:06d}.tar".format(self.prefix, shard))
+
+    def complete_shards(self) -> int:
+        """
+        :return: Number of complete shards from the first one
+        """
+        shard = 0
+        while os.path.exists(self.shard_path(shard)):
+            shard += 1
+        return shard
+
+    def write(self, index: int, files: Dict[str, bytes]) -> bool:
+        """
+        Writes the files of a sample
+        :param files: The contents of every extension
+        :return: True if the sample completed a shard
+        """
+        completed = False
+        if self.shard != index // self.shard_size:
+            completed = self.close()
+            self.shard = index // self.shard_size
+            self.tar = tarfile.open(self.shard_path(self.shard) + ".tmp", "w")
+        for extension, contents in files.items():
+            info = tarfile.TarInfo("{0:09d}.{1}".format(index, extension))
+            info.size = len(contents)
+            self.tar.addfile(info, io.BytesIO(contents))
+        return completed
+
+    def close(self) -> bool:
+        """
+        Completes the current shard
+        :return: True if a shard was completed
+        """
+        if self.tar is None:
+            return False
+        self.tar.close()
+        os.replace(self.shard_path(self.shard) + ".tmp", self.shard_path(self.shard))
+        self.tar = None
+        return True
+
+
+def generate_dataset(paths: Sequence[str], output_folder: str, fonts: Sequence[str] = None,
+                     sizes: Sequence[int] = (24, 32, 48), variants: int = 1, seed: int = 0, augment: bool = True,
+                     max_words: int = 8, max_samples: int = None, shard_size: int = 10000, start_shard: int = None,
+                     workers: int = None, backend: str = "pillow", batch_size: int = 16, prefix: str = "ocr",
+                     **renderer_kwargs) -> Dict:
+    """
+    Generates an ocr dataset: streams the lines of the text files, samples the fonts, sizes and augmentations,
+    renders the images in parallel (OpticalTextBuilderPool) and writes them into tar shards with their labels
+    :param fonts: Font families to sample (default: the fonts of resources/bangla_fonts)
+    :param max_samples: Maximum number of images (the indices from 0 to max_samples - 1)
+    :param start_shard: First shard to generate (default: after the complete shards of the output folder)
+    :return: Summary of the run
+    """
+    fonts = fonts or sorted(unicode_font_families())
+    writer = ShardWriter(output_folder, shard_size, prefix)
+    if start_shard is None:
+        start_shard = writer.complete_shards()
+    start = start_shard * shard_size
+    all_specs = sample_specs(text_lines(paths, max_words), fonts, sizes, seed, variants, batch_size, augment, start)
+    if max_samples is not None:
+        all_specs = itertools.takewhile(lambda a_spec: a_spec['index'] < max_samples, all_specs)
+    # the specs read by the pool wait for their images in the same order
+    specs = deque()
+
+    def requests():
+        for a_spec in all_specs:
+            specs.append(a_spec)
+            yield a_spec, a_spec['font_size'], a_spec['font_name']
+
+    summary = {'start_shard': start_shard, 'images': 0, 'empty': 0, 'shards': 0}
+    start_time = time.time()
+    with OpticalTextBuilderPool(workers, DatasetRenderer, renderer=backend, **renderer_kwargs) as pool:
+        for png in pool.imap(requests(), batch_size):
+            a_spec = specs.popleft()
+            if png is None:
+                summary['empty'] += 1
+                continue
+            label = {key: a_spec[key] for key in ('text', 'font_name', 'font_size', 'augmentation')}
+            if writer.write(a_spec['index'], {'png': png, 'txt': a_spec['text'].encode("utf-8"),
+                                              'json': json.dumps(label, ensure_ascii=False).encode("utf-8")}):
+                summary['shards'] += 1
+                _report(summary, start_time)
+            summary['images'] += 1
+    if writer.close():
+        summary['shards'] += 1
+    return _report(summary, start_time)
+
+
+def _report(summary: Dict, start_time: float) -> Dict:
+    """
+    Writes the throughput so far to stderr
+    """
+    summary['seconds'] = time.time() - start_time
+    summary['images_per_second'] = summary['images'] / summary['seconds'] if summary['seconds'] else 0.0
+    sys.stderr.write(json.dumps(summary) + "\n")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates a synthetic ocr dataset in tar shards")
+    parser.add_argument("src", action="store", type=str, nargs="+",
+                        help="Text files: ndjson of --get_epub_text (.ndjson or .ndjson.gz) or plain text")
+    parser.add_argument("--output", action="store", required=True, type=str,
+                        help="Folder of the shards")
+    parser.add_argument("--fonts", action="store", default=None, type=str, nargs="+",
+                        help="Font families (default: the fonts of resources/bangla_fonts)")
+    parser.add_argument("--sizes", action="store", default=[24, 32, 48], type=int, nargs="+",
+                        help="Font sizes in pixels (default: 24 32 48)")
+    parser.add_argument("--variants", action="store", default=1, type=int,
+                        help="Number of images of every line (default: 1)")
+    parser.add_argument("--seed", action="store", default=0, type=int,
+                        help="Seed of the sampling (default: 0)")
+    parser.add_argument("--no_augment", action="store_true",
+                        help="Does not augment the images")
+    parser.add_argument("--max_words", action="store", default=8, type=int,
+                        help="Maximum number of words per image (default: 8)")
+    parser.add_argument("--max_samples", action="store", default=None, type=int,
+                        help="Maximum number of images")
+    parser.add_argument("--shard_size", action="store", default=10000, type=int,
+                        help="Number of images per shard (default: 10000)")
+    parser.add_argument("--start_shard", action="store", default=None, type=int,
+                        help="First shard to generate (default: resumes after the complete shards)")
+    parser.add_argument("--workers", action="store", default=None, type=int,
+                        help="Number of rendering workers (default: number of cpus)")
+    parser.add_argument("--backend", action="store", default="pillow", choices=sorted(RENDERERS),
+                        help="Rendering backend (default: pillow)")
+    parser.add_argument("--batch_size", action="store", default=16, type=int,
+                        help="Number of images of the same font and size rendered together (default: 16)")
+    args = parser.parse_args()
+
+    generate_dataset(args.src, args.output, args.fonts, args.sizes, args.variants, args.seed, not args.no_augment,
+                     args.max_words, args.max_samples, args.shard_size, args.start_shard, args.workers, args.backend,
+                     args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
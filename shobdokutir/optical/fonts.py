@@ -0,0 +1,283 @@
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import unicodedata
+from bisect import bisect_right
+from typing import Dict, Iterable, List
+
+import numpy as np
+from PIL import ImageFont
+
+# The code points of the bengali block that are assigned
+BENGALI_CODEPOINTS = [a_code for a_code in range(0x0980, 0x0A00) if unicodedata.category(chr(a_code)) != "Cn"]
+# The scripts of the opentype substitutions (the conjuncts, the reph, the kars) of bengali
+BENGALI_SCRIPTS = ("beng", "bng2")
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc", ".otc")
+DEFAULT_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "shobdokutir", "fonts.json")
+# Version of the format of the cache file
+_cache_version = 1
+
+
+def system_font_folders() -> List[str]:
+    """
+    The font folders of the system (linux, macos and windows) and of the user
+    """
+    home = os.path.expanduser("~")
+    folders = ["/usr/share/fonts", "/usr/local/share/fonts", os.path.join(home, ".fonts"),
+               os.path.join(home, ".local", "share", "fonts"), "/System/Library/Fonts", "/Library/Fonts",
+               os.path.join(home, "Library", "Fonts"), os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts")]
+    return [a_folder for a_folder in folders if os.path.isdir(a_folder)]
+
+
+def _sfnt_offsets(data: bytes) -> List[int]:
+    """
+    The offsets of the fonts of a file, many for a collection (.ttc)
+    """
+    if data[:4] == b"ttcf":
+        n_fonts, = struct.unpack_from(">I", data, 8)
+        return list(struct.unpack_from(">{0}I".format(n_fonts), data, 12))
+    return [0]
+
+
+def _sfnt_tables(data: bytes, offset: int) -> Dict[str, int]:
+    """
+    The offsets of the tables of a font
+    """
+    n_tables, = struct.unpack_from(">H", data, offset + 4)
+    tables = {}
+    for i in range(n_tables):
+        tag, _, table_offset, _ = struct.unpack_from(">4sIII", data, offset + 12 + 16 * i)
+        tables[tag.decode("latin-1")] = table_offset
+    return tables
+
+
+def _ranges(codepoints: np.ndarray) -> List[List[int]]:
+    """
+    Sorted code points as [start, end] ranges
+    """
+    if not len(codepoints):
+        return []
+    codepoints = np.unique(codepoints)
+    breaks = np.flatnonzero(np.diff(codepoints) != 1)
+    starts = np.concatenate([codepoints[:1], codepoints[breaks + 1]])
+    ends = np.concatenate([codepoints[breaks], codepoints[-1:]])
+    return [[int(start), int(end)] for start, end in zip(starts, ends)]
+
+
+def _cmap_format4(data: bytes, offset: int) -> np.ndarray:
+    seg_count = struct.unpack_from(">H", data, offset + 6)[0] // 2
+    ends = np.frombuffer(data, ">u2", seg_count, offset + 14).astype(np.int64)
+    starts = np.frombuffer(data, ">u2", seg_count, offset + 16 + 2 * seg_count).astype(np.int64)
+    deltas = np.frombuffer(data, ">u2", seg_count, offset + 16 + 4 * seg_count).astype(np.int64)
+    range_offsets_position = offset + 16 + 6 * seg_count
+    range_offsets = np.frombuffer(data, ">u2", seg_count, range_offsets_position).astype(np.int64)
+    glyph_words = np.frombuffer(data, ">u2", (len(data) - range_offsets_position) // 2, range_offsets_position)
+    covered = []
+    for i in range(seg_count):
+        if starts[i] > ends[i] or starts[i] == 0xFFFF:
+            continue
+        codes = np.arange(starts[i], ends[i] + 1)
+        if range_offsets[i]:
+            # the glyph ids are in the glyph array, at the word offset from the range offset of the segment
+            positions = i + range_offsets[i] // 2 + codes - starts[i]
+            positions = positions[positions < len(glyph_words)]
+            glyphs = glyph_words[positions].astype(np.int64)
+            codes = codes[:len(glyphs)][glyphs != 0]
+        else:
+            codes = codes[(codes + deltas[i]) & 0xFFFF != 0]
+        covered.append(codes)
+    return np.concatenate(covered) if covered else np.zeros(0, dtype=np.int64)
+
+
+def _cmap_format12(data: bytes, offset: int) -> np.ndarray:
+    n_groups, = struct.unpack_from(">I", data, offset + 12)
+    groups = np.frombuffer(data, ">u4", 3 * n_groups, offset + 16).reshape(-1, 3).astype(np.int64)
+    return np.concatenate([np.arange(start, end + 1) for start, end, _ in groups]) if n_groups \
+        else np.zeros(0, dtype=np.int64)
+
+
+def _cmap_ranges(data: bytes, table_offset: int) -> List[List[int]]:
+    """
+    The code points of a cmap table that map to a glyph, from its unicode subtable (format 4 or 12)
+    """
+    n_subtables, = struct.unpack_from(">H", data, table_offset + 2)
+    subtables = {}
+    for i in range(n_subtables):
+        platform, encoding, offset = struct.unpack_from(">HHI", data, table_offset + 4 + 8 * i)
+        subtable_format, = struct.unpack_from(">H", data, table_offset + offset)
+        subtables.setdefault((platform, encoding, subtable_format), table_offset + offset)
+    for key in [(3, 10, 12), (0, 6, 12), (0, 4, 12), (3, 1, 4), (0, 3, 4), (0, 1, 4), (0, 0, 4)]:
+        if key in subtables:
+            parse = _cmap_format12 if key[2] == 12 else _cmap_format4
+            return _ranges(parse(data, subtables[key]))
+    return []
+
+
+def _gsub_scripts(data: bytes, table_offset: int) -> List[str]:
+    """
+    The script tags of the substitutions (GSUB table) of a font
+    """
+    script_list = table_offset + struct.unpack_from(">H", data, table_offset + 4)[0]
+    n_scripts, = struct.unpack_from(">H", data, script_list)
+    return sorted({data[script_list + 2 + 6 * i:script_list + 6 + 6 * i].decode("latin-1") for i in range(n_scripts)})
+
+
+def scan_font_file(font_path: str) -> List[Dict]:
+    """
+    Reads the faces of a font file (many for a collection)
+    :return: The path, index (in the collection), family, style, covered code points (as [start, end] ranges) and
+    the scripts of the substitutions of every face
+    """
+    with open(font_path, "rb") as f_in:
+        data = f_in.read()
+    faces = []
+    for index, offset in enumerate(_sfnt_offsets(data)):
+        tables = _sfnt_tables(data, offset)
+        family, style = ImageFont.truetype(font_path, 12, index=index).getname()
+        faces.append({'path': font_path, 'index': index, 'family': family, 'style': style,
+                      'ranges': _cmap_ranges(data, tables['cmap']) if 'cmap' in tables else [],
+                      'scripts': _gsub_scripts(data, tables['GSUB']) if 'GSUB' in tables else []})
+    return faces
+
+
+class FontCatalog:
+    """
+    Definition: A catalog of the faces of the fonts in the system and in the given folders, with the code points
+    they cover and whether they shape the bengali conjuncts (opentype substitutions of the bengali script).
+    The catalog is saved in a cache file, from which only the new or modified (by mtime and size) font files are
+    scanned again.
+    """
+
+    def __init__(self, font_folders: Iterable[str] = None, cache_file: str = DEFAULT_CACHE_FILE,
+                 system_fonts: bool = True) -> None:
+        """
+        :param font_folders: Folders of fonts besides the fonts of the system (default: resources/bangla_fonts)
+        :param cache_file: Path of the cache, None for no cache
+        :param system_fonts: Includes the fonts of the system
+        """
+        if font_folders is None:
+            font_folders = [a_folder for a_folder in ["resources/bangla_fonts"] if os.path.isdir(a_folder)]
+        self.font_folders = (system_font_folders() if system_fonts else []) + list(font_folders)
+        self.cache_file = cache_file
+        self.scanned = 0
+        self.refresh()
+
+    def refresh(self) -> None:
+        """
+        Scans the new and modified font files and saves the cache
+        """
+        files = {}
+        if self.cache_file and os.path.exists(self.cache_file):
+            with open(self.cache_file, encoding="utf-8") as f_in:
+                cache = json.load(f_in)
+            if cache.get('version') == _cache_version:
+                files = cache['files']
+        font_files = {}
+        for a_folder in self.font_folders:
+            for root, _, file_names in os.walk(a_folder):
+                for a_file in sorted(file_names):
+                    if os.path.splitext(a_file)[1].lower() in FONT_EXTENSIONS:
+                        a_path = os.path.abspath(os.path.join(root, a_file))
+                        stat = os.stat(a_path)
+                        font_files[a_path] = {'mtime': stat.st_mtime, 'size': stat.st_size}
+        changed = False
+        for a_path, a_stat in font_files.items():
+            if a_path in files and all(files[a_path][key] == a_stat[key] for key in a_stat):
+                continue
+            try:
+                faces = scan_font_file(a_path)
+            except (OSError, struct.error, KeyError, ValueError):
+                # not readable as a font, kept without faces until it is modified
+                faces = []
+            files[a_path] = dict(a_stat, faces=faces)
+            self.scanned += 1
+            changed = True
+        for a_path in set(files) - set(font_files):
+            del files[a_path]
+            changed = True
+        if changed and self.cache_file:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_file)), exist_ok=True)
+            with open(self.cache_file + ".tmp", "w", encoding="utf-8") as f_out:
+                json.dump({'version': _cache_version, 'files': files}, f_out)
+            os.replace(self.cache_file + ".tmp", self.cache_file)
+
+        self.faces = [a_face for a_path in sorted(files) for a_face in files[a_path]['faces']]
+        self._starts = [[start for start, _ in a_face['ranges']] for a_face in self.faces]
+        self._masks = {}
+        self._all_mask = (1 << len(self.faces)) - 1
+        self._shaping_mask = sum(1 << i for i, a_face in enumerate(self.faces)
+                                 if any(a_script in BENGALI_SCRIPTS for a_script in a_face['scripts']))
+        for a_face in self.faces:
+            a_face['bengali'] = self.coverage(a_face, BENGALI_CODEPOINTS)
+            a_face['bengali_shaping'] = any(a_script in BENGALI_SCRIPTS for a_script in a_face['scripts'])
+
+    def coverage(self, face: Dict, codepoints: List[int]) -> float:
+        """
+        The fraction of the code points that a face covers
+        """
+        starts = [start for start, _ in face['ranges']]
+        covered = 0
+        for a_code in codepoints:
+            i = bisect_right(starts, a_code) - 1
+            covered += i >= 0 and a_code <= face['ranges'][i][1]
+        return covered / len(codepoints) if codepoints else 1.0
+
+    def _mask(self, codepoint: int) -> int:
+        """
+        The bit mask of the faces that cover a code point
+        """
+        if codepoint not in self._masks:
+            mask = 0
+            for i, a_face in enumerate(self.faces):
+                j = bisect_right(self._starts[i], codepoint) - 1
+                if j >= 0 and codepoint <= a_face['ranges'][j][1]:
+                    mask |= 1 << i
+            self._masks[codepoint] = mask
+        return self._masks[codepoint]
+
+    def fonts_for(self, text: str, bengali_shaping: bool = False) -> List[Dict]:
+        """
+        The faces that have a glyph for every character of the text, except the white spaces and the format
+        characters (e.g. the zero width joiners, which are consumed by the shaping)
+        :param bengali_shaping: Only the faces that shape the bengali conjuncts
+        """
+        mask = self._shaping_mask if bengali_shaping else self._all_mask
+        for a_char in set(text):
+            if mask and not a_char.isspace() and unicodedata.category(a_char) != "Cf":
+                mask &= self._mask(ord(a_char))
+        return [self.faces[i] for i in range(mask.bit_length()) if mask >> i & 1]
+
+    def bengali_fonts(self, min_coverage: float = 0.9) -> List[Dict]:
+        """
+        The faces that cover most of the bengali block and shape the conjuncts
+        """
+        return [a_face for a_face in self.faces if a_face['bengali'] >= min_coverage and a_face['bengali_shaping']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lists the fonts of the system and of the font folders")
+    parser.add_argument("--font_folders", action="store", default=None, type=str, nargs="+",
+                        help="Folders of fonts besides the fonts of the system (default: resources/bangla_fonts)")
+    parser.add_argument("--cache", action="store", default=DEFAULT_CACHE_FILE, type=str,
+                        help="Cache file (default: {0})".format(DEFAULT_CACHE_FILE))
+    parser.add_argument("--text", action="store", default=None, type=str,
+                        help="Lists the fonts that can render the text (default: the bengali fonts)")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    catalog = FontCatalog(args.font_folders, args.cache)
+    loaded_time = time.time()
+    faces = catalog.fonts_for(args.text, bengali_shaping=True) if args.text else catalog.bengali_fonts()
+    for a_face in faces:
+        sys.stdout.write(json.dumps({key: a_face[key] for key in ('family', 'style', 'path', 'index', 'bengali',
+                                                                   'bengali_shaping')}, ensure_ascii=False) + "\n")
+    sys.stderr.write(json.dumps({'faces': len(catalog.faces), 'scanned_files': catalog.scanned,
+                                 'load_seconds': loaded_time - start_time,
+                                 'query_seconds': time.time() - loaded_time}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,74 @@
+import argparse
 import json
-from PIL import Image
+import os
+import socket
+import sys
+import time
+import warnings
+from typing import Dict, List, Sequence
+from PIL import Image, ImageDraw, ImageFont, features
 from io import BytesIO
+from urllib.parse import quote
 import selenium.webdriver
-from shobdokutir.optical.image_utils import trim_image
+from shobdokutir.encoding.fonts import UNICODE_FONT, unicode_font_families
+from shobdokutir.optical.fonts import FontCatalog
+from shobdokutir.optical.image_utils import trim_image, image_similarity
 from shobdokutir.web.servers import run_parrot_server
 from multiprocessing import Process
-from subprocess import check_output
+
+# Posts a batch to the parrot server and writes the answer into the page. Selenium can only load a page with a
+# GET, and the query string of a GET is too short for a batch.
+_post_batch_script = """
+const callback = arguments[arguments.length - 1];
+fetch("/batch", {method: "POST", headers: {"Content-Type": "application/json"}, body: arguments[0]})
+    .then(function (response) { return response.text(); })
+    .then(function (html) {
+        document.open();
+        document.write(html);
+        document.close();
+        return document.fonts.ready;
+    })
+    .then(function () { callback(null); }, function (error) { callback(String(error)); });
+"""
+
+# Boxes of the messages of a batch page in the pixels of the full page screenshot
+_message_boxes_script = """
+const ratio = window.devicePixelRatio;
+return Array.from(document.getElementsByClassName("message")).map(function (element) {
+    const rect = element.getBoundingClientRect();
+    return [rect.left + window.scrollX, rect.top + window.scrollY, rect.right + window.scrollX,
+            rect.bottom + window.scrollY].map(function (x) { return Math.round(x * ratio); });
+});
+"""
+
+# Conjunct heavy samples (ref, ya-phala, reph + juktoborno, kars on both sides, ...) for the parity check of the
+# rendering backends
+PARITY_SAMPLES = ["ক্ষ্ম", "স্ত্রী", "জ্ঞান", "মন্ত্র", "কর্ম্ম", "ক্র্যাশ", "শৃঙ্খলা", "উজ্জ্বল", "সংক্ষিপ্ত",
+                  "রাষ্ট্রের", "বাংলায়", "কৌতূহল", "দ্ব্যর্থক", "ঊর্ধ্ব", "হ্রস্ব-দীর্ঘ", "ত্ত্ব", "আমি বাংলায় গান গাই।"]
+
+
+def _free_port() -> int:
+    """
+    A port that is free at the moment
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as a_socket:
+        a_socket.bind(("", 0))
+        return a_socket.getsockname()[1]
+
+
+def _wait_for_port(host: str, port: int, timeout: float) -> None:
+    """
+    Waits until a server accepts connections on the port
+    """
+    deadline = time.time() + timeout
+    while True:
+        try:
+            with socket.create_connection(("127.0.0.1" if host == "0.0.0.0" else host, port), timeout=1):
+                return
+        except OSError:
+            if time.time() > deadline:
+                raise TimeoutError("No server on port {0} after {1} seconds".format(port, timeout))
+            time.sleep(0.05)
 
 
 class OpticalTextBuilder:
@@ -14,15 +77,22 @@ class OpticalTextBuilder:
     Assumptions: The environment must be configured properly to correctly render the text.
     """
 
-    def __init__(self, server_port: int = 6976, server_host: str = '0.0.0.0') -> None:
+    def __init__(self, server_port: int = 6976, server_host: str = '0.0.0.0', headless: bool = False,
+                 start_timeout: float = 30.0) -> None:
         """
         Starts a parrot server and a web browser
+        :param server_port: Port of the parrot server, None for any free port
+        :param headless: Runs the web browser without a window
+        :param start_timeout: Seconds to wait for the parrot server to accept connections
         """
         self.server_host = server_host
-        self.server_port = server_port
-        self.process = Process(target=run_parrot_server, args=(self.server_host, self.server_port))
+        self.server_port = server_port or _free_port()
+        self.process = Process(target=run_parrot_server, args=(self.server_host, self.server_port), daemon=True)
         self.process.start()
-        self.driver = selenium.webdriver.Firefox()
+        _wait_for_port(self.server_host, self.server_port, start_timeout)
+        options = selenium.webdriver.FirefoxOptions()
+        options.headless = headless
+        self.driver = selenium.webdriver.Firefox(options=options)
 
     def clear_all(self) -> None:
         """
@@ -41,30 +111,198 @@ class OpticalTextBuilder:
         else:
             font_size_text = ""
         if font_name:
-            font_name_text = f"&font={font_name}"
+            font_name_text = f"&font={quote(font_name)}"
         else:
             font_name_text = ""
         url = f"http://{self.server_host}:{str(self.server_port)}" \
-            f"?message={json.dumps(txt)}{font_name_text}{font_size_text}"
-        print(url)
+            f"?message={quote(json.dumps(txt))}{font_name_text}{font_size_text}"
         self.driver.get(url)
         data = self.driver.get_full_page_screenshot_as_png()
         img = Image.open(BytesIO(data))
         return trim_image(img)
 
+    def get_text_images(self, texts: Sequence[str], font_size: int = None, font_name: str = None,
+                        batch_size: int = 100) -> List[Image.Image]:
+        """
+        Get the images of many texts in the specified font_name and font_size. The texts of a batch are laid out
+        on one page, each in its own element, and cut out of one screenshot by the boxes of the elements.
+        :param batch_size: Number of texts per page
+        :return: The images, in the order of the texts
+        """
+        images = []
+        # an empty batch page of the server, the batches are posted from it
+        self.driver.get(f"http://{self.server_host}:{str(self.server_port)}/batch")
+        for start in range(0, len(texts), batch_size):
+            error = self.driver.execute_async_script(_post_batch_script, json.dumps(
+                {'messages': list(texts[start:start + batch_size]), 'font': font_name, 'size': font_size}))
+            if error:
+                raise RuntimeError("The batch could not be rendered: {0}".format(error))
+            boxes = self.driver.execute_script(_message_boxes_script)
+            img = Image.open(BytesIO(self.driver.get_full_page_screenshot_as_png()))
+            # clipped to the screenshot, crop fills the outside with black
+            images.extend(trim_image(img.crop((max(0, left), max(0, top), min(img.size[0], right),
+                                               min(img.size[1], bottom))))
+                          for left, top, right, bottom in boxes)
+        return images
+
 
-def get_font_details():
+class PillowTextRenderer:
+    """
+    Definition: Renders text in-process with Pillow, without a server or a web browser. It has the interface of
+    OpticalTextBuilder, so that either can be used to generate images.
+    Assumptions: Pillow must be built with libraqm for the complex script shaping of bengali (the conjuncts and the
+    kars). Without it the text is drawn with the basic layout, one glyph per character.
+    """
+
+    def __init__(self, font_folder: str = "resources/bangla_fonts", default_font: str = UNICODE_FONT,
+                 default_size: int = 16, padding: int = 4) -> None:
+        """
+        :param font_folder: Folder of the fonts, the font_name of get_text_image is a family of these fonts
+        :param default_font: Font of the text when no font_name is given
+        :param default_size: Size of the text in pixels when no font_size is given (16px as in the browser)
+        :param padding: Margin around the text before trimming, for the glyphs drawn outside of their box
+        """
+        self.font_paths = {a_family.lower(): a_path for a_family, a_path in unicode_font_families(font_folder).items()}
+        self.default_font = default_font
+        self.default_size = default_size
+        self.padding = padding
+        self.shaping = features.check("raqm")
+        if not self.shaping:
+            warnings.warn("Pillow is built without libraqm, bengali text is rendered without shaping")
+        self.layout_engine = ImageFont.Layout.RAQM if self.shaping else ImageFont.Layout.BASIC
+        self.fonts = {}
+
+    def clear_all(self) -> None:
+        """
+        Releases the loaded fonts
+        """
+        self.fonts.clear()
+
+    def get_font(self, font_name: str = None, font_size: int = None) -> ImageFont.FreeTypeFont:
+        """
+        :param font_name: A family of the font folder or the path of a font file
+        """
+        font_name = font_name or self.default_font
+        font_size = font_size or self.default_size
+        if (font_name, font_size) not in self.fonts:
+            if font_name.lower() in self.font_paths:
+                font_path = self.font_paths[font_name.lower()]
+            elif os.path.isfile(font_name):
+                font_path = font_name
+            else:
+                raise ValueError("Unknown font: {0}".format(font_name))
+            self.fonts[font_name, font_size] = ImageFont.truetype(font_path, font_size,
+                                                                  layout_engine=self.layout_engine)
+        return self.fonts[font_name, font_size]
+
+    def get_text_image(self, txt: str, font_size: int = None, font_name: str = None) -> Image:
+        """
+        Get an image of the text in the specified font_name and font_size
+        """
+        font = self.get_font(font_name, font_size)
+        # the white spaces are collapsed as in the html of the parrot server
+        txt = " ".join(txt.split())
+        left, top, right, bottom = font.getbbox(txt)
+        if right <= left or bottom <= top:
+            return None
+        img = Image.new("RGB", (right - left + 2 * self.padding, bottom - top + 2 * self.padding), "white")
+        ImageDraw.Draw(img).text((self.padding - left, self.padding - top), txt, font=font, fill="black")
+        return trim_image(img)
+
+    def get_text_images(self, texts: Sequence[str], font_size: int = None, font_name: str = None) -> List[Image.Image]:
+        """
+        Get the images of many texts in the specified font_name and font_size
+        """
+        return [self.get_text_image(a_text, font_size, font_name) for a_text in texts]
+
+
+# The rendering backends
+RENDERERS = {'browser': OpticalTextBuilder, 'pillow': PillowTextRenderer}
+
+
+def compare_renderers(renderer, reference, samples: Sequence[str] = PARITY_SAMPLES, font_names: List[str] = None,
+                      font_size: int = 32) -> List[Dict]:
+    """
+    Renders the samples with two backends, e.g. a PillowTextRenderer and the reference OpticalTextBuilder
+    :return: The similarity (see image_similarity) and the sizes of the two images of every sample and font
+    """
+    results = []
+    for font_name in font_names or [None]:
+        for a_sample in samples:
+            img = renderer.get_text_image(a_sample, font_size, font_name)
+            reference_img = reference.get_text_image(a_sample, font_size, font_name)
+            results.append({'text': a_sample, 'font_name': font_name,
+                            'similarity': image_similarity(reference_img, img),
+                            'size': img.size if img else None,
+                            'reference_size': reference_img.size if reference_img else None})
+    return results
+
+
+def get_font_details(catalog: FontCatalog = None) -> Dict[str, Dict]:
     """
     Returns a list of available fonts in the system and their details
+    :param catalog: The catalog of the fonts (default: the fonts of the system and of resources/bangla_fonts)
+    :return: The paths, indices (in the collections) and styles of the faces of every family
     """
-    font_list = check_output(["fc-list"]).decode("unicode-escape").split("\n")
+    catalog = catalog or FontCatalog()
     font_details = {}
-    for a_font in font_list:
-        if not a_font.strip():
-            continue
-        font_entry = [a_col.strip().split("=")[1] if i == 2 else a_col.strip()
-                      for i, a_col in enumerate(a_font.split(":"))]
-        font_entry[2] = set(font_entry[2].split(",")) if "," in font_entry[2] else {font_entry[2]}
-        font_details.setdefault(font_entry[1], {'path': [], 'style': []})['path'].append(font_entry[0])
-        font_details[font_entry[1]]['style'].append(font_entry[2])
+    for a_face in catalog.faces:
+        details = font_details.setdefault(a_face['family'], {'path': [], 'index': [], 'style': []})
+        details['path'].append(a_face['path'])
+        details['index'].append(a_face['index'])
+        details['style'].append({a_face['style']})
     return font_details
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Renders text with the optical text backends")
+    parser.add_argument("--backend", action="store", default="pillow", choices=sorted(RENDERERS),
+                        help="Rendering backend (default: pillow)")
+    parser.add_argument("--parity", action="store_true",
+                        help="Compares the backend with the browser on conjunct heavy samples")
+    parser.add_argument("--benchmark", action="store", default=None, type=int,
+                        help="Measures the renders per second of the backend over the given number of renders")
+    parser.add_argument("--batch_size", action="store", default=None, type=int,
+                        help="Renders the benchmark texts in batches of the given size (get_text_images)")
+    parser.add_argument("--fonts", action="store", default=None, type=str, nargs="+",
+                        help="Font families to render with (default: the default font of the backend)")
+    parser.add_argument("--font_size", action="store", default=32, type=int,
+                        help="Font size in pixels (default: 32)")
+    parser.add_argument("--threshold", action="store", default=0.7, type=float,
+                        help="Minimum similarity of the parity check (default: 0.7)")
+    args = parser.parse_args()
+
+    renderer = RENDERERS[args.backend]()
+    try:
+        if args.benchmark:
+            start_time = time.time()
+            samples = [PARITY_SAMPLES[i % len(PARITY_SAMPLES)] for i in range(args.benchmark)]
+            if args.batch_size:
+                for start in range(0, len(samples), args.batch_size):
+                    renderer.get_text_images(samples[start:start + args.batch_size], args.font_size,
+                                             args.fonts[start // args.batch_size % len(args.fonts)]
+                                             if args.fonts else None)
+            else:
+                for i, a_sample in enumerate(samples):
+                    renderer.get_text_image(a_sample, args.font_size, args.fonts[i % len(args.fonts)]
+                                            if args.fonts else None)
+            sys.stderr.write(json.dumps({'renders': args.benchmark,
+                                         'renders_per_second': args.benchmark / (time.time() - start_time)}) + "\n")
+        if args.parity:
+            reference = OpticalTextBuilder()
+            try:
+                results = compare_renderers(renderer, reference, font_names=args.fonts, font_size=args.font_size)
+            finally:
+                reference.clear_all()
+            for a_result in results:
+                sys.stdout.write(json.dumps(a_result, ensure_ascii=False) + "\n")
+            failed = [a_result for a_result in results if a_result['similarity'] < args.threshold]
+            sys.stderr.write(json.dumps({'samples': len(results), 'failed': len(failed)}) + "\n")
+            if failed:
+                sys.exit(1)
+    finally:
+        renderer.clear_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import numpy as np
 from PIL import Image, ImageChops
 
 def trim_image(img: Image) -> Image:
@@ -12,4 +13,19 @@ def trim_image(img: Image) -> Image:
     if bbox:
         return img.crop(bbox)
     else:
-        return None
\ No newline at end of file
+        return None
+
+
+def image_similarity(img: Image, other: Image, threshold: int = 128) -> float:
+    """
+    Compares the ink of two images of a text, e.g. rendered by two backends. The other image is resized to the
+    size of the first one.
+    :param threshold: Gray level below which a pixel is ink
+    :return: Intersection over union of the ink pixels, between 0 and 1
+    """
+    if img is None or other is None:
+        return float(img is None and other is None)
+    ink = np.asarray(img.convert("L")) < threshold
+    other_ink = np.asarray(other.convert("L").resize(img.size, Image.BILINEAR)) < threshold
+    union = np.logical_or(ink, other_ink).sum()
+    return float(np.logical_and(ink, other_ink).sum() / union) if union else 1.0
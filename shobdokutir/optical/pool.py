@@ -0,0 +1,254 @@
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
+import signal
+import sys
+import time
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, Union
+
+from PIL import Image
+
+from shobdokutir.optical.generators import RENDERERS
+
+
+def _render_worker(renderer_class: type, renderer_kwargs: Dict, worker_index: int, generation: int,
+                   jobs: multiprocessing.Queue, results: multiprocessing.Queue) -> None:
+    """
+    Renders the jobs of a worker of OpticalTextBuilderPool until it gets None. Reports (worker index, generation,
+    job id, success, images or exception), with the job id None once the renderer is ready.
+    """
+    # terminate() raises SystemExit, so that the browser and the server of the worker are torn down
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(1))
+    renderer = renderer_class(**renderer_kwargs)
+    try:
+        results.put((worker_index, generation, None, True, os.getpid()))
+        for job_id, texts, font_size, font_name in iter(jobs.get, None):
+            try:
+                results.put((worker_index, generation, job_id, True,
+                             renderer.get_text_images(texts, font_size, font_name)))
+            except Exception as e:
+                try:
+                    pickle.dumps(e)
+                except Exception:
+                    e = RuntimeError(repr(e))
+                results.put((worker_index, generation, job_id, False, e))
+    finally:
+        renderer.clear_all()
+
+
+class OpticalTextBuilderPool:
+    """
+    Definition: Renders text with many renderers (OpticalTextBuilder or PillowTextRenderer), each in its own worker
+    process. A browser worker has its own parrot server on a free port and its own headless web browser.
+    The jobs are dispatched to the idle workers and the images are returned in the order of the texts. A worker that
+    crashes or does not answer within the job timeout is restarted and its jobs are sent again.
+    """
+
+    def __init__(self, workers: int = None, backend: Union[str, type] = "browser", job_timeout: float = 120.0,
+                 start_timeout: float = 120.0, max_retries: int = 2, prefetch: int = 2, **renderer_kwargs) -> None:
+        """
+        :param workers: Number of workers (default: number of cpus)
+        :param backend: Name of a backend of RENDERERS or a renderer class
+        :param job_timeout: Seconds after which a busy worker is considered hung
+        :param start_timeout: Seconds for a worker to start its renderer
+        :param max_retries: Number of times a job is sent again after its worker failed, before it fails
+        :param prefetch: Number of jobs sent to a worker before it finishes the first one
+        :param renderer_kwargs: Arguments of the renderers, by default the browsers are headless on a free port
+        """
+        self.renderer_class = RENDERERS[backend] if isinstance(backend, str) else backend
+        if self.renderer_class is RENDERERS['browser']:
+            renderer_kwargs = dict({'server_port': None, 'headless': True}, **renderer_kwargs)
+        self.renderer_kwargs = renderer_kwargs
+        self.job_timeout = job_timeout
+        self.start_timeout = start_timeout
+        self.max_retries = max_retries
+        self.prefetch = prefetch
+        self.results = multiprocessing.Queue()
+        self.restarts = 0
+        self.workers = []
+        for worker_index in range(workers or os.cpu_count()):
+            self.workers.append({'generation': -1, 'start_failures': 0})
+            self._start_worker(worker_index)
+
+    def __enter__(self) -> "OpticalTextBuilderPool":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _start_worker(self, worker_index: int) -> None:
+        worker = self.workers[worker_index]
+        worker['generation'] += 1
+        worker['jobs'] = multiprocessing.Queue()
+        worker['assigned'] = deque()
+        worker['ready'] = False
+        worker['since'] = time.time()
+        # not a daemon, a browser worker starts the process of its parrot server
+        worker['process'] = multiprocessing.Process(
+            target=_render_worker, args=(self.renderer_class, self.renderer_kwargs, worker_index,
+                                         worker['generation'], worker['jobs'], self.results))
+        worker['process'].start()
+
+    def _stop_worker(self, worker_index: int, timeout: float = 10.0) -> None:
+        process = self.workers[worker_index]['process']
+        # the jobs that the worker did not read must not block the exit of this process
+        self.workers[worker_index]['jobs'].cancel_join_thread()
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def _failed_workers(self) -> List[int]:
+        """
+        The workers that exited or exceeded their start or job timeout
+        """
+        now = time.time()
+        return [worker_index for worker_index, worker in enumerate(self.workers)
+                if not worker['process'].is_alive() or
+                (not worker['ready'] and now - worker['since'] > self.start_timeout) or
+                (worker['assigned'] and now - worker['since'] > self.job_timeout)]
+
+    def _jobs(self, requests: Iterable[Tuple[str, int, str]], batch_size: int) -> Iterator[Tuple[List[str], int, str]]:
+        """
+        Groups the consecutive requests of the same font_size and font_name into jobs of up to batch_size texts
+        """
+        for (font_size, font_name), group in itertools.groupby(requests, key=lambda a_request: a_request[1:]):
+            group = [a_request[0] for a_request in group]
+            for start in range(0, len(group), batch_size):
+                yield group[start:start + batch_size], font_size, font_name
+
+    def _receive(self, poll_interval: float) -> Union[Tuple[int, bool, object], None]:
+        """
+        Waits for a message of the workers
+        :return: The (job id, success, images or exception) of a finished job, None for the other messages
+        """
+        try:
+            worker_index, generation, job_id, success, value = self.results.get(timeout=poll_interval)
+        except queue.Empty:
+            return None
+        worker = self.workers[worker_index]
+        # the messages of the previous process of a restarted worker are ignored
+        if generation != worker['generation']:
+            return None
+        worker['since'] = time.time()
+        if job_id is None:
+            worker['ready'] = True
+            worker['start_failures'] = 0
+        elif worker['assigned'] and worker['assigned'][0][0] == job_id:
+            worker['assigned'].popleft()
+            return job_id, success, value
+        return None
+
+    def _restart_failed_workers(self) -> List[Tuple[int, Tuple[List[str], int, str]]]:
+        """
+        Restarts the workers that crashed or hung
+        :return: The jobs that were assigned to them, in order
+        """
+        lost_jobs = []
+        for worker_index in self._failed_workers():
+            self._stop_worker(worker_index)
+            if not self.workers[worker_index]['ready']:
+                self.workers[worker_index]['start_failures'] += 1
+                if self.workers[worker_index]['start_failures'] > self.max_retries:
+                    raise RuntimeError("The renderer of worker {0} failed to start {1} times".format(
+                        worker_index, self.workers[worker_index]['start_failures']))
+            self.restarts += 1
+            lost_jobs.extend(self.workers[worker_index]['assigned'])
+            self._start_worker(worker_index)
+        return sorted(lost_jobs, key=lambda a_job: a_job[0])
+
+    def imap(self, requests: Iterable[Tuple[str, int, str]], batch_size: int = 1,
+             poll_interval: float = 0.5) -> Iterator[Image.Image]:
+        """
+        Renders many texts in parallel
+        :param requests: The (txt, font_size, font_name) of every image, read lazily
+        :param batch_size: Number of consecutive texts of the same font and size rendered by one job (get_text_images)
+        :return: Iterator over the images, in the order of the requests
+        """
+        jobs = enumerate(self._jobs(requests, batch_size))
+        pending = deque()
+        tries = {}
+        done = {}
+        next_job_id = 0
+        exhausted = False
+        try:
+            while True:
+                # send the jobs to the ready workers, reading the requests only as far as needed
+                for worker in self.workers:
+                    while worker['ready'] and len(worker['assigned']) < self.prefetch:
+                        if not pending and not exhausted:
+                            a_job = next(jobs, None)
+                            if a_job is None:
+                                exhausted = True
+                            else:
+                                pending.append(a_job)
+                        if not pending:
+                            break
+                        job_id, (texts, font_size, font_name) = pending.popleft()
+                        tries[job_id] = tries.get(job_id, 0) + 1
+                        if not worker['assigned']:
+                            worker['since'] = time.time()
+                        worker['assigned'].append((job_id, (texts, font_size, font_name)))
+                        worker['jobs'].put((job_id, texts, font_size, font_name))
+                while next_job_id in done:
+                    success, value = done.pop(next_job_id)
+                    next_job_id += 1
+                    if not success:
+                        raise value
+                    yield from value
+                if exhausted and not pending and not tries:
+                    return
+                result = self._receive(poll_interval)
+                if result:
+                    del tries[result[0]]
+                    done[result[0]] = result[1:]
+                for job_id, a_job in reversed(self._restart_failed_workers()):
+                    if tries[job_id] > self.max_retries:
+                        del tries[job_id]
+                        done[job_id] = False, RuntimeError("Job {0} failed after {1} tries".format(
+                            job_id, self.max_retries + 1))
+                    else:
+                        pending.appendleft((job_id, a_job))
+        finally:
+            # the jobs of an abandoned iteration are finished (or lost with their worker) before the next one
+            while any(worker['assigned'] for worker in self.workers):
+                self._receive(poll_interval)
+                self._restart_failed_workers()
+
+    def get_text_images(self, texts: Sequence[str], font_size: int = None, font_name: str = None,
+                        batch_size: int = 1) -> List[Image.Image]:
+        """
+        Get the images of many texts in the specified font_name and font_size, rendered in parallel
+        """
+        return list(self.imap(((a_text, font_size, font_name) for a_text in texts), batch_size))
+
+    def get_text_image(self, txt: str, font_size: int = None, font_name: str = None) -> Image.Image:
+        """
+        Get an image of the text in the specified font_name and font_size
+        """
+        return self.get_text_images([txt], font_size, font_name)[0]
+
+    def close(self) -> None:
+        """
+        Stops the workers, each of them tears down its renderer. Replaces clear_all of a single renderer.
+        """
+        for worker in self.workers:
+            if worker['process'].is_alive():
+                worker['jobs'].put(None)
+        deadline = time.time() + 30
+        for worker_index, worker in enumerate(self.workers):
+            worker['process'].join(max(0.0, deadline - time.time()))
+            self._stop_worker(worker_index)
+        self.workers = []
+
+    def clear_all(self) -> None:
+        """
+        Same as close
+        """
+        self.close()
+
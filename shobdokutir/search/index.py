@@ -0,0 +1,434 @@
+import argparse
+import gzip
+import heapq
+import json
+import os
+import shutil
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from functools import reduce
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from shobdokutir.encoding.tokenizer import tokenize, words
+
+_manifest_name = "segments.json"
+# Every posting is a (chapter, paragraph, start, length) tuple
+_posting_width = 4
+
+
+def encode_varints(values: np.ndarray) -> bytes:
+    """
+    Encodes non negative integers as LEB128 varints (7 bits per byte, the high bit marks a continuation)
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    n_bytes = np.ones(len(values), dtype=np.int64)
+    remaining = values >> np.uint64(7)
+    while remaining.any():
+        n_bytes += remaining > 0
+        remaining >>= np.uint64(7)
+    encoded = np.empty(int(n_bytes.sum()), dtype=np.uint8)
+    starts = np.cumsum(n_bytes) - n_bytes
+    for k in range(int(n_bytes.max()) if len(values) else 0):
+        selected = n_bytes > k
+        a_byte = (values[selected] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        a_byte |= (n_bytes[selected] > k + 1).astype(np.uint64) << np.uint64(7)
+        encoded[starts[selected] + k] = a_byte
+    return encoded.tobytes()
+
+
+def decode_varints(data: np.ndarray) -> np.ndarray:
+    """
+    Decodes a buffer of LEB128 varints
+    """
+    data = np.frombuffer(data, dtype=np.uint8) if isinstance(data, bytes) else data
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1)).astype(np.int64)
+    lengths = ends - starts + 1
+    values = np.zeros(len(ends), dtype=np.uint64)
+    for k in range(int(lengths.max()) if len(ends) else 0):
+        selected = lengths > k
+        values[selected] |= (data[starts[selected] + k].astype(np.uint64) & np.uint64(0x7F)) << np.uint64(7 * k)
+    return values
+
+
+def _grouped_cumsum(values: np.ndarray, resets: np.ndarray) -> np.ndarray:
+    """
+    Cumulative sum that restarts at every position where resets is true (resets[0] must be true)
+    """
+    sums = np.cumsum(values)
+    last_reset = np.maximum.accumulate(np.where(resets, np.arange(len(values)), 0))
+    return sums - sums[last_reset] + values[last_reset]
+
+
+def encode_postings(postings: np.ndarray) -> bytes:
+    """
+    Compresses sorted postings: the chapters are delta coded, the paragraphs within the same chapter and the
+    starts within the same paragraph as well, then everything is written as varints
+    :param postings: An (n, 4) array of (chapter, paragraph, start, length) rows
+    """
+    chapters, paragraphs, starts, lengths = postings.astype(np.int64).T
+    same_chapter = np.diff(chapters, prepend=-1) == 0
+    same_paragraph = same_chapter & (np.diff(paragraphs, prepend=-1) == 0)
+    deltas = np.column_stack([np.diff(chapters, prepend=0),
+                              np.where(same_chapter, np.diff(paragraphs, prepend=0), paragraphs),
+                              np.where(same_paragraph, np.diff(starts, prepend=0), starts),
+                              lengths])
+    return encode_varints(deltas.ravel())
+
+
+def decode_postings(data: np.ndarray) -> np.ndarray:
+    """
+    Reverses encode_postings
+    :return: An (n, 4) array of (chapter, paragraph, start, length) rows
+    """
+    deltas = decode_varints(data).astype(np.int64).reshape(-1, _posting_width)
+    if not len(deltas):
+        return deltas
+    chapters = np.cumsum(deltas[:, 0])
+    new_chapter = np.diff(chapters, prepend=-1) != 0
+    paragraphs = _grouped_cumsum(deltas[:, 1], new_chapter)
+    new_paragraph = new_chapter | (np.diff(paragraphs, prepend=-1) != 0)
+    starts = _grouped_cumsum(deltas[:, 2], new_paragraph)
+    return np.column_stack([chapters, paragraphs, starts, deltas[:, 3]])
+
+
+class _SegmentWriter:
+    """
+    Writes the terms (in sorted order) and their postings of a new segment
+    """
+
+    def __init__(self, segment_dir: str) -> None:
+        os.makedirs(segment_dir)
+        self.segment_dir = segment_dir
+        self.f_terms = open(os.path.join(segment_dir, "terms.bin"), "wb")
+        self.f_postings = open(os.path.join(segment_dir, "postings.bin"), "wb")
+        self.lexicon = [(0, 0)]
+
+    def add_term(self, term: str, postings: np.ndarray) -> None:
+        encoded_term = term.encode("utf-8")
+        encoded_postings = encode_postings(postings)
+        self.f_terms.write(encoded_term)
+        self.f_postings.write(encoded_postings)
+        term_end, postings_end = self.lexicon[-1]
+        self.lexicon.append((term_end + len(encoded_term), postings_end + len(encoded_postings)))
+
+    def close(self, chapters: List[Tuple[str, int]]) -> None:
+        self.f_terms.close()
+        self.f_postings.close()
+        np.save(os.path.join(self.segment_dir, "lexicon.npy"), np.array(self.lexicon, dtype=np.uint64))
+        hash_size = max([len(epub_md5_hash) for epub_md5_hash, _ in chapters] + [1])
+        np.save(os.path.join(self.segment_dir, "chapters.npy"),
+                np.array(chapters, dtype=[('epub_md5_hash', "S{0}".format(hash_size)), ('xhtml_index', "<i4")]))
+
+
+def _map_file(path: str) -> np.ndarray:
+    return np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, dtype=np.uint8)
+
+
+class Segment:
+    """
+    A read only, memory mapped segment of the index
+    """
+
+    def __init__(self, segment_dir: str) -> None:
+        self.segment_dir = segment_dir
+        self.terms = _map_file(os.path.join(segment_dir, "terms.bin"))
+        self.postings_data = _map_file(os.path.join(segment_dir, "postings.bin"))
+        self.lexicon = np.load(os.path.join(segment_dir, "lexicon.npy"), mmap_mode="r")
+        self.chapters = np.load(os.path.join(segment_dir, "chapters.npy"), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.lexicon) - 1
+
+    def __getitem__(self, i: int) -> str:
+        """
+        The i-th term in the sorted order
+        """
+        return self.terms[int(self.lexicon[i, 0]):int(self.lexicon[i + 1, 0])].tobytes().decode("utf-8")
+
+    def find(self, term: str) -> int:
+        """
+        Binary search of a term, -1 if it is not in the segment
+        """
+        i = bisect_left(self, term)
+        return i if i < len(self) and self[i] == term else -1
+
+    def term_postings(self, i: int) -> np.ndarray:
+        return decode_postings(self.postings_data[int(self.lexicon[i, 1]):int(self.lexicon[i + 1, 1])])
+
+    def postings(self, term: str) -> np.ndarray:
+        """
+        The (chapter, paragraph, start, length) rows of a term
+        """
+        i = self.find(term)
+        return self.term_postings(i) if i >= 0 else np.zeros((0, _posting_width), dtype=np.int64)
+
+    def iter_terms(self, tag: int = 0) -> Iterator[Tuple[str, int, int]]:
+        """
+        Yields the (term, tag, term number) of all the terms in the sorted order
+        """
+        for i in range(len(self)):
+            yield self[i], tag, i
+
+    def size(self) -> int:
+        return sum(os.path.getsize(os.path.join(self.segment_dir, a_file)) for a_file in os.listdir(self.segment_dir))
+
+
+def _read_manifest(index_dir: str) -> Dict:
+    manifest_file = os.path.join(index_dir, _manifest_name)
+    if not os.path.exists(manifest_file):
+        return {'segments': [], 'next_segment': 0}
+    with open(manifest_file) as f_in:
+        return json.load(f_in)
+
+
+def _write_manifest(index_dir: str, manifest: Dict) -> None:
+    # the manifest is replaced atomically, so a reader never sees a half written list of segments
+    with open(os.path.join(index_dir, _manifest_name + ".part"), "w") as f_out:
+        json.dump(manifest, f_out, indent=2)
+    os.replace(os.path.join(index_dir, _manifest_name + ".part"), os.path.join(index_dir, _manifest_name))
+
+
+class IndexWriter:
+    """
+    Builds an inverted index of the paragraphs of the extracted chapters (the records of
+    epub_extract_contents). The postings are buffered in memory and written as an immutable segment
+    every segment_size postings. Whenever there are more than merge_factor segments, the adjacent
+    segments with the smallest total size are merged into one, so the number of segments (and the
+    cost of a query) stays bounded while the index grows incrementally.
+    """
+
+    def __init__(self, index_dir: str, segment_size: int = 5000000, merge_factor: int = 8) -> None:
+        """
+        :param index_dir: Directory of the index. Created if it does not exist, extended if it does
+        :param segment_size: Number of postings to buffer before a segment is written
+        :param merge_factor: Maximum number of segments before they are merged
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        self.index_dir = index_dir
+        self.segment_size = segment_size
+        self.merge_factor = merge_factor
+        self.manifest = _read_manifest(index_dir)
+        # books of the earlier runs are not added again. The books of this run stay out of it, so that a flush in
+        # the middle of a book does not reject its remaining chapters
+        self.indexed_books = set()
+        for a_segment in self.manifest['segments']:
+            chapters = Segment(os.path.join(index_dir, a_segment['name'])).chapters
+            self.indexed_books.update(a_hash.decode("ascii") for a_hash in np.unique(chapters['epub_md5_hash']))
+        self.buffer = {}
+        self.buffered_postings = 0
+        self.chapters = []
+
+    def __enter__(self) -> "IndexWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def add_chapter(self, epub_md5_hash: str, xhtml_index: int, paragraphs: List[str]) -> bool:
+        """
+        Adds the paragraphs (text_split) of a chapter
+        :return: False if the book was already indexed in an earlier run
+        """
+        if epub_md5_hash in self.indexed_books:
+            return False
+        chapter = len(self.chapters)
+        self.chapters.append((epub_md5_hash, xhtml_index))
+        buffer = self.buffer
+        for paragraph, a_text in enumerate(paragraphs):
+            for a_token, start, end in tokenize(a_text):
+                postings = buffer.get(a_token)
+                if postings is None:
+                    postings = buffer[a_token] = array("I")
+                postings.extend((chapter, paragraph, start, end - start))
+                self.buffered_postings += 1
+        if self.buffered_postings >= self.segment_size:
+            self.flush()
+        return True
+
+    def add_records(self, records: Iterable[Dict]) -> Dict:
+        """
+        Adds the records of epub_extract_contents (or of the ndjson written by --get_epub_text)
+        :return: Number of added and skipped chapters
+        """
+        summary = {'added': 0, 'skipped': 0}
+        for a_record in records:
+            if 'text_split' not in a_record:
+                continue
+            if self.add_chapter(a_record['epub_md5_hash'], a_record['xhtml_index'], a_record['text_split']):
+                summary['added'] += 1
+            else:
+                summary['skipped'] += 1
+        return summary
+
+    def _new_segment_name(self) -> str:
+        name = "segment-{0:06d}".format(self.manifest['next_segment'])
+        self.manifest['next_segment'] += 1
+        return name
+
+    def flush(self) -> None:
+        """
+        Writes the buffered postings as a new segment
+        """
+        if not self.chapters:
+            return
+        name = self._new_segment_name()
+        writer = _SegmentWriter(os.path.join(self.index_dir, name))
+        for a_term in sorted(self.buffer):
+            writer.add_term(a_term, np.frombuffer(self.buffer[a_term], dtype=np.uint32).reshape(-1, _posting_width))
+        writer.close(self.chapters)
+        self.manifest['segments'].append({'name': name, 'chapters': len(self.chapters),
+                                          'postings': self.buffered_postings})
+        _write_manifest(self.index_dir, self.manifest)
+        self.buffer = {}
+        self.buffered_postings = 0
+        self.chapters = []
+        if len(self.manifest['segments']) > self.merge_factor:
+            sizes = [a_segment['postings'] for a_segment in self.manifest['segments']]
+            first = min(range(len(sizes) - self.merge_factor + 1),
+                        key=lambda i: sum(sizes[i:i + self.merge_factor]))
+            self.merge(first, first + self.merge_factor)
+
+    def merge(self, first: int = 0, last: int = None) -> None:
+        """
+        Merges the segments[first:last] (all of them by default) into a single segment
+        """
+        segments = self.manifest['segments'][first:last]
+        if len(segments) < 2:
+            return
+        readers = [Segment(os.path.join(self.index_dir, a_segment['name'])) for a_segment in segments]
+        chapter_offsets = np.cumsum([0] + [len(a_reader.chapters) for a_reader in readers])
+        name = self._new_segment_name()
+        writer = _SegmentWriter(os.path.join(self.index_dir, name))
+        # the terms of all the segments in the sorted order, every term with the postings of the segments
+        merged_terms = heapq.merge(*[a_reader.iter_terms(j) for j, a_reader in enumerate(readers)])
+        current_term, postings = None, []
+        for a_term, j, i in merged_terms:
+            if a_term != current_term and postings:
+                writer.add_term(current_term, np.concatenate(postings))
+                postings = []
+            current_term = a_term
+            a_postings = readers[j].term_postings(i)
+            a_postings[:, 0] += chapter_offsets[j]
+            postings.append(a_postings)
+        if postings:
+            writer.add_term(current_term, np.concatenate(postings))
+        writer.close([(a_hash.decode("ascii"), int(xhtml_index)) for a_reader in readers
+                      for a_hash, xhtml_index in a_reader.chapters])
+        merged = {'name': name, 'chapters': int(chapter_offsets[-1]),
+                  'postings': sum(a_segment['postings'] for a_segment in segments)}
+        self.manifest['segments'][first:first + len(segments)] = [merged]
+        _write_manifest(self.index_dir, self.manifest)
+        # the open readers keep their memory maps of the removed segments
+        for a_segment in segments:
+            shutil.rmtree(os.path.join(self.index_dir, a_segment['name']))
+
+    def close(self) -> None:
+        self.flush()
+
+
+class IndexReader:
+    """
+    Searches an index built by IndexWriter. The segments are memory mapped, so a query only reads the
+    postings of its terms.
+    """
+
+    def __init__(self, index_dir: str) -> None:
+        self.index_dir = index_dir
+        self.segments = [Segment(os.path.join(index_dir, a_segment['name']))
+                         for a_segment in _read_manifest(index_dir)['segments']]
+
+    def search(self, query: str, limit: int = 20) -> Dict:
+        """
+        Finds the paragraphs that contain all the words of a query
+        :param query: Words, tokenized and normalized like the indexed text
+        :param limit: Maximum number of hits to return
+        :return: The 'total' number of matching paragraphs, the 'milliseconds' taken and the 'hits' (in the
+        order of indexing) as {epub_md5_hash, xhtml_index, paragraph, offsets: [[start, end], ...]}
+        """
+        start_time = time.perf_counter()
+        terms = list(dict.fromkeys(words(query)))
+        if not terms:
+            raise ValueError("The query has no words")
+        hits = []
+        total = 0
+        for a_segment in self.segments:
+            postings = [a_segment.postings(a_term) for a_term in terms]
+            # a paragraph is identified by chapter << 32 | paragraph
+            keys = [(a_postings[:, 0] << 32) | a_postings[:, 1] for a_postings in postings]
+            matches = reduce(np.intersect1d, keys)
+            total += len(matches)
+            selected = matches[:max(0, limit - len(hits))]
+            if not len(selected):
+                continue
+            offsets = {}
+            for a_postings, a_keys in zip(postings, keys):
+                in_selected = np.isin(a_keys, selected)
+                for a_key, start, length in zip(a_keys[in_selected], *a_postings[in_selected][:, 2:].T):
+                    offsets.setdefault(int(a_key), []).append([int(start), int(start + length)])
+            for a_key in selected:
+                epub_md5_hash, xhtml_index = a_segment.chapters[int(a_key) >> 32]
+                hits.append({'epub_md5_hash': epub_md5_hash.decode("ascii"), 'xhtml_index': int(xhtml_index),
+                             'paragraph': int(a_key) & 0xFFFFFFFF, 'offsets': sorted(offsets[int(a_key)])})
+        return {'total': total, 'hits': hits, 'milliseconds': (time.perf_counter() - start_time) * 1000}
+
+
+def read_ndjson(paths: List[str]) -> Iterator[Dict]:
+    """
+    Reads the records of ndjson files (gzipped if they end with .gz, - for stdin)
+    """
+    for a_path in paths:
+        if a_path == "-":
+            f_in = open(sys.stdin.fileno(), encoding="utf-8", closefd=False)
+        elif a_path.endswith(".gz"):
+            f_in = gzip.open(a_path, "rt", encoding="utf-8")
+        else:
+            f_in = open(a_path, encoding="utf-8")
+        with f_in:
+            for a_line in f_in:
+                if a_line.strip():
+                    yield json.loads(a_line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inverted index of the extracted Bangla text")
+    parser.add_argument("--index", action="store", required=True, type=str,
+                        help="Directory of the index")
+    parser.add_argument("--add", action="store", default=None, type=str, nargs="+",
+                        help="Adds the chapters of the ndjson files written by --get_epub_text (- for stdin). "
+                             "Books that are already in the index are skipped.")
+    parser.add_argument("--query", action="store", default=None, type=str,
+                        help="Prints the paragraphs that contain all the words of the query as ndjson")
+    parser.add_argument("--limit", action="store", default=20, type=int,
+                        help="Maximum number of hits of --query (default: 20)")
+    parser.add_argument("--merge", action="store_true", default=False,
+                        help="Merges all the segments of the index into one")
+    parser.add_argument("--segment_size", action="store", default=5000000, type=int,
+                        help="Number of postings per new segment (default: 5000000)")
+    parser.add_argument("--merge_factor", action="store", default=8, type=int,
+                        help="Maximum number of segments before they are merged (default: 8)")
+    args = parser.parse_args()
+
+    if args.add or args.merge:
+        with IndexWriter(args.index, args.segment_size, args.merge_factor) as writer:
+            if args.add:
+                start_time = time.time()
+                summary = writer.add_records(read_ndjson(args.add))
+                writer.flush()
+                summary['seconds'] = time.time() - start_time
+                sys.stderr.write(json.dumps(summary) + "\n")
+            if args.merge:
+                writer.merge()
+    if args.query:
+        results = IndexReader(args.index).search(args.query, args.limit)
+        for a_hit in results['hits']:
+            sys.stdout.write(json.dumps(a_hit) + "\n")
+        sys.stderr.write("{0} paragraphs in {1:.2f} ms\n".format(results['total'], results['milliseconds']))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,31 @@
 import json
 from flask import Flask, request
+from html import escape
 
 
-def run_parrot_server(host_name: str = '0.0.0.0', port_num: int = 6976) -> None:
+def _style_text(font_name: str = None, font_size: str = None) -> str:
     """
-    Run a parrot server in a specific port. A parrot server says the same thing that it receives.
+    The style attribute of the text in the given font_name and font_size
+    """
+    if font_name:
+        font_name_text = f"font-family: {font_name};"
+    else:
+        font_name_text = ""
+
+    if font_size:
+        font_size_text = f"font-size: {font_size}px;"
+    else:
+        font_size_text = ""
+
+    if font_name or font_size:
+        return f"style = \"{font_name_text} {font_size_text}\""
+    else:
+        return ""
+
+
+def create_parrot_app() -> Flask:
+    """
+    Creates the app of a parrot server. A parrot server says the same thing that it receives.
     """
     app = Flask(__name__)
 
@@ -16,23 +37,33 @@ def run_parrot_server(host_name: str = '0.0.0.0', port_num: int = 6976) -> None:
 
         message = json.loads(json_str)
 
-        if font_name:
-            font_name_text = f"font-family: {font_name};"
-        else:
-            font_name_text = ""
+        style_text = _style_text(font_name, font_size)
 
-        if font_size:
-            font_size_text = f"font-size: {font_size}px;"
-        else:
-            font_size_text = ""
+        formatted_text = f"<html><body><span {style_text}>{escape(message)}</span></body></html>"
 
-        if font_name or font_size:
-            style_text = f"style = \"{font_name_text} {font_size_text}\""
-        else:
-            style_text = ""
+        return formatted_text
 
-        formatted_text = f"<html><body><span {style_text}>{message}</span></body></html>"
+    @app.route('/batch', methods=['GET', 'POST'])
+    def batch() -> str:
+        """
+        Says many messages, each in its own block (with a vertical margin for the glyphs that are drawn
+        outside of the line), so that they can be cut out of one screenshot. The messages, font and size are
+        posted as json, a batch does not fit in the query string of a GET.
+        """
+        arguments = request.get_json(silent=True) or {}
+        messages = arguments.get("messages", [])
+        style_text = _style_text(arguments.get("font"), arguments.get("size"))
+
+        blocks = "".join(f"<div class=\"message\" {style_text}><span>{escape(a_message)}</span></div>"
+                         for a_message in messages)
+        return f"<html><head><style>div.message {{padding: 1em 0;}}</style></head><body>{blocks}</body></html>"
+
+    return app
 
-        return formatted_text
 
+def run_parrot_server(host_name: str = '0.0.0.0', port_num: int = 6976) -> None:
+    """
+    Run a parrot server in a specific port. A parrot server says the same thing that it receives.
+    """
+    app = create_parrot_app()
     app.run(host=host_name, port=port_num, debug=False)
@@ -0,0 +1,69 @@
+import os
+import random
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from shobdokutir.corpus.dedup import DedupIndex, MinHasher, dedup_corpus, shingles, similarity
+from shobdokutir.encoding.benchmark import synthetic_text
+
+
+def edit_words(text, fraction, seed):
+    rng = random.Random(seed)
+    text_words = text.split()
+    for i in rng.sample(range(len(text_words)), int(fraction * len(text_words))):
+        text_words[i] = "x" + str(i)
+    return " ".join(text_words)
+
+
+class TestDedup(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.temp_dir.name, "dedup.sqlite")
+        self.chapters = [synthetic_text(3000, seed=i) for i in range(4)]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_signature(self):
+        hasher = MinHasher(num_perm=256)
+        first = shingles(self.chapters[0])
+        # spacing, punctuation and zero width joiners do not matter
+        self.assertTrue(np.array_equal(first, shingles(" ,".join(self.chapters[0].split()) + "‌")))
+        near = shingles(edit_words(self.chapters[0], 0.02, 1))
+        jaccard = len(np.intersect1d(first, near)) / len(np.union1d(first, near))
+        self.assertAlmostEqual(similarity(hasher.signature(first), hasher.signature(near)), jaccard, delta=0.1)
+        self.assertLess(similarity(hasher.signature(first), hasher.signature(shingles(self.chapters[1]))), 0.1)
+        self.assertEqual(len(shingles("এক দুই")), 1)
+
+    def test_dedup_index(self):
+        with DedupIndex(self.db_file, min_shingles=10) as index:
+            result = index.add_chapters("a", [(0, self.chapters[0]), (1, self.chapters[1]), (2, "ছোট")])
+            self.assertEqual(result['duplicate_chapters'] + result['duplicate_books'], [])
+            result = index.add_chapters("b", [(0, "ভূমিকা"), (1, edit_words(self.chapters[1], 0.01, 2)),
+                                              (2, self.chapters[2])])
+            self.assertEqual([(a_pair['xhtml_index'], a_pair['other_epub_md5_hash'], a_pair['other_xhtml_index'])
+                              for a_pair in result['duplicate_chapters']], [(1, "a", 1)])
+            self.assertEqual(result['duplicate_books'], [])
+            self.assertTrue(index.add_chapters("b", [])['skipped'])
+        # the signatures persist, a new book is checked against the stored ones
+        with DedupIndex(self.db_file, min_shingles=10) as index:
+            result = index.add_chapters("c", [(0, edit_words(self.chapters[0], 0.01, 3)), (1, self.chapters[1])])
+            self.assertEqual([a_pair['other_epub_md5_hash'] for a_pair in result['duplicate_books']], ["a"])
+            self.assertEqual(index.clusters("book"), [["a", "c"]])
+            self.assertEqual(index.clusters("chapter"), [[["a", 1], ["b", 1], ["c", 1]], [["a", 0], ["c", 0]]])
+        with self.assertRaises(ValueError):
+            DedupIndex(self.db_file, bands=32)
+
+    def test_dedup_corpus(self):
+        records = [{'epub_md5_hash': epub_md5_hash, 'xhtml_index': i, 'text_split': text.split("।")}
+                   for epub_md5_hash, book in [("a", self.chapters[:2]), ("b", self.chapters[2:]),
+                                               ("c", self.chapters[:2])]
+                   for i, text in enumerate(book)]
+        with DedupIndex(self.db_file) as index:
+            results = list(dedup_corpus(records, index, workers=2))
+            self.assertEqual([a_result['epub_md5_hash'] for a_result in results], ["a", "b", "c"])
+            self.assertEqual(results[2]['duplicate_books'][0]['similarity'], 1.0)
+            self.assertEqual(len(list(dedup_corpus(records, index, workers=1))), 0)
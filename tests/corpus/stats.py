@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+from collections import Counter
+from unittest import TestCase
+
+from shobdokutir.corpus.stats import BoundedCounter, CountMinSketch, CorpusStats, corpus_stats
+from shobdokutir.encoding.benchmark import synthetic_text
+
+
+class TestStats(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_bounded_counter(self):
+        counter = BoundedCounter(capacity=2)
+        counter.update(Counter("aaaaabbbbccd"))
+        self.assertEqual(len(counter), 4)
+        counter.update({"f": 1})
+        self.assertEqual(counter.most_common(), [("a", 5), ("b", 4)])
+        self.assertEqual(counter.max_dropped, 2)
+        other = BoundedCounter(capacity=2)
+        other.update({"b": 3, "e": 1})
+        counter.merge(other)
+        self.assertEqual(counter.most_common(), [("b", 7), ("a", 5), ("e", 1)])
+
+    def test_bounded_counter_error_bound(self):
+        # a key that comes back after it was dropped counts from zero, so the errors of the prunes add up
+        batches = [set("xyz"), set("ypq"), set("yrs"), set("ytu"), set("yvw")]
+        counter = BoundedCounter(capacity=1)
+        for a_batch in batches:
+            counter.update(dict.fromkeys(a_batch, 1))
+        halves = BoundedCounter(capacity=1), BoundedCounter(capacity=1)
+        for i, a_batch in enumerate(batches):
+            halves[i % 2].update(dict.fromkeys(a_batch, 1))
+        halves[0].merge(halves[1])
+        true_counts = Counter(a_key for a_batch in batches for a_key in a_batch)
+        for a_counter in [counter, halves[0]]:
+            for a_key, a_count in true_counts.items():
+                if a_count > a_counter.max_dropped:
+                    self.assertIn(a_key, a_counter.counts)
+                self.assertLessEqual(a_count - a_counter.counts.get(a_key, 0), a_counter.max_dropped)
+
+    def test_count_min_sketch(self):
+        sketch = CountMinSketch(width=64, depth=4)
+        counts = Counter(synthetic_text(2000, seed=1).split())
+        sketch.update(counts)
+        for a_key, a_count in counts.items():
+            self.assertGreaterEqual(sketch.estimate(a_key), a_count)
+        other = CountMinSketch(width=64, depth=4)
+        other.update({"আমি": 2})
+        estimate = sketch.estimate("আমি")
+        sketch.merge(other)
+        self.assertEqual(sketch.estimate("আমি"), estimate + 2)
+
+    def test_corpus_stats(self):
+        stats = CorpusStats(max_n=2)
+        stats.add_records([{'text_split': ["আমি বাংলায় গান গাই।", "আমি গান গাই"]}, {'text': "Hello আমি"}])
+        self.assertEqual(stats.totals['records'], 2)
+        self.assertEqual(stats.totals['paragraphs'], 3)
+        self.assertEqual(stats.count("আমি"), 3)
+        self.assertEqual(stats.count("গান গাই"), 2)
+        self.assertEqual(stats.count("গাই আমি"), 0)
+        self.assertEqual(stats.graphemes.counts["মি"], 3)
+        self.assertEqual(stats.chars.counts["।"], 1)
+        with self.assertRaises(ValueError):
+            stats.count("a b c")
+
+    def test_parallel_and_merge(self):
+        paragraphs = synthetic_text(100000, seed=2).split("\n")
+        ndjson_file = os.path.join(self.temp_dir.name, "text.ndjson")
+        with open(ndjson_file, "w", encoding="utf-8") as f_out:
+            for i in range(0, len(paragraphs), 10):
+                f_out.write(json.dumps({'text_split': paragraphs[i:i + 10]}, ensure_ascii=False) + "\n")
+        exact = CorpusStats(max_n=3)
+        for a_paragraph in paragraphs:
+            exact.add_text(a_paragraph)
+        parallel = corpus_stats([ndjson_file], max_n=3, workers=2, chunk_size=4096)
+        self.assertEqual(parallel.totals['paragraphs'], len(paragraphs))
+        for n in range(1, 4):
+            self.assertEqual(parallel.ngrams[n].counts, exact.ngrams[n].counts)
+        self.assertEqual(parallel.graphemes.counts, exact.graphemes.counts)
+
+        bounded = corpus_stats([ndjson_file], max_n=3, capacity=50, sketch_width=4096, workers=1, chunk_size=4096)
+        self.assertLessEqual(len(bounded.words), 100)
+        for a_word, a_count in bounded.words.most_common(10):
+            self.assertLessEqual(exact.words.counts[a_word] - a_count, bounded.words.max_dropped)
+        for a_trigram in list(exact.ngrams[3].counts)[:100]:
+            self.assertGreaterEqual(bounded.count(a_trigram), exact.ngrams[3].counts[a_trigram])
+
+        stats_file = os.path.join(self.temp_dir.name, "stats.npz")
+        bounded.save(stats_file)
+        loaded = CorpusStats.load(stats_file)
+        self.assertEqual(loaded.summary(), bounded.summary())
+        loaded.merge(bounded)
+        self.assertEqual(loaded.totals['3grams'], 2 * bounded.totals['3grams'])
@@ -0,0 +1,23 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from shobdokutir.ebook.benchmark import synthetic_pages, benchmark_engines, synthetic_pdf, benchmark_pdf_modes
+
+
+class TestBenchmark(TestCase):
+
+    def test_benchmark_engines(self):
+        results = benchmark_engines(synthetic_pages(5, paragraphs=3), repeats=1)
+        self.assertEqual(results['pages'], 5)
+        self.assertEqual(results['mismatched_pages'], [])
+        self.assertGreater(results['engines']['lxml']['pages_per_second'], 0)
+
+    def test_benchmark_pdf_modes(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pdf_file = os.path.join(temp_dir, "sample.pdf")
+            synthetic_pdf(pdf_file, 2, lines=5)
+            results = benchmark_pdf_modes(pdf_file)
+        self.assertEqual(results['pages'], 2)
+        self.assertEqual(results['modes']['layout']['word_recall'], 1.0)
+        self.assertGreater(results['modes']['text']['word_recall'], 0.9)
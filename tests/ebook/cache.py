@@ -0,0 +1,62 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from shobdokutir.ebook.cache import ExtractionCache
+from shobdokutir.ebook.parser import epub_extract_contents, epub_get_meta, extract_epub_corpus
+from tests.ebook.parser import make_epub
+
+
+class TestCache(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.epub_file = os.path.join(self.temp_dir.name, "book.epub")
+        make_epub(self.epub_file)
+        self.cache_file = os.path.join(self.temp_dir.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_cached_extraction(self):
+        expected = epub_extract_contents(self.epub_file)
+        with ExtractionCache(self.cache_file) as cache:
+            self.assertEqual(epub_extract_contents(self.epub_file, cache=cache), expected)
+            self.assertEqual(cache.cache_info()['hits'], 0)
+            self.assertEqual(epub_extract_contents(self.epub_file, cache=cache), expected)
+            self.assertEqual(cache.cache_info()['hits'], 1)
+
+            # A new book that shares a page with the cached one
+            other_epub = os.path.join(self.temp_dir.name, "other.epub")
+            make_epub(other_epub, chapters=("অধ্যায় ১", "নতুন"))
+            cache.hits = cache.misses = 0
+            self.assertEqual(epub_extract_contents(other_epub, cache=cache), epub_extract_contents(other_epub))
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+            meta = epub_get_meta(self.epub_file, cache=cache)
+            os.rename(self.epub_file, os.path.join(self.temp_dir.name, "renamed.epub"))
+            cached_meta = epub_get_meta(os.path.join(self.temp_dir.name, "renamed.epub"), cache=cache)
+            self.assertEqual(cached_meta['epub_filename'], "renamed.epub")
+            self.assertEqual(cached_meta['spine'], meta['spine'])
+            info = cache.cache_info()
+            self.assertEqual((info['pages'], info['books']), (3, 2))
+
+    def test_eviction(self):
+        with ExtractionCache(self.cache_file, max_size=0) as cache:
+            epub_extract_contents(self.epub_file, cache=cache)
+            self.assertGreater(cache.size(), 0)
+            self.assertEqual(cache.evict(), 3)
+            self.assertEqual(cache.size(), 0)
+            # A book whose pages were evicted is parsed again
+            self.assertEqual(epub_extract_contents(self.epub_file, cache=cache), epub_extract_contents(self.epub_file))
+
+    def test_extract_epub_corpus(self):
+        summary = extract_epub_corpus([self.epub_file], output=os.path.join(self.temp_dir.name, "out"),
+                                      cache_file=self.cache_file)
+        self.assertEqual(summary['cache']['misses'], 2)
+        summary = extract_epub_corpus([self.epub_file], output=os.path.join(self.temp_dir.name, "out"),
+                                      cache_file=self.cache_file)
+        self.assertEqual(summary['cache']['hit_rate'], 1.0)
+        summary = extract_epub_corpus([self.epub_file], output=os.path.join(self.temp_dir.name, "out"),
+                                      cache_file=self.cache_file, rebuild_cache=True)
+        self.assertEqual(summary['cache']['hits'], 0)
@@ -0,0 +1,161 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import zipfile as zf
+from unittest import TestCase
+
+from shobdokutir.ebook.benchmark import write_sample_pdf
+from shobdokutir.encoding.utils import bijoy2unicode
+from shobdokutir.ebook.parser import EpubReader, epub_get_meta, epub_xhtml_iter, epub_extract_contents, read_epub, \
+    list_epub_files, extract_epub_corpus, parse_xhtml_contents, epub_iter, pdf_iter, pdf_page_count, \
+    parse_page_ranges
+
+_content_opf = """<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="2.0">
+<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:title>পরীক্ষা</dc:title>
+<dc:creator>লেখক</dc:creator>
+<dc:identifier id="uid">urn:uuid:1234</dc:identifier>
+</metadata>
+<manifest>
+<item id="ch1" href="chapter 1.xhtml" media-type="application/xhtml+xml"/>
+<item id="ch2" href="chapter2.xhtml" media-type="application/xhtml+xml"/>
+</manifest>
+<spine><itemref idref="ch2"/><itemref idref="ch1"/></spine>
+</package>
+"""
+
+_chapter = """<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head><title>{0}</title></head>
+<body><h1>{0}</h1>
+<p>আমি বাংলায় গান গাই।</p>
+<p>  </p>
+<p>আমি বাংলার গান গাই।</p></body>
+</html>
+"""
+
+
+def make_epub(epub_file: str, chapters=("অধ্যায় ১", "অধ্যায় ২")) -> None:
+    """
+    Writes a small epub with two chapters in the reverse order of the spine
+    """
+    with zf.ZipFile(epub_file, "w") as epub:
+        epub.writestr("mimetype", "application/epub+zip")
+        epub.writestr("OEBPS/content.opf", _content_opf)
+        epub.writestr("OEBPS/chapter 1.xhtml", _chapter.format(chapters[0]))
+        epub.writestr("OEBPS/chapter2.xhtml", _chapter.format(chapters[1]))
+
+
+class TestParser(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.epub_file = os.path.join(self.temp_dir.name, "book.epub")
+        make_epub(self.epub_file)
+        with open(self.epub_file, "rb") as f_in:
+            self.md5_hash = hashlib.md5(f_in.read()).hexdigest()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_epub_reader(self):
+        for max_memory in [0, 1 << 20]:
+            with EpubReader(self.epub_file, max_memory=max_memory) as epub:
+                self.assertEqual(epub.md5_hash, self.md5_hash)
+                self.assertEqual(epub.meta['title'], "পরীক্ষা")
+                self.assertEqual(epub.meta['spine'], ["ch2", "ch1"])
+                self.assertEqual(epub.spine, ["OEBPS/chapter2.xhtml", "OEBPS/chapter 1.xhtml"])
+                pages = list(epub.pages())
+            self.assertEqual([a_page['xhtml_index'] for a_page in pages], [0, 1])
+            self.assertEqual(pages[1]['xhtml_md5_hash'], hashlib.md5(pages[1]['xhtml_content']).hexdigest())
+            self.assertEqual(pages[0]['epub_md5_hash'], self.md5_hash)
+
+    def test_wrappers(self):
+        meta = epub_get_meta(self.epub_file)
+        self.assertEqual((meta['md5_hash'], meta['epub_filename'], meta['root_folder']),
+                         (self.md5_hash, "book.epub", "OEBPS"))
+        self.assertEqual(meta['creator'], "লেখক")
+        self.assertEqual(meta['all_ids'][0]['value'], "urn:uuid:1234")
+        self.assertEqual(len(list(epub_xhtml_iter(self.epub_file))), 2)
+        records = epub_extract_contents(self.epub_file)
+        self.assertEqual(records[0]['title'], "অধ্যায় ২")
+        self.assertEqual(records[0]['text_split_type'], ["h1", "p", "p"])
+        self.assertEqual(records[0]['text_split'][1], "আমি বাংলায় গান গাই।")
+        self.assertEqual(read_epub(self.epub_file)[1]['title'], "অধ্যায় ১")
+
+    def test_extract_epub_corpus(self):
+        os.makedirs(os.path.join(self.temp_dir.name, "sub"))
+        make_epub(os.path.join(self.temp_dir.name, "sub", "other book.epub"), chapters=("ক", "খ"))
+        with open(os.path.join(self.temp_dir.name, "broken.epub"), "w") as f_out:
+            f_out.write("not a zip file")
+        epub_files = list_epub_files([self.temp_dir.name])
+        self.assertEqual([os.path.basename(a_file) for a_file in epub_files],
+                         ["book.epub", "broken.epub", "other book.epub"])
+        self.assertEqual(list_epub_files(os.path.join(self.temp_dir.name, "sub", "other book.epub").split(" ")),
+                         [epub_files[2]])
+
+        output = os.path.join(self.temp_dir.name, "contents")
+        summary = extract_epub_corpus(epub_files, output=output, shard_size=3, compress=True, workers=2)
+        self.assertEqual((summary['extracted'], summary['records']), (2, 4))
+        self.assertEqual([a_failure['file'] for a_failure in summary['failed']], [epub_files[1]])
+        records = []
+        for shard in ["contents-00000.ndjson.gz", "contents-00001.ndjson.gz"]:
+            with gzip.open(os.path.join(self.temp_dir.name, shard), "rt", encoding="utf-8") as f_in:
+                records.extend(json.loads(a_line) for a_line in f_in)
+        self.assertEqual([a_record['title'] for a_record in records], ["অধ্যায় ২", "অধ্যায় ১", "খ", "ক"])
+
+        output = os.path.join(self.temp_dir.name, "meta")
+        summary = extract_epub_corpus(epub_files[2:], target="meta", output=output, workers=1)
+        with open(output + "-00000.ndjson", encoding="utf-8") as f_in:
+            self.assertEqual(json.loads(f_in.read())['epub_filename'], "other book.epub")
+
+    def test_lxml_engine(self):
+        self.assertEqual(epub_get_meta(self.epub_file, engine="lxml"), epub_get_meta(self.epub_file))
+        self.assertEqual(epub_extract_contents(self.epub_file, engine="lxml"), epub_extract_contents(self.epub_file))
+        self.assertEqual(list(epub_iter(self.epub_file, engine="lxml")), list(epub_iter(self.epub_file)))
+        xhtml = "<html>\r\n <head><title>ক &amp; খ</title><style>p {}</style></head>\r\n <body>\r\n  " \
+                "<div><p>আমি<br/>তুমি <!-- comment --></p>  <pre>  </pre></div>\r\n  <script>var a;</script>" \
+                "<ruby>漢<rt>kan</rt></ruby><p>  </p>\r\n</body></html>".encode("utf-8")
+        self.assertEqual(parse_xhtml_contents(xhtml, engine="lxml"), parse_xhtml_contents(xhtml))
+        with self.assertRaises(ValueError):
+            parse_xhtml_contents(xhtml, engine="html5")
+
+    def test_pdf_iter(self):
+        pdf_file = os.path.join(self.temp_dir.name, "sample.pdf")
+        write_sample_pdf(pdf_file, [[[("Helvetica", "Page {0} line {1}".format(i, j))] for j in range(2)]
+                                    for i in range(6)])
+        self.assertEqual(pdf_page_count(pdf_file), 6)
+        records = list(pdf_iter(pdf_file))
+        self.assertEqual(records[3]['text'], "Page 3 line 0\nPage 3 line 1\n")
+        self.assertEqual([a_record['page'] for a_record in records], list(range(6)))
+        self.assertTrue(all(a_record['seconds'] >= 0 for a_record in records))
+        self.assertEqual([a_record['page'] for a_record in pdf_iter(pdf_file, pages=[4, 1, 9])], [1, 4])
+        self.assertEqual([a_record['text'] for a_record in pdf_iter(pdf_file, pages=range(1, 5), workers=2)],
+                         [a_record['text'] for a_record in records[1:5]])
+        self.assertEqual(len(list(pdf_iter(pdf_file, accumulate_per_page=False, workers=3))), 6)
+        self.assertEqual(parse_page_ranges("0-2, 5"), [0, 1, 2, 5])
+
+    def test_pdf_text_mode(self):
+        pdf_file = os.path.join(self.temp_dir.name, "sample.pdf")
+        write_sample_pdf(pdf_file, [[[("Helvetica", "Hello")], [("Kalpurush", "আমি বাংলায় গান গাই।")]], []])
+        records = list(pdf_iter(pdf_file, mode="text", workers=2))
+        self.assertEqual([a_record['text'] for a_record in records], ["Hello\nআমি বাংলায় গান গাই।\n", ""])
+        self.assertEqual([a_record['text'] for a_record in pdf_iter(pdf_file)],
+                         [a_record['text'] for a_record in records])
+        with self.assertRaises(ValueError):
+            list(pdf_iter(pdf_file, mode="fast"))
+
+    def test_pdf_bijoy_fonts(self):
+        pdf_file = os.path.join(self.temp_dir.name, "sample.pdf")
+        write_sample_pdf(pdf_file, [[[("Helvetica", "Song: "), ("SutonnyMJ", "Avwg evsjvq Mvb MvB|")],
+                                     [("Kalpurush", "আমি বাংলার গান গাই।")]]])
+        expected = "Song: " + bijoy2unicode("Avwg evsjvq Mvb MvB|") + "\nআমি বাংলার গান গাই।\n"
+        for mode in ["layout", "text"]:
+            self.assertEqual(next(pdf_iter(pdf_file, mode=mode, bijoy_fonts=["*MJ"]))['text'], expected)
+            self.assertEqual(next(pdf_iter(pdf_file, mode=mode, workers=2, bijoy_fonts=["sutonnymj"]))['text'],
+                             expected)
+            self.assertIn("Avwg evsjvq", next(pdf_iter(pdf_file, mode=mode))['text'])
+            self.assertIn("Avwg evsjvq", next(pdf_iter(pdf_file, mode=mode, bijoy_fonts=["JamunaMJ"]))['text'])
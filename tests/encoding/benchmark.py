@@ -0,0 +1,27 @@
+import copy
+from unittest import TestCase
+
+from shobdokutir.encoding.benchmark import build_inputs, check_roundtrip, run_benchmarks, compare_to_baseline
+
+
+class TestBenchmark(TestCase):
+
+    def test_build_inputs(self):
+        inputs = build_inputs([100, 5000])
+        self.assertEqual(len(inputs[5000]['unicode']), 5000)
+        self.assertEqual(len(inputs[5000]['bijoy']), 5000)
+        self.assertEqual(len(inputs[100]['bijoy']), 100)
+
+    def test_roundtrip(self):
+        result = check_roundtrip(n_words=2000, seed=1)
+        self.assertEqual(result['failures'], [])
+        self.assertEqual(result['bijoy_digest'], check_roundtrip(n_words=2000, seed=1)['bijoy_digest'])
+
+    def test_compare_to_baseline(self):
+        baseline = run_benchmarks([1000], repeats=3, n_words=100)
+        self.assertTrue(all(a_result['chars_per_second'] > 0 for a_result in baseline['results']))
+        self.assertEqual(compare_to_baseline(baseline, baseline), [])
+        current = copy.deepcopy(baseline)
+        current['results'][0]['chars_per_second'] = baseline['results'][0]['chars_per_second'] / 2
+        current['roundtrip']['unicode_digest'] = ""
+        self.assertEqual(len(compare_to_baseline(current, baseline)), 2)
@@ -0,0 +1,42 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from shobdokutir.encoding.cache import CachedConverter
+from shobdokutir.encoding.utils import BijoyConverter, UnicodeConverter, bijoy2unicode, unicode2bijoy
+
+
+class TestCache(TestCase):
+
+    def setUp(self):
+        with open("resources/sample_docs/bijoy_sample.txt", encoding="cp1252") as f_bijoy:
+            self.bijoy_texts = f_bijoy.read()
+        with open("resources/sample_docs/unicode_sample.txt", encoding="utf-8") as f_unicode:
+            self.unicode_texts = f_unicode.read()
+
+    def test_cached_conversion(self):
+        bijoy_converter = CachedConverter(BijoyConverter())
+        self.assertEqual(bijoy_converter.convert(self.bijoy_texts), bijoy2unicode(self.bijoy_texts))
+        self.assertEqual(bijoy_converter.convert(self.bijoy_texts), bijoy2unicode(self.bijoy_texts))
+        info = bijoy_converter.cache_info()
+        self.assertEqual(info['size'], info['misses'])
+        self.assertGreater(info['hit_rate'], 0.5)
+        unicode_converter = CachedConverter(UnicodeConverter())
+        self.assertEqual(unicode_converter.convert(self.unicode_texts), unicode2bijoy(self.unicode_texts))
+
+    def test_eviction_and_persistence(self):
+        converter = CachedConverter(BijoyConverter(), capacity=2)
+        self.assertEqual(converter.convert("Avwg Zywg Avwg  †m\n"), "আমি তুমি আমি  সে\n")
+        self.assertEqual(list(converter.cache), ["Avwg", "†m"])
+        self.assertEqual(converter.cache_info()['hits'], 1)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_file = os.path.join(temp_dir, "cache.json")
+            converter.save(cache_file)
+            warm_converter = CachedConverter(BijoyConverter(), capacity=1)
+            warm_converter.load(cache_file)
+        self.assertEqual(list(warm_converter.cache), ["†m"])
+        warm_converter.convert("†m")
+        self.assertEqual(warm_converter.cache_info()['hits'], 1)
+        warm_converter.cache_clear()
+        self.assertEqual(warm_converter.cache_info()['size'], 0)
@@ -0,0 +1,23 @@
+from unittest import TestCase
+
+from shobdokutir.encoding.char_classes import char_class, char_flags, classify, classify_flags, \
+    CLASS_OTHER, CLASS_BANJON_BORNO, CLASS_POST_KAR, CLASS_HASANT, CLASS_SIGN, CLASS_DIGIT, \
+    FLAG_BANJON_BORNO, FLAG_CHANDRABINDU, FLAG_KAR, FLAG_PRE_KAR
+
+
+class TestCharClasses(TestCase):
+
+    def test_scalar_lookups(self):
+        self.assertEqual(char_class("ক"), CLASS_BANJON_BORNO)
+        self.assertEqual(char_class("a"), CLASS_OTHER)
+        self.assertEqual(char_class(""), CLASS_OTHER)
+        self.assertEqual(char_flags("ঁ"), FLAG_BANJON_BORNO | FLAG_CHANDRABINDU)
+        self.assertEqual(char_flags("ি"), FLAG_PRE_KAR | FLAG_KAR)
+
+    def test_bulk_lookups(self):
+        text = "কা্ঁ১aऀ਀"
+        self.assertEqual(classify(text).tolist(),
+                         [CLASS_BANJON_BORNO, CLASS_POST_KAR, CLASS_HASANT, CLASS_SIGN, CLASS_DIGIT,
+                          CLASS_OTHER, CLASS_OTHER, CLASS_OTHER])
+        self.assertEqual(classify_flags(text).tolist(), [char_flags(c) for c in text])
+        self.assertEqual(len(classify("")), 0)
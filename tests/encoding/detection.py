@@ -0,0 +1,33 @@
+from unittest import TestCase
+
+from shobdokutir.encoding.utils import bijoy2unicode
+from shobdokutir.encoding.detection import detect_spans, convert_mixed, SPAN_BIJOY, SPAN_UNICODE, SPAN_LATIN, \
+    SPAN_OTHER
+
+
+class TestDetection(TestCase):
+
+    def setUp(self):
+        with open("resources/sample_docs/bijoy_sample.txt", encoding="cp1252") as f_bijoy:
+            self.bijoy_texts = f_bijoy.read()
+        with open("resources/sample_docs/unicode_sample.txt", encoding="utf-8") as f_unicode:
+            self.unicode_texts = f_unicode.read()
+
+    def test_detect_spans(self):
+        self.assertEqual([a_span['type'] for a_span in detect_spans(self.bijoy_texts)], [SPAN_BIJOY])
+        self.assertEqual([a_span['type'] for a_span in detect_spans(self.unicode_texts)], [SPAN_UNICODE])
+        self.assertEqual(detect_spans(""), [])
+        self.assertEqual([a_span['type'] for a_span in detect_spans("... 123")], [SPAN_OTHER])
+
+        text = "The quick brown fox jumps. Avwg evsjvq Mvb MvB| আমি বাংলায় গান গাই। Привет мир"
+        spans = detect_spans(text)
+        self.assertEqual([a_span['type'] for a_span in spans], [SPAN_LATIN, SPAN_BIJOY, SPAN_UNICODE, SPAN_OTHER])
+        self.assertEqual(text[spans[1]['start']:spans[1]['end']], "Avwg evsjvq Mvb MvB| ")
+        self.assertEqual(spans[-1]['end'], len(text))
+        for a_span in spans:
+            self.assertTrue(0.5 < a_span['confidence'] <= 1.0)
+
+    def test_convert_mixed(self):
+        text = "Hello world. Avwg evsjvq Mvb MvB| আমি বাংলায় গান গাই।"
+        expected = "Hello world. " + bijoy2unicode("Avwg evsjvq Mvb MvB| ") + "আমি বাংলায় গান গাই।"
+        self.assertEqual(convert_mixed(text), expected)
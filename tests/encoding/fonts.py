@@ -0,0 +1,19 @@
+from unittest import TestCase
+
+from shobdokutir.encoding.fonts import font_family, is_bijoy_font
+
+
+class TestFonts(TestCase):
+
+    def test_font_family(self):
+        self.assertEqual(font_family("ABCDEF+SutonnyMJ-Bold"), "SutonnyMJ")
+        self.assertEqual(font_family("Sutonny MJ,BoldItalic"), "SutonnyMJ")
+        self.assertEqual(font_family(None), "")
+
+    def test_is_bijoy_font(self):
+        self.assertTrue(is_bijoy_font("QWERTY+SutonnyMJ"))
+        self.assertTrue(is_bijoy_font("JamunaMJ-Italic"))
+        self.assertFalse(is_bijoy_font("Kalpurush"))
+        self.assertFalse(is_bijoy_font("Helvetica-Bold"))
+        self.assertTrue(is_bijoy_font("Boishakhi", bijoy_fonts=["*MJ", "boishakhi"]))
+        self.assertFalse(is_bijoy_font("SutonnyMJ", bijoy_fonts=[]))
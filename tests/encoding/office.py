@@ -0,0 +1,149 @@
+import os
+import tempfile
+import zipfile as zf
+from unittest import TestCase
+
+from lxml import etree
+
+from shobdokutir.encoding.office import convert_office_document, convert_office_folder
+from shobdokutir.encoding.utils import bijoy2unicode
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_STYLE = "{urn:oasis:names:tc:opendocument:xmlns:style:1.0}"
+_TEXT = "{urn:oasis:names:tc:opendocument:xmlns:text:1.0}"
+_SVG = "{urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0}"
+
+_docx_styles = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
+<w:docDefaults><w:rPrDefault><w:rPr><w:rFonts w:ascii="Calibri" w:hAnsi="Calibri"/></w:rPr></w:rPrDefault>
+</w:docDefaults>
+<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>
+<w:style w:type="paragraph" w:styleId="Bangla"><w:basedOn w:val="Normal"/>
+<w:rPr><w:rFonts w:ascii="SutonnyMJ" w:hAnsi="SutonnyMJ"/><w:sz w:val="28"/></w:rPr></w:style>
+</w:styles>
+"""
+
+_docx_document = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<!-- a comment -->
+<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+ xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"><w:body>
+<w:p><w:r><w:rPr><w:rFonts w:ascii="Times New Roman" w:hAnsi="Times New Roman"/></w:rPr><w:t>Title: </w:t></w:r>
+<w:r><w:rPr><w:rFonts w:ascii="SutonnyMJ" w:hAnsi="SutonnyMJ"/><w:b/></w:rPr><w:t xml:space="preserve">Avwg evs</w:t></w:r>
+<w:r><w:rPr><w:rFonts w:ascii="SutonnyMJ" w:hAnsi="SutonnyMJ"/></w:rPr><w:t>jvq Mvb MvB|</w:t></w:r></w:p>
+<w:tbl><w:tr><w:tc><w:p><w:pPr><w:pStyle w:val="Bangla"/></w:pPr><w:r><w:t>Zywg</w:t></w:r></w:p></w:tc></w:tr></w:tbl>
+<w:p><w:r><w:t>Avwg &amp; you</w:t></w:r></w:p>
+<w:sectPr/></w:body></w:document>
+"""
+
+_odt_content = """<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+ xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0"
+ xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+ xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0"
+ xmlns:svg="urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0" office:version="1.2">
+<office:font-face-decls><style:font-face style:name="SutonnyMJ" svg:font-family="SutonnyMJ"/>
+<style:font-face style:name="Liberation Serif" svg:font-family="'Liberation Serif'"/></office:font-face-decls>
+<office:automatic-styles>
+<style:style style:name="T1" style:family="text"><style:text-properties style:font-name="SutonnyMJ"
+ fo:font-size="14pt"/></style:style>
+<style:style style:name="T2" style:family="text"><style:text-properties fo:font-weight="bold"/></style:style>
+</office:automatic-styles>
+<office:body><office:text>
+<text:p text:style-name="Standard">Title: <text:span text:style-name="T1">Avwg evs</text:span><text:span
+ text:style-name="T1">jvq<text:s/>Mvb MvB|</text:span></text:p>
+<text:p text:style-name="Bangla">Zywg <text:span text:style-name="T2">Avwg</text:span></text:p>
+</office:text></office:body></office:document-content>
+"""
+
+_odt_styles = """<?xml version="1.0" encoding="UTF-8"?>
+<office:document-styles xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+ xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0"
+ xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0"
+ xmlns:svg="urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0" office:version="1.2">
+<office:font-face-decls><style:font-face style:name="SutonnyMJ" svg:font-family="SutonnyMJ"/></office:font-face-decls>
+<office:styles>
+<style:default-style style:family="paragraph"><style:text-properties style:font-name="Liberation Serif"/>
+</style:default-style>
+<style:style style:name="Standard" style:family="paragraph"/>
+<style:style style:name="Bangla" style:family="paragraph" style:parent-style-name="Standard">
+<style:text-properties style:font-name="SutonnyMJ"/></style:style>
+</office:styles>
+</office:document-styles>
+"""
+
+
+def make_document(document_file, parts):
+    with zf.ZipFile(document_file, "w") as document:
+        for name, contents in parts:
+            document.writestr(name, contents, compress_type=zf.ZIP_STORED if name == "mimetype" else zf.ZIP_DEFLATED)
+
+
+class TestOffice(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.docx_file = os.path.join(self.temp_dir.name, "in", "letter.docx")
+        self.odt_file = os.path.join(self.temp_dir.name, "in", "sub", "letter.odt")
+        os.makedirs(os.path.dirname(self.odt_file))
+        make_document(self.docx_file, [("[Content_Types].xml", "<Types/>"), ("word/styles.xml", _docx_styles),
+                                       ("word/document.xml", _docx_document), ("word/media/image1.png", b"\x89PNG")])
+        make_document(self.odt_file, [("mimetype", "application/vnd.oasis.opendocument.text"),
+                                      ("content.xml", _odt_content), ("styles.xml", _odt_styles)])
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_convert_docx(self):
+        dest_file = os.path.join(self.temp_dir.name, "letter.docx")
+        stats = convert_office_document(self.docx_file, dest_file)
+        self.assertEqual(stats['paragraphs'], 2)
+        with zf.ZipFile(dest_file) as document:
+            self.assertEqual(document.read("word/media/image1.png"), b"\x89PNG")
+            xml = document.read("word/document.xml")
+            styles = etree.fromstring(document.read("word/styles.xml"))
+        self.assertIn(b"<!-- a comment -->", xml)
+        self.assertEqual(xml.count(b"xmlns:w="), 1)
+        root = etree.fromstring(xml)
+        texts = [a_text.text for a_text in root.iter(_W + "t")]
+        # the word split over two runs is moved into the first one
+        self.assertEqual(texts, ["Title: ", bijoy2unicode("Avwg evsjvq"), bijoy2unicode(" Mvb MvB|"),
+                                 bijoy2unicode("Zywg"), "Avwg & you"])
+        fonts = [a_font.get(_W + "ascii") for a_font in root.iter(_W + "rFonts")]
+        self.assertEqual(fonts, ["Times New Roman", "NikoshBAN", "NikoshBAN"])
+        self.assertEqual(root.find(".//" + _W + "rFonts").getparent().find(_W + "bCs"), None)
+        self.assertIsNotNone(list(root.iter(_W + "rFonts"))[1].getparent().find(_W + "bCs"))
+        bangla = styles.find(_W + "style[@" + _W + "styleId='Bangla']/" + _W + "rPr")
+        self.assertEqual(bangla.find(_W + "rFonts").get(_W + "cs"), "NikoshBAN")
+        self.assertEqual(bangla.find(_W + "szCs").get(_W + "val"), "28")
+
+    def test_convert_odt(self):
+        dest_file = os.path.join(self.temp_dir.name, "letter.odt")
+        stats = convert_office_document(self.odt_file, dest_file, unicode_font="Siyam Rupali")
+        self.assertEqual(stats['paragraphs'], 2)
+        with zf.ZipFile(dest_file) as document:
+            self.assertEqual(document.infolist()[0].filename, "mimetype")
+            self.assertEqual(document.infolist()[0].compress_type, zf.ZIP_STORED)
+            root = etree.fromstring(document.read("content.xml"))
+            styles = etree.fromstring(document.read("styles.xml"))
+        paragraphs = list(root.iter(_TEXT + "p"))
+        self.assertEqual(etree.tostring(paragraphs[0], method="text", encoding="unicode", with_tail=False),
+                         "Title: " + bijoy2unicode("Avwg evsjvq") + bijoy2unicode("Mvb MvB|"))
+        self.assertEqual(etree.tostring(paragraphs[1], method="text", encoding="unicode", with_tail=False),
+                         bijoy2unicode("Zywg Avwg"))
+        faces = {a_face.get(_STYLE + "name"): a_face.get(_SVG + "font-family")
+                 for a_face in root.iter(_STYLE + "font-face")}
+        self.assertEqual(faces, {"SutonnyMJ": "'Siyam Rupali'", "Liberation Serif": "'Liberation Serif'"})
+        properties = next(root.iter(_STYLE + "text-properties"))
+        self.assertEqual(properties.get(_STYLE + "font-name-complex"), "SutonnyMJ")
+        self.assertEqual(properties.get(_STYLE + "font-size-complex"), "14pt")
+        self.assertEqual(next(styles.iter(_STYLE + "font-face")).get(_SVG + "font-family"), "'Siyam Rupali'")
+
+    def test_convert_office_folder(self):
+        output_folder = os.path.join(self.temp_dir.name, "out")
+        summary = convert_office_folder(os.path.join(self.temp_dir.name, "in"), output_folder, workers=2)
+        self.assertEqual((summary['files'], summary['converted'], summary['paragraphs']), (2, 2, 4))
+        self.assertTrue(os.path.exists(os.path.join(output_folder, "sub", "letter.odt")))
+        self.assertEqual(convert_office_folder(os.path.join(self.temp_dir.name, "in"), output_folder,
+                                               workers=1)['skipped'], 2)
+        with self.assertRaises(ValueError):
+            convert_office_document(os.path.join(self.temp_dir.name, "letter.doc"), output_folder)
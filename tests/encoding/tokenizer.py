@@ -0,0 +1,20 @@
+from unittest import TestCase
+
+from shobdokutir.encoding.tokenizer import tokenize, words, normalize_token
+
+
+class TestTokenizer(TestCase):
+
+    def test_tokenize(self):
+        text = "আমি বাংলায় গান গাই। ১০টি Hello, world!"
+        self.assertEqual(list(tokenize(text)), [("আমি", 0, 3), ("বাংলায়", 4, 11), ("গান", 12, 15), ("গাই", 16, 19),
+                                                ("১০", 21, 23), ("টি", 23, 25), ("hello", 26, 31), ("world", 33, 38)])
+        # a dangling hasant is dropped, the zero width non joiner is not part of the word
+        self.assertEqual(words("্আছ ক্‌ষ খুদ্‌"), ["আছ", "ক্ষ", "খুদ্"])
+
+    def test_normalize_token(self):
+        self.assertEqual(normalize_token("েকমন"), "কেমন")
+        self.assertEqual(normalize_token("কেক"), "কেক")
+        self.assertEqual(normalize_token("সত্‍"), "সৎ")
+        self.assertEqual(normalize_token("কো"), "কো")
+        self.assertEqual(normalize_token("বাংলায়"), normalize_token("বাংলায়"))
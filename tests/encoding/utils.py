@@ -1,18 +1,145 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
 from unittest import TestCase
 
-from shobdokutir.encoding.utils import bijoy2unicode, unicode2bijoy
+from shobdokutir.encoding.utils import bijoy2unicode, unicode2bijoy, bijoy2unicode_stream, bengali_clusters, \
+    BijoyConverter, UnicodeConverter, convert_folder_contents, hasify_folder_contents, file_hash, apply_char_map, \
+    u2b_maps
 
 class TestUtils(TestCase):
 
-    def test_bijoy2unicode_and_unicode2bijoy(self):
-        bijoy_texts = ""
-        unicode_texts = ""
-        with open("resources/sample_docs/bijoy_sample.txt") as f_bijoy:
+    def setUp(self):
+        self.bijoy_texts = ""
+        self.unicode_texts = ""
+        with open("resources/sample_docs/bijoy_sample.txt", encoding="cp1252") as f_bijoy:
             for a_line in f_bijoy:
-                bijoy_texts += a_line
+                self.bijoy_texts += a_line
         with open("resources/sample_docs/unicode_sample.txt", encoding="utf-8") as f_unicode:
             for a_line in f_unicode:
-                unicode_texts += a_line
-    
-        self.assertTrue(bijoy2unicode(bijoy_texts) == unicode_texts)
-        # self.assertTrue(unicode2bijoy(unicode_texts) == bijoy_texts)
+                self.unicode_texts += a_line
+
+    def test_bijoy2unicode_and_unicode2bijoy(self):
+        self.assertTrue(bijoy2unicode(self.bijoy_texts) == self.unicode_texts)
+        # self.assertTrue(unicode2bijoy(self.unicode_texts) == self.bijoy_texts)
+
+    def test_bijoy_converter(self):
+        converter = BijoyConverter()
+        self.assertEqual(converter.convert(self.bijoy_texts), self.unicode_texts)
+        self.assertEqual(list(converter.convert_many(self.bijoy_texts.split("\n"))), self.unicode_texts.split("\n"))
+        self.assertEqual(converter.convert(""), "")
+        # A trailing prekar or chondrobindu has nothing to be shifted over
+        self.assertEqual(converter.convert("Pvu"), "চাঁ")
+        self.assertEqual(converter.convert("‡"), "ে")
+
+    def test_bijoy2unicode_stream(self):
+        for chunk_size in [1, 2, 7, 65536]:
+            converted = "".join(bijoy2unicode_stream(StringIO(self.bijoy_texts), chunk_size=chunk_size))
+            self.assertEqual(converted, self.unicode_texts)
+
+    def test_tokenize_stream_max_run_len(self):
+        converter = BijoyConverter()
+        # a long run is not split right after a prekar, which is shifted over the whole run
+        for text in ["K‡" + " " * 50 + "K", "K‡K" + " " * 50 + "K", "K" + " " * 50 + "K"]:
+            for chunk_size in [1, 7, 1000]:
+                chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+                tokens = list(converter.tokenize_stream(chunks, max_run_len=4))
+                self.assertEqual("".join(converter.convert_tokens(tokens)), converter.convert(text))
+        self.assertGreater(len(list(converter.tokenize_stream(["K" + " " * 50 + "K"], max_run_len=4))), 3)
+        # the documented limit: a ref is shifted over the last piece of a split run only
+        text = "K" + " " * 50 + "©"
+        self.assertEqual("".join(converter.convert_tokens(converter.tokenize_stream([text], max_run_len=4))),
+                         "ক" + " " * 49 + "র্ ")
+        self.assertEqual(converter.convert(text), "কর্" + " " * 50)
+
+    def test_unicode2bijoy(self):
+        self.assertEqual(unicode2bijoy("আমি তুমি"), "Avwg Zywg")
+        self.assertEqual(unicode2bijoy("কর্মী"), "Kgx©")
+        self.assertEqual(unicode2bijoy("কোঁচা"), "‡KuvPv")
+        self.assertEqual(unicode2bijoy("র\u200c্যাব"), "i¨ve")
+        self.assertEqual(list(UnicodeConverter().convert_many(["১২৩", ""])), ["123", ""])
+        # A few words of the unicode sample are not well formed, e.g. "পে্রক্ষাপটে"
+        for a_word in self.unicode_texts.split():
+            if "ে্র" not in a_word and "ুিক্ত" not in a_word:
+                self.assertEqual(bijoy2unicode(unicode2bijoy(a_word)), a_word)
+
+    def test_apply_char_map(self):
+        self.assertEqual(apply_char_map("Kv.K", {"K": "ক", "v": "া", "Kv": "কা়"}), "কা়.ক")
+        self.assertEqual(apply_char_map("কাঙ্ক্ষা", u2b_maps), "Kv•¶v")
+
+    def test_bengali_clusters(self):
+        text = "কর্মী আমি ১"
+        self.assertEqual([text[start:end] for start, end in bengali_clusters(text)], ["ক", "র্মী", "আ", "মি"])
+
+    def test_convert_folder_contents(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            src_folder = os.path.join(temp_dir, "bijoy")
+            os.makedirs(os.path.join(src_folder, "sub"))
+            shutil.copyfile("resources/sample_docs/bijoy_sample.txt", os.path.join(src_folder, "a.txt"))
+            shutil.copyfile("resources/sample_docs/bijoy_sample.txt", os.path.join(src_folder, "sub", "b.txt"))
+            with open(os.path.join(src_folder, "bad.txt"), "wb") as f_out:
+                f_out.write(b"\x81")
+
+            output_folder = os.path.join(temp_dir, "unicode")
+            summary = convert_folder_contents(src_folder, output_folder=output_folder, workers=1)
+            self.assertEqual((summary['files'], summary['converted'], summary['skipped']), (3, 2, 0))
+            self.assertEqual([a_failure['file'] for a_failure in summary['failed']], ["bad.txt"])
+            with open(os.path.join(output_folder, "sub", "b.txt"), encoding="utf-8") as f_in:
+                self.assertEqual(f_in.read(), bijoy2unicode(self.bijoy_texts))
+            summary = convert_folder_contents(src_folder, output_folder=output_folder, workers=1)
+            self.assertEqual((summary['converted'], summary['skipped']), (0, 2))
+
+            ndjson_file = os.path.join(temp_dir, "unicode.ndjson")
+            convert_folder_contents(os.path.join(src_folder, "**", "?.txt"), ndjson_file=ndjson_file, workers=1)
+            summary = convert_folder_contents(os.path.join(src_folder, "**", "?.txt"), ndjson_file=ndjson_file)
+            self.assertEqual(summary['skipped'], 2)
+            with open(ndjson_file, encoding="utf-8") as f_in:
+                records = [json.loads(a_line) for a_line in f_in]
+            self.assertEqual([a_record['file'] for a_record in records], ["a.txt", "sub/b.txt"])
+            self.assertEqual(records[0]['text'], bijoy2unicode(self.bijoy_texts))
+
+            # a run killed in the middle of a line: the partial line is dropped and its file converted again
+            with open(ndjson_file, "r+b") as f_out:
+                f_out.truncate(os.path.getsize(ndjson_file) - 10)
+            summary = convert_folder_contents(os.path.join(src_folder, "**", "?.txt"), ndjson_file=ndjson_file,
+                                              workers=1)
+            self.assertEqual((summary['converted'], summary['skipped']), (1, 1))
+            with open(ndjson_file, encoding="utf-8") as f_in:
+                self.assertEqual([json.loads(a_line)['file'] for a_line in f_in], ["a.txt", "sub/b.txt"])
+            with self.assertRaises(ValueError):
+                convert_folder_contents(src_folder, ndjson_file=ndjson_file, workers=0)
+
+    def test_hasify_folder_contents(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            src_folder = os.path.join(temp_dir, "docs")
+            os.makedirs(src_folder)
+            shutil.copyfile("resources/sample_docs/bijoy_sample.txt", os.path.join(src_folder, "a.txt"))
+            shutil.copyfile("resources/sample_docs/bijoy_sample.txt", os.path.join(src_folder, "b.txt"))
+            shutil.copyfile("resources/sample_docs/unicode_sample.txt", os.path.join(src_folder, "c.txt"))
+            with open("resources/sample_docs/unicode_sample.txt", "rb") as f_in:
+                digest = file_hash(f_in, algorithm="blake2b")
+
+            manifest_file = os.path.join(temp_dir, "manifest.ndjson")
+            summary = hasify_folder_contents(src_folder, algorithm="blake2b", manifest_file=manifest_file,
+                                             placement="auto")
+            self.assertEqual((summary['files'], summary['hashed'], summary['existing']), (3, 3, 1))
+            self.assertEqual(summary['copy'] + summary['hardlink'] + summary['reflink'], 2)
+            self.assertTrue(os.path.exists(os.path.join(temp_dir, "docs_blake2b", digest + ".txt")))
+
+            summary = hasify_folder_contents(src_folder, algorithm="blake2b", manifest_file=manifest_file)
+            self.assertEqual((summary['hashed'], summary['skipped'], summary['existing']), (0, 3, 3))
+            self.assertEqual(summary['bytes_skipped'], sum(os.path.getsize(os.path.join(src_folder, a_file))
+                                                           for a_file in os.listdir(src_folder)))
+
+            # a truncated dest (an interrupted copy of an older version) is placed again
+            dest = os.path.join(temp_dir, "docs_blake2b", digest + ".txt")
+            os.remove(dest)
+            with open(dest, "wb") as f_out:
+                f_out.write(b"trunc")
+            summary = hasify_folder_contents(src_folder, algorithm="blake2b", manifest_file=manifest_file)
+            self.assertEqual((summary['existing'], summary['copy']), (2, 1))
+            with open(dest, "rb") as f_in:
+                self.assertEqual(file_hash(f_in, algorithm="blake2b"), digest)
+            self.assertFalse(any(a_file.endswith(".part") for a_file in os.listdir(os.path.dirname(dest))))
@@ -0,0 +1,75 @@
+import gzip
+import json
+import os
+import tarfile
+import tempfile
+import warnings
+from unittest import TestCase
+
+from PIL import Image
+
+from shobdokutir.optical.dataset import augment_image, generate_dataset, sample_specs, text_lines
+
+
+class TestDataset(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.text_file = os.path.join(self.temp_dir.name, "lines.txt")
+        with open(self.text_file, "w", encoding="utf-8") as f_out:
+            f_out.write("আমি বাংলায় গান গাই\n\nআমি  বাংলার গান গাই, আমি আমার আমিকে চিরদিন এই বাংলায় খুঁজে পাই\n")
+        self.ndjson_file = os.path.join(self.temp_dir.name, "epub_text.ndjson.gz")
+        with gzip.open(self.ndjson_file, "wt", encoding="utf-8") as f_out:
+            f_out.write(json.dumps({'text_split': ["রাষ্ট্রের জ্ঞান", "কৌতূহল"]}) + "\n")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_text_lines(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ResourceWarning)
+            lines = list(text_lines([self.ndjson_file, self.text_file], max_words=6))
+        self.assertEqual(lines, ["রাষ্ট্রের জ্ঞান", "কৌতূহল", "আমি বাংলায় গান গাই", "আমি বাংলার গান গাই, আমি আমার",
+                                 "আমিকে চিরদিন এই বাংলায় খুঁজে পাই"])
+        # the plain text files are closed
+        self.assertFalse([a_warning for a_warning in caught if issubclass(a_warning.category, ResourceWarning)])
+
+    def test_sample_specs(self):
+        lines = ["ক", "খ", "গ", "ঘ"]
+        specs = list(sample_specs(lines, ["Kalpurush", "NikoshBAN"], [24, 32], seed=1, variants=3, batch_size=4))
+        self.assertEqual([a_spec['index'] for a_spec in specs], list(range(12)))
+        self.assertEqual([a_spec['text'] for a_spec in specs[:4]], ["ক", "ক", "ক", "খ"])
+        self.assertEqual(len({(a_spec['font_name'], a_spec['font_size']) for a_spec in specs[4:8]}), 1)
+        self.assertEqual(list(sample_specs(lines, ["Kalpurush", "NikoshBAN"], [24, 32], seed=1, variants=3,
+                                           batch_size=4, start=5)), specs[5:])
+        self.assertNotEqual(list(sample_specs(lines, ["Kalpurush", "NikoshBAN"], [24, 32], seed=2, variants=3,
+                                              batch_size=4)), specs)
+        img = augment_image(Image.new("RGB", (20, 10), "white"), specs[0]['augmentation'])
+        self.assertEqual(img.mode, "L")
+        self.assertGreater(img.size[0], 20)
+
+    def test_generate_dataset(self):
+        output_folder = os.path.join(self.temp_dir.name, "shards")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            summary = generate_dataset([self.text_file, self.ndjson_file], output_folder, fonts=["Kalpurush"],
+                                       variants=3, max_words=6, max_samples=10, shard_size=4, workers=1, batch_size=2)
+            self.assertEqual((summary['images'], summary['shards']), (10, 3))
+            self.assertEqual(sorted(os.listdir(output_folder)), ["ocr-000000.tar", "ocr-000001.tar", "ocr-000002.tar"])
+            with tarfile.open(os.path.join(output_folder, "ocr-000002.tar")) as tar:
+                self.assertEqual(tar.getnames(), ["000000008.png", "000000008.txt", "000000008.json",
+                                                  "000000009.png", "000000009.txt", "000000009.json"])
+                self.assertEqual(tar.extractfile("000000009.txt").read().decode("utf-8"), "রাষ্ট্রের জ্ঞান")
+                label = json.loads(tar.extractfile("000000009.json").read())
+                self.assertEqual(label['font_name'], "Kalpurush")
+                self.assertEqual(Image.open(tar.extractfile("000000009.png")).mode, "L")
+            with open(os.path.join(output_folder, "ocr-000001.tar"), "rb") as f_in:
+                shard = f_in.read()
+            # resumes after the complete shards, and generates the same images
+            os.remove(os.path.join(output_folder, "ocr-000001.tar"))
+            os.remove(os.path.join(output_folder, "ocr-000002.tar"))
+            summary = generate_dataset([self.text_file, self.ndjson_file], output_folder, fonts=["Kalpurush"],
+                                       variants=3, max_words=6, max_samples=10, shard_size=4, workers=1, batch_size=2)
+            self.assertEqual((summary['start_shard'], summary['images'], summary['shards']), (1, 6, 2))
+            with open(os.path.join(output_folder, "ocr-000001.tar"), "rb") as f_in:
+                self.assertEqual(f_in.read(), shard)
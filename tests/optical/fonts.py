@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from shobdokutir.optical.fonts import FontCatalog, scan_font_file
+from shobdokutir.optical.generators import get_font_details
+
+
+class TestFonts(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.font_folder = os.path.join(self.temp_dir.name, "fonts")
+        os.makedirs(self.font_folder)
+        for a_file in ["kalpurush.ttf", "KohinoorBangla.ttc", "mitra.ttf"]:
+            shutil.copy(os.path.join("resources/bangla_fonts", a_file), self.font_folder)
+        with open(os.path.join(self.font_folder, "broken.ttf"), "wb") as f_out:
+            f_out.write(b"not a font")
+        self.cache_file = os.path.join(self.temp_dir.name, "cache", "fonts.json")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_scan_font_file(self):
+        faces = scan_font_file(os.path.join(self.font_folder, "KohinoorBangla.ttc"))
+        self.assertEqual([a_face['style'] for a_face in faces], ["Regular", "Semibold", "Medium", "Bold", "Light"])
+        self.assertEqual({a_face['family'] for a_face in faces}, {"Kohinoor Bangla"})
+        self.assertIn("bng2", faces[0]['scripts'])
+        face, = scan_font_file(os.path.join(self.font_folder, "kalpurush.ttf"))
+        self.assertTrue(any(start <= 0x0995 <= end for start, end in face['ranges']))
+
+    def test_catalog(self):
+        catalog = FontCatalog([self.font_folder], self.cache_file, system_fonts=False)
+        self.assertEqual((catalog.scanned, len(catalog.faces)), (4, 7))
+        self.assertEqual({a_face['family'] for a_face in catalog.fonts_for("রাষ্ট্রের জ্ঞান‌")},
+                         {"Kalpurush", "Kohinoor Bangla", "Mitra Mono"})
+        self.assertEqual([a_face['family'] for a_face in catalog.fonts_for("আমি ₹", bengali_shaping=True)],
+                         ["Kohinoor Bangla"] * 5)
+        self.assertEqual(catalog.fonts_for("আমি \U0001F600"), [])
+        coverage = {a_face['family']: a_face['bengali'] for a_face in catalog.faces}
+        self.assertGreater(coverage["Kalpurush"], 0.9)
+        self.assertLess(coverage["Mitra Mono"], 0.9)
+        self.assertEqual({a_face['family'] for a_face in catalog.bengali_fonts()}, {"Kalpurush", "Kohinoor Bangla"})
+        # only the modified files are scanned again
+        self.assertEqual(FontCatalog([self.font_folder], self.cache_file, system_fonts=False).scanned, 0)
+        os.utime(os.path.join(self.font_folder, "mitra.ttf"))
+        os.remove(os.path.join(self.font_folder, "kalpurush.ttf"))
+        catalog = FontCatalog([self.font_folder], self.cache_file, system_fonts=False)
+        self.assertEqual((catalog.scanned, len(catalog.faces)), (1, 6))
+        details = get_font_details(catalog)
+        self.assertEqual(sorted(details), ["Kohinoor Bangla", "Mitra Mono"])
+        self.assertEqual(details["Kohinoor Bangla"]['index'], [0, 1, 2, 3, 4])
+        self.assertEqual(details["Mitra Mono"]['style'], [{"Regular"}])
@@ -0,0 +1,43 @@
+import warnings
+from unittest import TestCase
+
+from shobdokutir.optical.generators import PillowTextRenderer, compare_renderers
+from shobdokutir.optical.image_utils import image_similarity
+
+
+class TestGenerators(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            cls.renderer = PillowTextRenderer()
+
+    def test_get_text_image(self):
+        img = self.renderer.get_text_image("আমি বাংলায় গান গাই", font_size=32, font_name="Kalpurush")
+        self.assertEqual(img.mode, "RGB")
+        self.assertEqual(img.getpixel((0, 0)), (255, 255, 255))
+        self.assertGreater(img.size[0], img.size[1])
+        bigger = self.renderer.get_text_image("আমি বাংলায় গান গাই", font_size=64, font_name="kalpurush")
+        self.assertAlmostEqual(bigger.size[0] / img.size[0], 2, delta=0.2)
+        self.assertEqual(self.renderer.get_text_image("আমি\n  বাংলায়").size,
+                         self.renderer.get_text_image("আমি বাংলায়").size)
+        self.assertIsNone(self.renderer.get_text_image(" "))
+        with self.assertRaises(ValueError):
+            self.renderer.get_text_image("আমি", font_name="No Such Font")
+
+    def test_compare_renderers(self):
+        results = compare_renderers(self.renderer, self.renderer, samples=["জ্ঞান", "রাষ্ট্রের"],
+                                    font_names=["NikoshBAN", "Siyam Rupali"])
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(a_result['similarity'] == 1.0 for a_result in results))
+        nikosh = self.renderer.get_text_image("জ্ঞান", 32, "NikoshBAN")
+        self.assertLess(image_similarity(nikosh, self.renderer.get_text_image("রাষ্ট্রের", 32, "NikoshBAN")), 0.5)
+        self.assertEqual(image_similarity(nikosh, None), 0.0)
+
+    def test_get_text_images(self):
+        texts = ["জ্ঞান", " ", "রাষ্ট্রের"]
+        images = self.renderer.get_text_images(texts, 24, "Siyam Rupali")
+        self.assertIsNone(images[1])
+        for a_text, img in zip(texts[::2], images[::2]):
+            self.assertEqual(image_similarity(img, self.renderer.get_text_image(a_text, 24, "Siyam Rupali")), 1.0)
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import time
+import warnings
+from unittest import TestCase
+
+from shobdokutir.optical.generators import PillowTextRenderer
+from shobdokutir.optical.image_utils import image_similarity
+from shobdokutir.optical.pool import OpticalTextBuilderPool
+
+
+class FlakyRenderer:
+    """
+    Crashes or hangs the first time it gets "crash" or "hang", the marker files are shared by the restarted workers
+    """
+
+    def __init__(self, marker_folder):
+        self.marker_folder = marker_folder
+
+    def clear_all(self):
+        pass
+
+    def get_text_images(self, texts, font_size=None, font_name=None):
+        for a_text in texts:
+            marker = os.path.join(self.marker_folder, a_text)
+            if a_text in ("crash", "hang") and not os.path.exists(marker):
+                open(marker, "w").close()
+                if a_text == "crash":
+                    os._exit(1)
+                time.sleep(60)
+            if a_text == "error":
+                raise ValueError(a_text)
+        return [a_text.upper() + str(font_size) for a_text in texts]
+
+
+class TestPool(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_pillow_pool(self):
+        texts = ["জ্ঞান", "রাষ্ট্রের", "বাংলায়", " "] * 5
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            renderer = PillowTextRenderer()
+            with OpticalTextBuilderPool(workers=2, backend="pillow") as pool:
+                images = pool.get_text_images(texts, 24, "Kalpurush", batch_size=3)
+        self.assertEqual(len(images), len(texts))
+        for a_text, img in zip(texts, images):
+            self.assertEqual(image_similarity(img, renderer.get_text_image(a_text, 24, "Kalpurush")), 1.0)
+
+    def test_restart(self):
+        requests = [(a_text, i % 2, None) for i, a_text in enumerate(["a", "crash", "b", "hang", "c", "d"] * 2)]
+        with OpticalTextBuilderPool(workers=2, backend=FlakyRenderer, job_timeout=2,
+                                    marker_folder=self.temp_dir.name) as pool:
+            self.assertEqual(list(pool.imap(requests)), [a_text.upper() + str(font_size)
+                                                         for a_text, font_size, _ in requests])
+            self.assertEqual(pool.restarts, 2)
+            with self.assertRaises(ValueError):
+                list(pool.imap([("a", 1, None), ("error", 1, None), ("b", 1, None)]))
+            # the pool can be used after an error
+            self.assertEqual(pool.get_text_images(["x", "y"]), ["XNone", "YNone"])
+            processes = [worker['process'] for worker in pool.workers]
+        self.assertFalse(any(a_process.is_alive() for a_process in processes))
@@ -0,0 +1,78 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from shobdokutir.search.index import IndexWriter, IndexReader, encode_varints, decode_varints, encode_postings, \
+    decode_postings
+
+
+def make_records(epub_md5_hash, chapters):
+    return [{'epub_md5_hash': epub_md5_hash, 'xhtml_index': i, 'text_split': paragraphs}
+            for i, paragraphs in enumerate(chapters)]
+
+
+class TestIndex(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.index_dir = os.path.join(self.temp_dir.name, "index")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_postings_encoding(self):
+        values = np.array([0, 1, 127, 128, 300, 2 ** 40], dtype=np.uint64)
+        self.assertEqual(decode_varints(encode_varints(values)).tolist(), values.tolist())
+        rng = np.random.RandomState(0)
+        postings = np.column_stack([rng.randint(0, 50, 1000), rng.randint(0, 20, 1000), rng.randint(0, 500, 1000),
+                                    rng.randint(1, 9, 1000)])
+        postings = postings[np.lexsort(postings[:, ::-1].T)]
+        self.assertEqual(decode_postings(encode_postings(postings)).tolist(), postings.tolist())
+        self.assertLess(len(encode_postings(postings)), postings.size * 2)
+
+    def test_index_and_search(self):
+        with IndexWriter(self.index_dir, segment_size=10, merge_factor=3) as writer:
+            summary = writer.add_records(make_records("a" * 32, [["আমি বাংলায় গান গাই।", "তুমি গান গাও"],
+                                                                 ["Hello world", "গান আর গান, আমি"]]))
+            self.assertEqual(summary, {'added': 2, 'skipped': 0})
+            for i in range(6):
+                writer.add_records(make_records("{0:032d}".format(i), [["বই {0} পড়ি".format(i)] * 3]))
+        reader = IndexReader(self.index_dir)
+        self.assertLessEqual(len(reader.segments), 3)
+
+        results = reader.search("আমি গান")
+        self.assertEqual(results['total'], 2)
+        self.assertEqual([(a_hit['epub_md5_hash'], a_hit['xhtml_index'], a_hit['paragraph'])
+                          for a_hit in results['hits']], [("a" * 32, 0, 0), ("a" * 32, 1, 1)])
+        self.assertEqual(results['hits'][1]['offsets'], [[0, 3], [7, 10], [12, 15]])
+        self.assertEqual(reader.search("hello")['hits'][0]['offsets'], [[0, 5]])
+        self.assertEqual(reader.search("বই")['total'], 18)
+        self.assertEqual(len(reader.search("বই", limit=4)['hits']), 4)
+        self.assertEqual(reader.search("নেই")['total'], 0)
+        with self.assertRaises(ValueError):
+            reader.search("।")
+
+        # an incremental run skips the indexed books, a full merge keeps the results
+        with IndexWriter(self.index_dir) as writer:
+            self.assertEqual(writer.add_records(make_records("a" * 32, [["গান"]]))['skipped'], 1)
+            writer.add_records(make_records("b" * 32, [["আমি গান গাই"]]))
+            writer.flush()
+            writer.merge()
+        reader = IndexReader(self.index_dir)
+        self.assertEqual(len(reader.segments), 1)
+        self.assertEqual(len(os.listdir(self.index_dir)), 2)
+        self.assertEqual([a_hit['epub_md5_hash'] for a_hit in reader.search("আমি গান")['hits']],
+                         ["a" * 32, "a" * 32, "b" * 32])
+        self.assertEqual(reader.search("বই 5")['hits'][0]['xhtml_index'], 0)
+
+    def test_flush_in_book(self):
+        # the first chapter fills the buffer, the second chapter of the book must not be rejected
+        with IndexWriter(self.index_dir, segment_size=3) as writer:
+            summary = writer.add_records(make_records("a" * 32, [["আমি গান গাই"], ["তুমি গান গাও"]]))
+            self.assertEqual(summary, {'added': 2, 'skipped': 0})
+            writer.add_records(make_records("b" * 32, [["তুমি"]]))
+        reader = IndexReader(self.index_dir)
+        self.assertGreater(len(reader.segments), 1)
+        self.assertEqual([a_hit['epub_md5_hash'] for a_hit in reader.search("তুমি")['hits']], ["a" * 32, "b" * 32])
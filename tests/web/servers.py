@@ -0,0 +1,33 @@
+import json
+from unittest import TestCase
+
+from lxml import html
+
+from shobdokutir.web.servers import create_parrot_app
+
+
+class TestServers(TestCase):
+
+    def setUp(self):
+        self.client = create_parrot_app().test_client()
+
+    def test_index(self):
+        response = self.client.get("/", query_string={'message': json.dumps("আমি"), 'font': "Kalpurush"})
+        self.assertEqual(response.get_data(as_text=True),
+                         "<html><body><span style = \"font-family: Kalpurush; \">আমি</span></body></html>")
+
+    def test_batch(self):
+        messages = ["আমি " * 2000, "বাংলায় <গান> & গাই"]
+        response = self.client.post("/batch", json={'messages': messages, 'size': 32})
+        blocks = html.fromstring(response.get_data(as_text=True)).find_class("message")
+        self.assertEqual([a_block.text_content() for a_block in blocks], messages)
+        self.assertTrue(all("font-size: 32px;" in a_block.get("style") for a_block in blocks))
+        self.assertEqual(html.fromstring(self.client.get("/batch").get_data(as_text=True)).find_class("message"), [])
+
+    def test_escaping(self):
+        # a message renders the same text alone and in a batch
+        message = "<b>আমি</b> & তুমি &amp;"
+        single = self.client.get("/", query_string={'message': json.dumps(message)}).get_data(as_text=True)
+        batch = self.client.post("/batch", json={'messages': [message]}).get_data(as_text=True)
+        self.assertEqual(html.fromstring(single).find(".//span").text_content(), message)
+        self.assertEqual(html.fromstring(batch).find_class("message")[0].text_content(), message)